@@ -3,12 +3,18 @@
 
 from __future__ import annotations
 
+import argparse
 import csv
+import sys
 from collections import defaultdict
 from pathlib import Path
-from typing import Dict, Iterable, List, Sequence, Tuple
+from typing import Dict, Iterable, List, Mapping, Sequence, Tuple
 
 BASE_DIR = Path(__file__).parent
+sys.path.insert(0, str(BASE_DIR.resolve().parents[1] / "bin"))
+
+from cents import cents_path, format_german, parse_cents  # noqa: E402
+
 INPUT_PATTERN = "ergebnisrechnung_*.csv"
 
 COLUMN_NAMES = {
@@ -22,84 +28,103 @@ COLUMN_NAMES = {
     "erm": "Spalte 8 (Übertragene Ermächtigungen in EUR)",
 }
 
-NumberDict = Dict[int, float]
+NumberDict = Dict[int, int]
 DataDict = Dict[Tuple[str, str, str], NumberDict]
 
 
-def parse_number(raw: str) -> float | None:
-    """Convert a German formatted number string to float.
+def parse_number(raw: str) -> int | None:
+    """Convert a German formatted number string to integer cents.
 
-    Returns ``None`` for empty strings. A trailing ``-`` is treated as a negative sign.
+    Returns ``None`` for text that is not a number. A trailing ``-`` is treated as a negative sign.
     """
 
     if raw is None:
         return None
     value = raw.strip()
     if not value or value == "-":
-        return 0.0
-    negative = value.endswith("-")
-    if negative:
-        value = value[:-1]
-    value = value.replace(".", "").replace(",", ".")
+        return 0
     try:
-        number = float(value)
+        return parse_cents(value)
     except ValueError:
         return None
-    return -number if negative else number
 
 
-def format_number(value: float | None) -> str:
-    """Format a float using German decimal formatting."""
+class ErgebnisCollector:
+    """Accumulates Ergebnisrechnung rows of any year in any order.
 
-    if value is None:
-        return ""
-    formatted = f"{value:,.2f}"
-    formatted = formatted.replace(",", "X").replace(".", ",").replace("X", ".")
-    return formatted
+    Vorjahr values only fill years without an Ist value, regardless of the
+    order in which the years arrive.
+    """
 
+    def __init__(self) -> None:
+        self.result_data: DataDict = defaultdict(dict)
+        self.previous_data: DataDict = defaultdict(dict)
+        self.plan_data: DataDict = defaultdict(dict)
+        self.abweichung_data: DataDict = defaultdict(dict)
+        self.erm_data: DataDict = defaultdict(dict)
+        self.order: List[Tuple[str, str, str]] = []
+        self._seen: set[Tuple[str, str, str]] = set()
+        self.years: set[int] = set()
+
+    def add(self, year: int, line: Mapping[str, str]) -> None:
+        self.years.add(year)
+        key = (
+            line[COLUMN_NAMES["konto"]].strip(),
+            line[COLUMN_NAMES["lfd"]].strip(),
+            line[COLUMN_NAMES["art"]].strip(),
+        )
+        if key not in self._seen:
+            self._seen.add(key)
+            self.order.append(key)
+
+        ist_value = parse_number(line[COLUMN_NAMES["ist"]])
+        if ist_value is not None:
+            self.result_data[key][year] = ist_value
+
+        plan_value = parse_number(line[COLUMN_NAMES["plan"]])
+        if plan_value is not None:
+            self.plan_data[key][year] = plan_value
+
+        abweichung_value = parse_number(line[COLUMN_NAMES["abweichung"]])
+        if abweichung_value is not None:
+            self.abweichung_data[key][year] = abweichung_value
+
+        erm_value = parse_number(line[COLUMN_NAMES["erm"]])
+        if erm_value is not None:
+            self.erm_data[key][year] = erm_value
+
+        prev_value = parse_number(line[COLUMN_NAMES["vorjahr"]])
+        if prev_value is not None:
+            self.previous_data[key][year - 1] = prev_value
+
+    def result(self):
+        result_data: DataDict = defaultdict(dict)
+        for key in self.order:
+            merged = dict(self.previous_data.get(key, {}))
+            merged.update(self.result_data.get(key, {}))
+            if merged:
+                result_data[key] = merged
+        return self.order, result_data, self.plan_data, self.abweichung_data, self.erm_data
 
-def collect_data(paths: Sequence[Path]):
-    result_data: DataDict = defaultdict(dict)
-    plan_data: DataDict = defaultdict(dict)
-    abweichung_data: DataDict = defaultdict(dict)
-    erm_data: DataDict = defaultdict(dict)
-    order: List[Tuple[str, str, str]] = []
 
+def collect_data(paths: Sequence[Path]):
+    collector = ErgebnisCollector()
     for path in sorted(paths):
         year = int(path.stem.split("_")[-1])
         with path.open(newline="", encoding="utf-8") as handle:
             reader = csv.DictReader(handle)
             for line in reader:
-                key = (
-                    line[COLUMN_NAMES["konto"]].strip(),
-                    line[COLUMN_NAMES["lfd"]].strip(),
-                    line[COLUMN_NAMES["art"]].strip(),
-                )
-                if key not in order:
-                    order.append(key)
-
-                ist_value = parse_number(line[COLUMN_NAMES["ist"]])
-                if ist_value is not None:
-                    result_data[key][year] = ist_value
-
-                plan_value = parse_number(line[COLUMN_NAMES["plan"]])
-                if plan_value is not None:
-                    plan_data[key][year] = plan_value
+                collector.add(year, line)
+    return collector.result()
 
-                abweichung_value = parse_number(line[COLUMN_NAMES["abweichung"]])
-                if abweichung_value is not None:
-                    abweichung_data[key][year] = abweichung_value
 
-                erm_value = parse_number(line[COLUMN_NAMES["erm"]])
-                if erm_value is not None:
-                    erm_data[key][year] = erm_value
+def collect_stream(records: Iterable[Mapping[str, object]]) -> ErgebnisCollector:
+    """Consume NDJSON records of ``extract_ergebnisrechnung.py --ndjson`` as they arrive."""
 
-                prev_value = parse_number(line[COLUMN_NAMES["vorjahr"]])
-                prev_year = year - 1
-                if prev_value is not None and prev_year not in result_data[key]:
-                    result_data[key][prev_year] = prev_value
-
-    return order, result_data, plan_data, abweichung_data, erm_data
+    collector = ErgebnisCollector()
+    for record in records:
+        collector.add(int(record["jahr"]), {key: str(value) for key, value in record.items()})
+    return collector
 
 
 def write_table(
@@ -109,31 +134,57 @@ def write_table(
     data: DataDict,
     prefix: str,
 ) -> None:
+    """Write the German formatted table and its integer-cents sidecar for the later stages."""
+
     header = ["Kontenbereich", "Lfd. Nr.", "Ertrags- und Aufwandsarten"] + [
         f"{prefix} {year}" for year in years
     ]
 
-    with path.open("w", newline="", encoding="utf-8") as handle:
+    with path.open("w", newline="", encoding="utf-8") as handle, cents_path(path).open(
+        "w", newline="", encoding="utf-8"
+    ) as cents_handle:
         writer = csv.writer(handle)
+        cents_writer = csv.writer(cents_handle)
         writer.writerow(header)
+        cents_writer.writerow(header)
         for key in keys:
-            row = list(key)
             values = data.get(key, {})
-            for year in years:
-                value = values.get(year)
-                row.append(format_number(value))
-            writer.writerow(row)
+            cents = [values.get(year) for year in years]
+            writer.writerow([*key, *(format_german(value) for value in cents)])
+            cents_writer.writerow([*key, *("" if value is None else value for value in cents)])
 
 
 def main() -> None:
-    input_files = sorted(BASE_DIR.glob(INPUT_PATTERN))
-    if not input_files:
-        raise SystemExit("No input files found")
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--ndjson",
+        metavar="QUELLE",
+        help="Zeilen aus einem NDJSON-Strom lesen (Dateipfad oder - für stdin) statt aus den CSV-Dateien",
+    )
+    parser.add_argument(
+        "--follow",
+        action="store_true",
+        help="Eine noch wachsende NDJSON-Datei bis zu ihrem Endemarker weiterlesen",
+    )
+    args = parser.parse_args()
+
+    if args.ndjson:
+        from ndjson_stream import iter_ndjson
+
+        collector = collect_stream(iter_ndjson(args.ndjson, follow=args.follow))
+        if not collector.years:
+            raise SystemExit("Keine Zeilen im NDJSON-Strom")
+        keys, results, plans, deviations, authorisations = collector.result()
+        plan_years = sorted(collector.years)
+    else:
+        input_files = sorted(BASE_DIR.glob(INPUT_PATTERN))
+        if not input_files:
+            raise SystemExit("No input files found")
 
-    keys, results, plans, deviations, authorisations = collect_data(input_files)
+        keys, results, plans, deviations, authorisations = collect_data(input_files)
+        plan_years = sorted({year for path in input_files for year in [int(path.stem.split("_")[-1])]})
 
     result_years = sorted({year for values in results.values() for year in values})
-    plan_years = sorted({year for path in input_files for year in [int(path.stem.split("_")[-1])]})
 
     write_table(
         BASE_DIR / "gesamt_ergebnisse_zeitreihe.csv",
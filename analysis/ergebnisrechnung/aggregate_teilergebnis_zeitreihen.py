@@ -3,12 +3,17 @@
 
 from __future__ import annotations
 
+import argparse
 import csv
+import sys
 from collections import defaultdict
 from pathlib import Path
-from typing import Dict, Iterable, List, Sequence, Tuple
+from typing import Dict, Iterable, List, Mapping, Sequence, Tuple
 
 BASE_DIR = Path(__file__).parent
+sys.path.insert(0, str(BASE_DIR.resolve().parents[1] / "bin"))
+
+from cents import format_fixed, parse_cents  # noqa: E402
 
 # Target categories and known filename suffix aliases
 CATEGORY_ALIASES = {
@@ -32,25 +37,38 @@ HEADER_COLUMNS = [
     "produkt_name",
 ]
 
-NumberMap = Dict[int, float]
+NumberMap = Dict[int, int]
 RowKey = Tuple[str, str, str, str, str, str]
 DataMap = Dict[RowKey, NumberMap]
 
 
-def parse_value(raw: str) -> float | None:
-    """Return a float for the raw value or ``None`` for empty strings."""
+def parse_value(raw: str) -> int | None:
+    """Return integer cents for the raw value or ``None`` for empty strings."""
+
+    return parse_cents(raw)
+
+
+class CategoryCollector:
+    """Accumulates the Teilergebnis rows of one category across years."""
 
-    if raw is None:
-        return None
-    raw = raw.strip()
-    if not raw:
-        return None
-    return float(raw)
+    def __init__(self) -> None:
+        self.data: DataMap = defaultdict(dict)
+        self.order: List[RowKey] = []
+        self._seen: set[RowKey] = set()
+
+    def add(self, year: int, row: Mapping[str, str]) -> None:
+        key: RowKey = tuple(row[column] for column in HEADER_COLUMNS)  # type: ignore[assignment]
+        if key not in self._seen:
+            self._seen.add(key)
+            self.order.append(key)
+
+        value = parse_value(row.get("ist_ergebnis_eur", ""))
+        if value is not None:
+            self.data[key][year] = value
 
 
 def collect_category_data(paths: Sequence[Path]) -> Tuple[List[RowKey], DataMap]:
-    data: DataMap = defaultdict(dict)
-    order: List[RowKey] = []
+    collector = CategoryCollector()
 
     for path in sorted(paths):
         try:
@@ -61,15 +79,32 @@ def collect_category_data(paths: Sequence[Path]) -> Tuple[List[RowKey], DataMap]
         with path.open(encoding="utf-8") as handle:
             reader = csv.DictReader(handle)
             for row in reader:
-                key: RowKey = tuple(row[column] for column in HEADER_COLUMNS)  # type: ignore[arg-type]
-                if key not in order:
-                    order.append(key)
+                collector.add(year, row)
+
+    return collector.order, collector.data
+
 
-                value = parse_value(row.get("ist_ergebnis_eur", ""))
-                if value is not None:
-                    data[key][year] = value
+def resolve_category(category_part: str) -> str | None:
+    for target, aliases in CATEGORY_ALIASES.items():
+        if category_part in aliases:
+            return target
+    return None
 
-    return order, data
+
+def collect_stream(records: Iterable[Mapping[str, object]]) -> Tuple[Dict[str, CategoryCollector], List[int]]:
+    """Consume NDJSON records of ``extract_account_teilergebnisse.py --ndjson`` as they arrive."""
+
+    collectors: Dict[str, CategoryCollector] = {}
+    years: set[int] = set()
+    for record in records:
+        category = resolve_category(str(record.get("kategorie", "")))
+        if category is None:
+            continue
+        year = int(record["jahr"])
+        years.add(year)
+        row = {key: "" if value is None else str(value) for key, value in record.items()}
+        collectors.setdefault(category, CategoryCollector()).add(year, row)
+    return collectors, sorted(years)
 
 
 def write_overview(path: Path, order: Iterable[RowKey], data: DataMap, years: Sequence[int]) -> None:
@@ -91,11 +126,37 @@ def write_overview(path: Path, order: Iterable[RowKey], data: DataMap, years: Se
             values = data.get(key, {})
             for year in years:
                 value = values.get(year)
-                row.append("" if value is None else f"{value:.2f}")
+                row.append(format_fixed(value))
             writer.writerow(row)
 
 
 def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--ndjson",
+        metavar="QUELLE",
+        help="Zeilen aus einem NDJSON-Strom lesen (Dateipfad oder - für stdin) statt aus den CSV-Dateien",
+    )
+    parser.add_argument(
+        "--follow",
+        action="store_true",
+        help="Eine noch wachsende NDJSON-Datei bis zu ihrem Endemarker weiterlesen",
+    )
+    args = parser.parse_args()
+
+    if args.ndjson:
+        from ndjson_stream import iter_ndjson
+
+        collectors, years = collect_stream(iter_ndjson(args.ndjson, follow=args.follow))
+        if not collectors:
+            raise SystemExit("Keine Teilergebnis-Zeilen im NDJSON-Strom.")
+        for category in CATEGORY_ALIASES:
+            if category not in collectors:
+                continue
+            output_path = BASE_DIR / f"zeitreihe_{category}.csv"
+            write_overview(output_path, collectors[category].order, collectors[category].data, years)
+        return
+
     base_pattern = "teilergebnis_*.csv"
     available_files = list(BASE_DIR.glob(base_pattern))
 
@@ -111,10 +172,9 @@ def main() -> None:
         _, year_part, category_part = parts
         if not year_part.isdigit():
             continue
-        for target, aliases in CATEGORY_ALIASES.items():
-            if category_part in aliases:
-                files_by_category[target].append(path)
-                break
+        target = resolve_category(category_part)
+        if target is not None:
+            files_by_category[target].append(path)
 
     years = sorted(
         {
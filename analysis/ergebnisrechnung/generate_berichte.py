@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""Render the Berichte of the Ergebnisrechnung from the zeitreihe tables and templates."""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import re
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from string import Template
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+BASE_DIR = Path(__file__).parent
+sys.path.insert(0, str(BASE_DIR.resolve().parents[1] / "bin"))
+
+from cents import cents_path  # noqa: E402
+
+TEMPLATE_DIR = BASE_DIR / "templates"
+MANIFEST_NAME = "berichte.manifest.json"
+
+YEAR_COLUMN_PATTERN = re.compile(r"(\d{4})$")
+# Sign prefixes ("+ ", "= ", "+ / - "), row references and footnote digits of the Muster labels.
+LABEL_PREFIX_PATTERN = re.compile(r"^[+=/\-\s]+")
+LABEL_SUFFIX_PATTERN = re.compile(r"(?:\s+\d)?\s*\(=?\s*Zeilen?[^)]*\)\s*$")
+
+# Lfd. Nr. of the summary lines in the Ergebnisrechnung Muster.
+LINE_ERTRAEGE = 10
+LINE_AUFWENDUNGEN = 17
+LINE_LAUFENDE_VERWALTUNG = 18
+LINE_FINANZERGEBNIS = 21
+LINE_JAHRESERGEBNIS = 22
+LINE_JAHRESERGEBNIS_RUECKLAGE = 24
+LINE_STEUERN = 1
+
+SUMMARY_LINES = [
+    (LINE_ERTRAEGE, "Summe Erträge"),
+    (LINE_AUFWENDUNGEN, "Summe Aufwendungen"),
+    (LINE_LAUFENDE_VERWALTUNG, "Ergebnis laufende Verwaltung"),
+    (LINE_FINANZERGEBNIS, "Finanzergebnis"),
+    (LINE_JAHRESERGEBNIS, "Jahresergebnis"),
+]
+
+DRIVER_COUNT = 3
+
+
+def format_euro(value: float, decimals: int = 0) -> str:
+    if pd.isna(value):
+        return "–"
+    formatted = f"{value:,.{decimals}f}"
+    return formatted.replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+def format_mio(value: float) -> str:
+    return f"{format_euro(value / 1_000_000, 2)} Mio. €"
+
+
+def format_signed_mio(value: float) -> str:
+    return ("+" if value > 0 else "") + format_mio(value)
+
+
+def format_percent(value: float) -> str:
+    if pd.isna(value):
+        return "–"
+    return ("+" if value > 0 else "") + format_euro(value, 1) + " %"
+
+
+def clean_label(label: str) -> str:
+    return LABEL_SUFFIX_PATTERN.sub("", LABEL_PREFIX_PATTERN.sub("", label)).strip()
+
+
+def markdown_table(header: Sequence[str], rows: Iterable[Sequence[str]]) -> str:
+    lines = ["| " + " | ".join(header) + " |", "| " + " | ".join("---" for _ in header) + " |"]
+    lines.extend("| " + " | ".join(row) + " |" for row in rows)
+    return "\n".join(lines)
+
+
+def bullet_list(items: Iterable[str]) -> str:
+    lines = [f"- {item}" for item in items]
+    return "\n".join(lines) if lines else "- Keine Auffälligkeiten."
+
+
+class Zeitreihe:
+    """A gesamt_*_zeitreihe table with labels per Lfd. Nr. and one euro column per year.
+
+    The values are read from the integer-cents sidecar of the table.
+    """
+
+    def __init__(self, path: Path):
+        frame = pd.read_csv(cents_path(path), dtype=str, keep_default_na=False)
+        year_columns = [column for column in frame.columns if YEAR_COLUMN_PATTERN.search(column)]
+        self.path = path
+        self.years = [int(YEAR_COLUMN_PATTERN.search(column).group(1)) for column in year_columns]
+        self.rows = pd.DataFrame(
+            {
+                "Lfd. Nr.": pd.to_numeric(frame["Lfd. Nr."], errors="coerce"),
+                "Art": frame["Ertrags- und Aufwandsarten"].map(clean_label),
+                "Detail": frame["Kontenbereich"].str.strip() != "",
+            }
+        )
+        self.values = pd.DataFrame(
+            {year: pd.to_numeric(frame[column], errors="coerce") / 100 for year, column in zip(self.years, year_columns)}
+        )
+
+    @property
+    def span(self) -> str:
+        return f"{self.years[0]}–{self.years[-1]}"
+
+    def line(self, lfd: int) -> pd.Series:
+        """Values of a Lfd. Nr.; rows repeated for later years (e.g. renamed labels) are merged."""
+
+        rows = self.values[(self.rows["Lfd. Nr."] == lfd).to_numpy()]
+        if rows.empty:
+            return pd.Series(float("nan"), index=self.years)
+        return rows.bfill().iloc[0]
+
+    def details(self) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """Labels and values of the Ertrags- and Aufwandsarten (rows with a Kontenbereich)."""
+
+        mask = self.rows["Detail"].to_numpy()
+        return self.rows[mask].reset_index(drop=True), self.values[mask].reset_index(drop=True)
+
+
+class Datenbasis:
+    """Loads every zeitreihe table at most once per run."""
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self._tables: Dict[str, Zeitreihe] = {}
+
+    def table(self, name: str) -> Zeitreihe:
+        if name not in self._tables:
+            self._tables[name] = Zeitreihe(self.directory / name)
+        return self._tables[name]
+
+
+def largest_changes(series: Zeitreihe, start: int, end: int) -> List[str]:
+    labels, values = series.details()
+    change = (values[end] - values[start]).dropna()
+    order = change.abs().sort_values(ascending=False).index[:DRIVER_COUNT]
+    return [
+        f"**{labels.at[index, 'Art']}**: {format_mio(values.at[index, start])} ({start}) → "
+        f"{format_mio(values.at[index, end])} ({end}), {format_signed_mio(change[index])}"
+        for index in order
+    ]
+
+
+def development_context(series: Zeitreihe) -> Dict[str, str]:
+    """Context shared by the reports on Ist-Ergebnisse and Planwerte."""
+
+    first, previous, last = series.years[0], series.years[-2], series.years[-1]
+    ertraege = series.line(LINE_ERTRAEGE)
+    aufwendungen = series.line(LINE_AUFWENDUNGEN)
+    verwaltung = series.line(LINE_LAUFENDE_VERWALTUNG)
+    jahresergebnis = series.line(LINE_JAHRESERGEBNIS)
+    quote = aufwendungen / ertraege * 100
+    peak = int(ertraege.idxmax())
+    table_rows = [
+        [label, *(format_euro(value) for value in series.line(lfd))] for lfd, label in SUMMARY_LINES
+    ]
+    table_rows.append(["Aufwandsquote (Aufwendungen/Erträge)", *(format_euro(value) + " %" for value in quote)])
+    deficit_years = [str(year) for year, value in verwaltung.items() if value < 0]
+    entwicklung = [
+        f"Die Erträge erreichen {peak} mit {format_mio(ertraege[peak])} ihren Höchststand; "
+        f"{last} liegen sie bei {format_mio(ertraege[last])} "
+        f"({format_percent((ertraege[last] / ertraege[previous] - 1) * 100)} ggü. {previous}).",
+        f"Die Aufwendungen entwickeln sich von {format_mio(aufwendungen[first])} ({first}) auf "
+        f"{format_mio(aufwendungen[last])} ({last}), {format_percent((aufwendungen[last] / aufwendungen[first] - 1) * 100)}.",
+        f"Das Ergebnis der laufenden Verwaltungstätigkeit beträgt {last} {format_mio(verwaltung[last])} "
+        f"nach {format_mio(verwaltung[previous])} im Vorjahr; negativ in: {', '.join(deficit_years) or 'keinem Jahr'}.",
+        f"Das Jahresergebnis {last} beträgt {format_mio(jahresergebnis[last])} "
+        f"({format_signed_mio(jahresergebnis[last] - jahresergebnis[previous])} ggü. {previous}).",
+        f"Die Steuern und ähnlichen Abgaben machen {last} {format_euro(series.line(LINE_STEUERN)[last] / ertraege[last] * 100)} % "
+        "der Erträge aus.",
+    ]
+    return {
+        "quelle": f"analysis/ergebnisrechnung/{series.path.name}",
+        "zeitraum": series.span,
+        "erstes_jahr": str(first),
+        "vorjahr": str(previous),
+        "letztes_jahr": str(last),
+        "kennzahlen_tabelle": markdown_table(["Kennzahl", *map(str, series.years)], table_rows),
+        "entwicklung": bullet_list(entwicklung),
+        "veraenderungen_vorjahr": bullet_list(largest_changes(series, previous, last)),
+        "veraenderungen_zeitraum": bullet_list(largest_changes(series, first, last)),
+    }
+
+
+def ergebnisse_context(data: Datenbasis) -> Dict[str, str]:
+    return development_context(data.table("gesamt_ergebnisse_zeitreihe.csv"))
+
+
+def haushaltsplanung_context(data: Datenbasis) -> Dict[str, str]:
+    return development_context(data.table("gesamt_haushaltsplanung_zeitreihe.csv"))
+
+
+def abweichungen_context(data: Datenbasis) -> Dict[str, str]:
+    series = data.table("gesamt_abweichungen_zeitreihe.csv")
+    last = series.years[-1]
+    lines = [*SUMMARY_LINES, (LINE_JAHRESERGEBNIS_RUECKLAGE, "Jahresergebnis nach Ausgleichsrücklage")]
+    table_rows = [[label, *(format_euro(value, 2) for value in series.line(lfd))] for lfd, label in lines]
+    labels, values = series.details()
+    latest = values[last].dropna()
+
+    def describe(index: int) -> str:
+        history = ", ".join(
+            f"{year}: {format_signed_mio(value)}" for year, value in values.loc[index].items() if pd.notna(value)
+        )
+        return f"**{labels.at[index, 'Art']}** {format_signed_mio(latest[index])} ({history})"
+
+    negative = [describe(index) for index in latest[latest < 0].sort_values().index[:DRIVER_COUNT + 2]]
+    positive = [describe(index) for index in latest[latest > 0].sort_values(ascending=False).index[:DRIVER_COUNT]]
+    reported = values.notna() & (values != 0)
+    always_negative = ((values < 0) | ~reported).all(axis=1) & reported.any(axis=1)
+    always_positive = ((values > 0) | ~reported).all(axis=1) & reported.any(axis=1)
+    verwaltung = series.line(LINE_LAUFENDE_VERWALTUNG)
+    worst = int(verwaltung.idxmin())
+    return {
+        "quelle": f"analysis/ergebnisrechnung/{series.path.name}",
+        "zeitraum": series.span,
+        "letztes_jahr": str(last),
+        "kennzahlen_tabelle": markdown_table(["Kennzahl", *map(str, series.years)], table_rows),
+        "tiefpunkt": f"Die größte Abweichung beim Ergebnis der laufenden Verwaltungstätigkeit liegt {worst} "
+        f"bei {format_signed_mio(verwaltung[worst])}; {last} beträgt sie {format_signed_mio(verwaltung[last])}.",
+        "negativtreiber": bullet_list(negative),
+        "entlastungen": bullet_list(positive),
+        "dauerhaft_negativ": ", ".join(labels.loc[always_negative, "Art"]) or "keine",
+        "dauerhaft_positiv": ", ".join(labels.loc[always_positive, "Art"]) or "keine",
+    }
+
+
+@dataclass(frozen=True)
+class Bericht:
+    """One generated report: its template, the tables it reads and the function filling the template."""
+
+    name: str
+    template: str
+    inputs: Tuple[str, ...]
+    context: Callable[[Datenbasis], Dict[str, str]]
+
+    def output_path(self, output_dir: Path) -> Path:
+        return output_dir / f"{self.name}.md"
+
+    def fingerprint(self, input_dir: Path) -> str:
+        """Digest over the input tables (their cents sidecars), the template and this generator."""
+
+        digest = hashlib.sha256()
+        inputs = [cents_path(input_dir / name) for name in self.inputs]
+        for path in [*inputs, TEMPLATE_DIR / self.template, Path(__file__)]:
+            digest.update(path.name.encode())
+            digest.update(path.read_bytes())
+        return digest.hexdigest()
+
+    def render(self, data: Datenbasis) -> str:
+        template = Template((TEMPLATE_DIR / self.template).read_text(encoding="utf-8"))
+        return template.substitute(self.context(data))
+
+
+BERICHTE = [
+    Bericht(
+        "bericht_gesamt_ergebnisse",
+        "bericht_gesamt_ergebnisse.md",
+        ("gesamt_ergebnisse_zeitreihe.csv",),
+        ergebnisse_context,
+    ),
+    Bericht(
+        "bericht_gesamt_haushaltsplanung",
+        "bericht_gesamt_haushaltsplanung.md",
+        ("gesamt_haushaltsplanung_zeitreihe.csv",),
+        haushaltsplanung_context,
+    ),
+    Bericht(
+        "bericht_gesamt_abweichungen",
+        "bericht_gesamt_abweichungen.md",
+        ("gesamt_abweichungen_zeitreihe.csv",),
+        abweichungen_context,
+    ),
+]
+
+
+def load_manifest(path: Path) -> Dict[str, str]:
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--input-dir", type=Path, default=BASE_DIR)
+    parser.add_argument("--output-dir", type=Path, default=BASE_DIR)
+    parser.add_argument("--berichte", nargs="*", help="Nur diese Berichte erzeugen (Standard: alle)")
+    parser.add_argument("--force", action="store_true", help="Alle Berichte neu erzeugen, auch ohne Datenänderung")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    started = time.perf_counter()
+    selected: Optional[List[str]] = args.berichte
+    unknown = set(selected or []) - {bericht.name for bericht in BERICHTE}
+    if unknown:
+        raise SystemExit(f"Unbekannte Berichte: {', '.join(sorted(unknown))}")
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = args.output_dir / MANIFEST_NAME
+    manifest = load_manifest(manifest_path)
+    data = Datenbasis(args.input_dir)
+    rendered = 0
+    for bericht in BERICHTE:
+        if selected and bericht.name not in selected:
+            continue
+        output_path = bericht.output_path(args.output_dir)
+        fingerprint = bericht.fingerprint(args.input_dir)
+        if not args.force and output_path.exists() and manifest.get(bericht.name) == fingerprint:
+            print(f"{output_path} unverändert.")
+            continue
+        output_path.write_text(bericht.render(data), encoding="utf-8")
+        manifest[bericht.name] = fingerprint
+        rendered += 1
+        print(f"{output_path} erstellt.")
+    manifest_path.write_text(json.dumps(manifest, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+    print(f"{rendered} Berichte erzeugt ({time.perf_counter() - started:.2f}s).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""Compare the Haushalt Teilergebnisplan with the Schlussbilanz Teilergebnis Ist per Produkt."""
+
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+from typing import Iterable, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = Path(__file__).parent
+PLAN_DIR = BASE_DIR.parent / "haushalt"
+OUTPUT_CSV = BASE_DIR / "plan_ist_produkte.csv"
+YEARS = list(range(2021, 2025))
+
+KEY = ["Jahr", "Produkt", "Kontenbereich", "Lfd. Nr."]
+
+PLAN_COLUMNS = {
+    "Produkt": "Produkt",
+    "Produktname": "Produktname",
+    "Kontenbereich": "Kontenbereich",
+    "Lfd. Nr.": "Lfd. Nr.",
+    "Ertrags- und Aufwandsarten": "Ertrags- und Aufwandsarten",
+    "Ansatz des Haushaltsjahres in EUR": "Plan",
+}
+IST_COLUMNS = {
+    "Produkt": "Produkt",
+    "Produktname": "Produktname",
+    "Spalte 13 (Kontenbereich)": "Kontenbereich",
+    "Spalte 24 (Lfd. Nr.)": "Lfd. Nr.",
+    "Spalte 3 (Ertrags- und Aufwandsarten)": "Ertrags- und Aufwandsarten",
+    "Spalte 6 (Ist-Ergebnis des Haushaltsjahres in EUR)": "Ist",
+}
+
+OUTPUT_COLUMNS = [
+    "Jahr",
+    "Produkt",
+    "Produktname",
+    "Kontenbereich",
+    "Lfd. Nr.",
+    "Ertrags- und Aufwandsarten",
+    "Ansatz Haushalt",
+    "Ist Schlussbilanz",
+    "Abweichung (Ansatz - Ist)",
+    "Abweichung in %",
+    "Quelle",
+]
+
+
+def parse_numbers(values: pd.Series) -> np.ndarray:
+    """Vectorised conversion of German formatted numbers (trailing ``-`` = negative) to floats."""
+
+    text = values.fillna("").astype(str).str.strip()
+    negative = text.str.endswith("-") & (text != "-")
+    digits = text.str.rstrip("-").str.replace(".", "", regex=False).str.replace(",", ".", regex=False)
+    numbers = pd.to_numeric(digits.replace("", "0"), errors="coerce").to_numpy(dtype=float)
+    return np.where(negative.to_numpy(), -numbers, numbers)
+
+
+def format_numbers(values: np.ndarray) -> List[str]:
+    return [
+        "" if np.isnan(value) else f"{value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+        for value in values
+    ]
+
+
+def normalise_codes(values: pd.Series) -> pd.Series:
+    """Strip leading zeros from numeric codes so that ``01`` and ``1`` join."""
+
+    text = values.fillna("").astype(str).str.strip()
+    numeric = text.str.fullmatch(r"\d+")
+    return text.where(~numeric, text.str.lstrip("0").replace("", "0"))
+
+
+def load_side(paths: Iterable[Tuple[int, Path]], columns: dict, value: str) -> pd.DataFrame:
+    """Load one side of the join with normalised key columns and a float value column."""
+
+    frames = []
+    for year, path in paths:
+        frame = pd.read_csv(path, dtype=str, keep_default_na=False)[list(columns)].rename(columns=columns)
+        frame.insert(0, "Jahr", year)
+        frames.append(frame)
+    if not frames:
+        return pd.DataFrame(columns=[*KEY, "Produktname", "Ertrags- und Aufwandsarten", value])
+    data = pd.concat(frames, ignore_index=True)
+    for column in ("Produkt", "Kontenbereich", "Lfd. Nr."):
+        data[column] = normalise_codes(data[column])
+    data[value] = parse_numbers(data[value])
+    data = data[data["Lfd. Nr."] != ""]
+    duplicates = data.duplicated(KEY)
+    if duplicates.any():
+        print(f"{int(duplicates.sum())} doppelte Schlüssel in den {value}-Daten ignoriert.")
+    return data[~duplicates]
+
+
+class PlanIstJoin:
+    """Aligns plan and Ist rows on (Jahr, Produkt, Kontenbereich, Lfd. Nr.).
+
+    Both sides are indexed by a hashed ``MultiIndex``; the union of both key sets
+    is looked up in each index once (``get_indexer``) and all deviations are
+    computed on the aligned NumPy arrays, without a per-row Python loop.
+    """
+
+    def __init__(self, plan: pd.DataFrame, ist: pd.DataFrame):
+        self.plan = plan.set_index(KEY)
+        self.ist = ist.set_index(KEY)
+        self.keys = self.plan.index.union(self.ist.index).sort_values()
+
+    def aligned(self, side: pd.DataFrame, column: str) -> Tuple[np.ndarray, np.ndarray]:
+        positions = side.index.get_indexer(self.keys)
+        found = positions >= 0
+        if pd.api.types.is_numeric_dtype(side[column]):
+            values = np.full(len(self.keys), np.nan)
+        else:
+            values = np.full(len(self.keys), "", dtype=object)
+        values[found] = side[column].to_numpy()[positions[found]]
+        return values, found
+
+    def variance_table(self) -> pd.DataFrame:
+        plan, in_plan = self.aligned(self.plan, "Plan")
+        ist, in_ist = self.aligned(self.ist, "Ist")
+        plan = np.where(in_plan, plan, 0.0).astype(float)
+        ist = np.where(in_ist, ist, 0.0).astype(float)
+        deviation = plan - ist
+        with np.errstate(divide="ignore", invalid="ignore"):
+            percent = np.where(plan != 0, deviation / np.abs(plan) * 100, np.nan)
+        names, _ = self.aligned(self.ist, "Produktname")
+        plan_names, _ = self.aligned(self.plan, "Produktname")
+        arts, _ = self.aligned(self.ist, "Ertrags- und Aufwandsarten")
+        plan_arts, _ = self.aligned(self.plan, "Ertrags- und Aufwandsarten")
+        source = np.select([in_plan & in_ist, in_plan], ["beide", "nur Haushalt"], default="nur Schlussbilanz")
+        table = self.keys.to_frame(index=False)
+        table["Produktname"] = np.where(in_ist, names, plan_names)
+        table["Ertrags- und Aufwandsarten"] = np.where(in_ist, arts, plan_arts)
+        table["Ansatz Haushalt"] = format_numbers(np.where(in_plan, plan, np.nan))
+        table["Ist Schlussbilanz"] = format_numbers(np.where(in_ist, ist, np.nan))
+        table["Abweichung (Ansatz - Ist)"] = format_numbers(deviation)
+        table["Abweichung in %"] = format_numbers(percent)
+        table["Quelle"] = source
+        keep = (plan != 0) | (ist != 0)
+        return (
+            table.loc[keep, OUTPUT_COLUMNS]
+            .sort_values(["Jahr", "Produkt", "Lfd. Nr."], key=sort_key, kind="stable")
+            .reset_index(drop=True)
+        )
+
+
+def sort_key(column: pd.Series) -> pd.Series:
+    if column.name == "Lfd. Nr.":
+        return pd.to_numeric(column, errors="coerce")
+    return column
+
+
+def available_files(directory: Path, prefix: str, years: Iterable[int]) -> List[Tuple[int, Path]]:
+    files = []
+    for year in years:
+        path = directory / f"{prefix}_{year}.csv"
+        if path.exists():
+            files.append((year, path))
+        else:
+            print(f"{path} fehlt, Jahr {year} wird auf dieser Seite übersprungen.")
+    return files
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--years", nargs="*", type=int, default=YEARS, help="Jahre (Standard: 2021 bis 2024)")
+    parser.add_argument("--output", type=Path, default=OUTPUT_CSV)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    plan = load_side(available_files(PLAN_DIR, "teilergebnisplan", args.years), PLAN_COLUMNS, "Plan")
+    ist = load_side(available_files(BASE_DIR, "teilergebnisrechnung", args.years), IST_COLUMNS, "Ist")
+    if plan.empty and ist.empty:
+        raise SystemExit(
+            "Keine Eingangsdaten. Zuerst bin/extract_teilergebnisplan.py und "
+            "bin/sections.py --sections teilergebnisrechnung ausführen."
+        )
+    table = PlanIstJoin(plan, ist).variance_table()
+    table.to_csv(args.output, index=False)
+    counts = table["Quelle"].value_counts()
+    print(
+        f"{args.output} erstellt (Zeilen: {len(table)}, beide: {counts.get('beide', 0)}, "
+        f"nur Haushalt: {counts.get('nur Haushalt', 0)}, nur Schlussbilanz: {counts.get('nur Schlussbilanz', 0)})"
+    )
+
+
+if __name__ == "__main__":
+    main()
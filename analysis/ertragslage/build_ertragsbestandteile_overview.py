@@ -5,52 +5,39 @@ from __future__ import annotations
 
 import csv
 import re
+import sys
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, Iterable, List, MutableMapping, Sequence
+from typing import Dict, List, MutableMapping, Sequence
 
 BASE_DIR = Path(__file__).resolve().parent
 ERFOLG_DIR = BASE_DIR.parent / "ergebnisrechnung"
 LAGE_DIR = BASE_DIR.parent / "lagebericht"
 
+sys.path.insert(0, str(BASE_DIR.parents[1] / "bin"))
+
+from cents import cents_path, format_german, parse_cents  # noqa: E402
+from rollup import COMPLETE, PARTIAL, RollupIssue, RollupNode, RollupTree  # noqa: E402
+
 YEARS: Sequence[int] = tuple(range(2018, 2025))
 YEAR_COLUMNS: Sequence[str] = tuple(str(year) for year in YEARS)
 
-RELEVANT_LFD_NUMBERS = {
-    "1",
-    "2",
-    "3",
-    "4",
-    "5",
-    "6",
-    "7",
-    "8",
-    "9",
-    "10",
-    "19",
+# Lfd. Nr. of the Gesamtergebnisrechnung lines in the overview and the line they add up to.
+LINE_PARENTS: Dict[str, str | None] = {
+    **{str(number): "10" for number in range(1, 10)},
+    "10": None,
+    "19": None,
 }
 
-CATEGORY_ORDER = [
-    "Erträge",
-    "Finanzerträge",
-    "Steuern und ähnliche Abgaben",
-    "Zuwendungen und allgemeine Umlagen",
-    "Sonstige Transfererträge",
-    "öffentlich-rechtliche Leistungsentgelte",
-    "privatrechtliche Leistungsentgelte",
-    "Kostenerstattungen u. Kostenumlagen",
-    "sonstige Erträge",
-    "aktivierte Eigenleistungen",
-    "Bestandveränderungen",
-]
-
-DETAIL_ORDER = {
-    "Aggregat": 0,
-    "Steuerart": 1,
-    "Zuweisungstyp": 1,
-    "Teilergebnis": 2,
+# How the children of each Detailtyp relate to their parent row. The Lagebericht only lists the
+# main Steuerarten and Zuweisungstypen, so those may not exceed the Ertragsart but need not add up
+# to it. Gewerbesteuer counts (Betriebsgrößenklassen) are not summed at all.
+BREAKDOWN_RULES = {
+    "Aggregat": COMPLETE,
+    "Teilergebnis": COMPLETE,
+    "Steuerart": PARTIAL,
+    "Zuweisungstyp": PARTIAL,
 }
-DETAIL_FALLBACK = max(DETAIL_ORDER.values()) + 1
 
 RESET_LABELS = {
     "sonstige Erträge",
@@ -61,38 +48,36 @@ RESET_LABELS = {
 }
 
 
-def parse_german_number(raw: str | None) -> float | None:
-    """Convert a German formatted string to ``float``."""
+def parse_amount(raw: str | None) -> int | None:
+    """Convert a two-decimal amount (e.g. of the Teilergebnis zeitreihen) to integer cents."""
 
-    if raw is None:
+    if raw is None or raw.strip() == "-":
         return None
-    value = raw.strip()
-    if not value or value == "-":
+    try:
+        return parse_cents(raw)
+    except ValueError:
+        return None
+
+
+def parse_integer(raw: str | None) -> int | None:
+    """Read a plain integer cell: cents of a ``*.cents.csv`` sidecar or a count."""
+
+    if raw is None or not raw.strip():
         return None
-    negative = value.endswith("-")
-    if negative:
-        value = value[:-1]
-    if "," in value:
-        value = value.replace(".", "").replace(",", ".")
     try:
-        number = float(value)
+        return int(raw.strip())
     except ValueError:
         return None
-    return -number if negative else number
 
 
-def format_currency(value: float | None) -> str:
-    if value is None:
-        return ""
-    formatted = f"{value:,.2f}"
-    formatted = formatted.replace(",", "X").replace(".", ",").replace("X", ".")
-    return formatted
+def format_currency(value: int | None) -> str:
+    return format_german(value)
 
 
-def format_count(value: float | None) -> str:
+def format_count(value: int | None) -> str:
     if value is None:
         return ""
-    return f"{int(round(value))}"
+    return str(value)
 
 
 def normalise_category(label: str) -> str:
@@ -109,9 +94,13 @@ class OverviewRow:
     product: str
     product_name: str
     metric: str
-    values: MutableMapping[int, float | None] = field(default_factory=dict)
+    # Integer cents for currency rows, plain integers for counts.
+    values: MutableMapping[int, int | None] = field(default_factory=dict)
     value_format: str = "currency"
 
+    def value_list(self) -> List[int | None]:
+        return [self.values.get(year) for year in YEARS]
+
     def as_csv_row(self) -> Dict[str, str]:
         result: Dict[str, str] = {
             "Kategorie": self.category,
@@ -127,31 +116,41 @@ class OverviewRow:
         return result
 
 
-def add_totals(rows: List[OverviewRow]) -> None:
-    path = ERFOLG_DIR / "gesamt_ergebnisse_zeitreihe.csv"
+def add_row(tree: RollupTree, parent: RollupNode, key: str, row: OverviewRow) -> RollupNode:
+    return tree.add(parent, key, row.value_list(), row, row.detail_type)
+
+
+def add_totals(tree: RollupTree) -> Dict[str, RollupNode]:
+    """Add the Ertragsarten under their total line and return the nodes by Kategorie."""
+
+    categories: Dict[str, RollupNode] = {}
+    path = cents_path(ERFOLG_DIR / "gesamt_ergebnisse_zeitreihe.csv")
     with path.open(encoding="utf-8") as handle:
         reader = csv.DictReader(handle)
         for line in reader:
-            if line["Lfd. Nr."].strip() not in RELEVANT_LFD_NUMBERS:
+            lfd = line["Lfd. Nr."].strip()
+            if lfd not in LINE_PARENTS:
                 continue
             category = normalise_category(line["Ertrags- und Aufwandsarten"])
-            values: Dict[int, float | None] = {}
+            values: Dict[int, int | None] = {}
             for year in YEARS:
-                values[year] = parse_german_number(line.get(f"Ergebnis {year}"))
-            rows.append(
-                OverviewRow(
-                    category=category,
-                    subcategory="Gesamtsumme",
-                    detail_type="Aggregat",
-                    product="",
-                    product_name="",
-                    metric="Ertrag",
-                    values=values,
-                )
+                values[year] = parse_integer(line.get(f"Ergebnis {year}"))
+            parent_lfd = LINE_PARENTS[lfd]
+            parent = tree.root if parent_lfd is None else tree.add(tree.root, parent_lfd)
+            row = OverviewRow(
+                category=category,
+                subcategory="Gesamtsumme",
+                detail_type="Aggregat",
+                product="",
+                product_name="",
+                metric="Ertrag",
+                values=values,
             )
+            categories[category] = add_row(tree, parent, lfd, row)
+    return categories
 
 
-def add_teilergebnis_details(rows: List[OverviewRow]) -> None:
+def add_teilergebnis_details(tree: RollupTree, categories: Dict[str, RollupNode]) -> None:
     mapping = {
         "zeitreihe_steuern_und_ähnliche_abgaben.csv": "Steuern und ähnliche Abgaben",
         "zeitreihe_zuwendungen_und_allgemeine_umlagen.csv": "Zuwendungen und allgemeine Umlagen",
@@ -172,28 +171,27 @@ def add_teilergebnis_details(rows: List[OverviewRow]) -> None:
                 product_name = line.get("Produktname", "").strip()
                 subcategory = product_name
                 detail_type = "Teilergebnis"
-                values: Dict[int, float | None] = {}
+                values: Dict[int, int | None] = {}
                 for year in YEARS:
-                    values[year] = parse_german_number(line.get(str(year)))
-                rows.append(
-                    OverviewRow(
-                        category=category_name,
-                        subcategory=subcategory,
-                        detail_type=detail_type,
-                        product=product,
-                        product_name=product_name,
-                        metric="Ertrag",
-                        values=values,
-                    )
+                    values[year] = parse_amount(line.get(str(year)))
+                row = OverviewRow(
+                    category=category_name,
+                    subcategory=subcategory,
+                    detail_type=detail_type,
+                    product=product,
+                    product_name=product_name,
+                    metric="Ertrag",
+                    values=values,
                 )
+                add_row(tree, categories[category_name], f"{detail_type}:{product}:{product_name}", row)
 
 
-def add_tax_breakdown(rows: List[OverviewRow]) -> None:
+def add_tax_breakdown(tree: RollupTree, categories: Dict[str, RollupNode]) -> None:
     detail_scope = {
         "Steuern und ähnliche Abgaben": "Steuerart",
         "Zuwendungen und allgemeine Umlagen": "Zuweisungstyp",
     }
-    path = BASE_DIR / "ertragslage_2018-2024.csv"
+    path = cents_path(BASE_DIR / "ertragslage_2018-2024.csv")
     current_category: str | None = None
     with path.open(encoding="utf-8") as handle:
         reader = csv.DictReader(handle)
@@ -211,46 +209,47 @@ def add_tax_breakdown(rows: List[OverviewRow]) -> None:
                 current_category = None
                 continue
             subcategory = label
-            values: Dict[int, float | None] = {}
+            values: Dict[int, int | None] = {}
             for year in YEARS:
-                values[year] = parse_german_number(line.get(str(year)))
-            rows.append(
-                OverviewRow(
-                    category=current_category,
-                    subcategory=subcategory,
-                    detail_type=detail_scope[current_category],
-                    product="",
-                    product_name="",
-                    metric="Ertrag",
-                    values=values,
-                )
+                values[year] = parse_integer(line.get(str(year)))
+            row = OverviewRow(
+                category=current_category,
+                subcategory=subcategory,
+                detail_type=detail_scope[current_category],
+                product="",
+                product_name="",
+                metric="Ertrag",
+                values=values,
             )
+            add_row(tree, categories[current_category], f"{row.detail_type}:{subcategory}", row)
 
 
-def add_gewerbesteuer_counts(rows: List[OverviewRow]) -> None:
+def add_gewerbesteuer_counts(tree: RollupTree, categories: Dict[str, RollupNode]) -> None:
+    gewerbesteuer = tree.add(categories["Steuern und ähnliche Abgaben"], "Steuerart:Gewerbesteuer")
     path = LAGE_DIR / "gewerbesteuer_betriebe_counts.csv"
     with path.open(encoding="utf-8") as handle:
         reader = csv.DictReader(handle)
         for line in reader:
             bracket = line["Kategorie"].strip()
-            values: Dict[int, float | None] = {}
+            values: Dict[int, int | None] = {}
             for year in YEARS:
-                values[year] = parse_german_number(line.get(str(year)))
-            rows.append(
-                OverviewRow(
-                    category="Steuern und ähnliche Abgaben",
-                    subcategory="Gewerbesteuer",
-                    detail_type=f"Betriebsgrößenklasse: {bracket}",
-                    product="",
-                    product_name=bracket,
-                    metric="Anzahl Betriebe",
-                    values=values,
-                    value_format="count",
-                )
+                values[year] = parse_integer(line.get(str(year)))
+            row = OverviewRow(
+                category="Steuern und ähnliche Abgaben",
+                subcategory="Gewerbesteuer",
+                detail_type=f"Betriebsgrößenklasse: {bracket}",
+                product="",
+                product_name=bracket,
+                metric="Anzahl Betriebe",
+                values=values,
+                value_format="count",
             )
+            add_row(tree, gewerbesteuer, row.detail_type, row)
 
 
-def write_rows(rows: Iterable[OverviewRow]) -> None:
+def write_rows(tree: RollupTree) -> None:
+    """Write the rows in hierarchy order, with subtotals filled in by the rollup."""
+
     output_path = BASE_DIR / "ertragsbestandteile_gesamtuebersicht.csv"
     fieldnames = [
         "Kategorie",
@@ -261,37 +260,52 @@ def write_rows(rows: Iterable[OverviewRow]) -> None:
         "Kennzahl",
         *YEAR_COLUMNS,
     ]
-    ordered_categories = {name: index for index, name in enumerate(CATEGORY_ORDER)}
-
-    def sort_key(item: OverviewRow) -> tuple[int, int, str, int, str, str]:
-        category_index = ordered_categories.get(item.category, len(ordered_categories))
-        detail_index = DETAIL_ORDER.get(item.detail_type, DETAIL_FALLBACK)
-        subcategory_index = 0 if item.subcategory == "Gesamtsumme" else 1
-        return (
-            category_index,
-            subcategory_index,
-            item.subcategory or "",
-            detail_index,
-            item.detail_type,
-            item.product or item.product_name,
-        )
-
-    sorted_rows = sorted(rows, key=sort_key)
-
     with output_path.open("w", newline="", encoding="utf-8") as handle:
         writer = csv.DictWriter(handle, fieldnames=fieldnames)
         writer.writeheader()
-        for row in sorted_rows:
+        for node in tree.walk():
+            row: OverviewRow | None = node.payload
+            if row is None:
+                continue
+            row.values = dict(zip(YEARS, node.values or [None] * len(YEARS)))
             writer.writerow(row.as_csv_row())
 
 
+def write_issue_report(tree: RollupTree, issues: List[RollupIssue]) -> None:
+    """List the parents whose children do not add up; a report of an earlier run is removed."""
+
+    report_path = BASE_DIR / "ertragsbestandteile_summenpruefung.csv"
+    if not issues:
+        report_path.unlink(missing_ok=True)
+        print("Summenprüfung: alle Zwischensummen stimmen.")
+        return
+    with report_path.open("w", newline="", encoding="utf-8") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(["Kategorie", "Unterkategorie", "Detailtyp der Teile", "Jahr", "Wert", "Summe der Teile"])
+        for issue in issues:
+            parent: OverviewRow | None = tree.node(issue.path).payload
+            writer.writerow(
+                [
+                    parent.category if parent else " / ".join(issue.path),
+                    parent.subcategory if parent else "",
+                    issue.breakdown,
+                    YEARS[issue.column],
+                    format_currency(issue.parent_value),
+                    format_currency(issue.children_sum),
+                ]
+            )
+    print(f"Summenprüfung: {len(issues)} Abweichungen -> {report_path}")
+
+
 def main() -> None:
-    rows: List[OverviewRow] = []
-    add_totals(rows)
-    add_teilergebnis_details(rows)
-    add_tax_breakdown(rows)
-    add_gewerbesteuer_counts(rows)
-    write_rows(rows)
+    tree = RollupTree(len(YEARS), BREAKDOWN_RULES)
+    categories = add_totals(tree)
+    add_tax_breakdown(tree, categories)
+    add_gewerbesteuer_counts(tree, categories)
+    add_teilergebnis_details(tree, categories)
+    issues = tree.rollup()
+    write_rows(tree)
+    write_issue_report(tree, issues)
 
 
 if __name__ == "__main__":
@@ -1,23 +1,30 @@
 from __future__ import annotations
 
+import argparse
 import csv
-import math
+import sys
 from collections import OrderedDict, defaultdict
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Iterable, Optional
+from typing import Iterable, Mapping, Optional, Sequence
 
 DATA_DIR = Path(__file__).resolve().parent
 OUTPUT_CSV = DATA_DIR / "ertragslage_2018-2024.csv"
 CSV_PATTERN = "ertragslage_20*.csv"
+# The report rounds every figure separately, so differences may be off by one cent.
+TOLERANCE_CENTS = 1
+
+sys.path.insert(0, str(DATA_DIR.parents[1] / "bin"))
+
+from cents import CENTS_SUFFIX, cents_path, format_german, parse_cents  # noqa: E402
 
 
 @dataclass(frozen=True)
 class ErtragslageRow:
     category: str
-    previous_value: Optional[float]
-    current_value: Optional[float]
-    difference: Optional[float]
+    previous_value: Optional[int]
+    current_value: Optional[int]
+    difference: Optional[int]
 
 
 @dataclass(frozen=True)
@@ -28,23 +35,37 @@ class ErtragslageTable:
     rows: list[ErtragslageRow]
 
 
-def parse_decimal(value: str | None) -> Optional[float]:
-    if value is None:
-        return None
-    text = value.strip()
-    if not text:
-        return None
-    text = text.replace(".", "").replace(",", ".")
+def parse_decimal(value: str | None) -> Optional[int]:
+    """Parse an amount of the extracted tables into integer cents."""
+
     try:
-        return float(text)
+        return parse_cents(value)
     except ValueError as exc:  # pragma: no cover - defensive
         raise ValueError(f"Cannot parse decimal value: {value!r}") from exc
 
 
-def format_decimal(value: Optional[float]) -> str:
-    if value is None:
-        return ""
-    return f"{value:,.2f}".replace(",", "_").replace(".", ",").replace("_", ".")
+def build_table(path: Path, fieldnames: Sequence[str], records: Iterable[Mapping[str, str]]) -> ErtragslageTable:
+    if len(fieldnames) != 4:
+        raise ValueError(f"Unexpected header structure in {path}")
+    category_header, previous_year, current_year, diff_header = fieldnames
+    if category_header != "Kategorie":
+        raise ValueError(f"Unexpected first header '{category_header}' in {path}")
+    rows: list[ErtragslageRow] = []
+    for record in records:
+        rows.append(
+            ErtragslageRow(
+                category=record["Kategorie"].strip(),
+                previous_value=parse_decimal(record[previous_year]),
+                current_value=parse_decimal(record[current_year]),
+                difference=parse_decimal(record[diff_header]),
+            )
+        )
+    return ErtragslageTable(
+        path=path,
+        previous_year=previous_year,
+        current_year=current_year,
+        rows=rows,
+    )
 
 
 def load_ertragslage_tables(files: Iterable[Path]) -> list[ErtragslageTable]:
@@ -52,34 +73,36 @@ def load_ertragslage_tables(files: Iterable[Path]) -> list[ErtragslageTable]:
     for path in sorted(files):
         with path.open(encoding="utf-8", newline="") as handle:
             reader = csv.DictReader(handle)
-            if reader.fieldnames is None or len(reader.fieldnames) != 4:
+            if reader.fieldnames is None:
                 raise ValueError(f"Unexpected header structure in {path}")
-            category_header, previous_year, current_year, diff_header = reader.fieldnames
-            if category_header != "Kategorie":
-                raise ValueError(f"Unexpected first header '{category_header}' in {path}")
-            rows: list[ErtragslageRow] = []
-            for record in reader:
-                rows.append(
-                    ErtragslageRow(
-                        category=record["Kategorie"].strip(),
-                        previous_value=parse_decimal(record[previous_year]),
-                        current_value=parse_decimal(record[current_year]),
-                        difference=parse_decimal(record[diff_header]),
-                    )
-                )
-            tables.append(
-                ErtragslageTable(
-                    path=path,
-                    previous_year=previous_year,
-                    current_year=current_year,
-                    rows=rows,
-                )
-            )
+            tables.append(build_table(path, reader.fieldnames, reader))
     if not tables:
         raise FileNotFoundError("No ertragslage CSV files were found")
     return tables
 
 
+def load_ertragslage_stream(records: Iterable[Mapping[str, object]]) -> list[ErtragslageTable]:
+    """Group NDJSON records of ``extract_ertragslage.py --ndjson`` into tables as they arrive.
+
+    Each record carries its source (``quelle``) and the columns of the CSV row;
+    the column order of the first record of a source defines the header.
+    """
+
+    fieldnames: dict[str, list[str]] = {}
+    grouped: defaultdict[str, list[dict[str, str]]] = defaultdict(list)
+    for record in records:
+        source = str(record["quelle"])
+        row = {key: "" if value is None else str(value) for key, value in record.items() if key != "quelle"}
+        fieldnames.setdefault(source, list(row))
+        grouped[source].append(row)
+    tables = [
+        build_table(Path(f"{source}.csv"), fieldnames[source], grouped[source]) for source in sorted(grouped)
+    ]
+    if not tables:
+        raise FileNotFoundError("No ertragslage records were found in the stream")
+    return tables
+
+
 def ensure_overlap_consistency(tables: list[ErtragslageTable]) -> None:
     for previous, current in zip(tables, tables[1:]):
         if previous.current_year != current.previous_year:
@@ -89,17 +112,17 @@ def ensure_overlap_consistency(tables: list[ErtragslageTable]) -> None:
             )
         previous_values = {row.category: row.current_value for row in previous.rows}
         current_values = {row.category: row.previous_value for row in current.rows}
-        mismatches: list[tuple[str, Optional[float], Optional[float]]] = []
+        mismatches: list[tuple[str, Optional[int], Optional[int]]] = []
         for category in sorted(set(previous_values) & set(current_values)):
             a = previous_values.get(category)
             b = current_values.get(category)
             if a is None and b is None:
                 continue
-            if a is None or b is None or not math.isclose(a, b, abs_tol=0.01):
+            if a is None or b is None or abs(a - b) > TOLERANCE_CENTS:
                 mismatches.append((category, a, b))
         if mismatches:
             details = "; ".join(
-                f"{category}: {a!r} vs {b!r}" for category, a, b in mismatches
+                f"{category}: {format_german(a)!r} vs {format_german(b)!r}" for category, a, b in mismatches
             )
             raise ValueError(
                 f"Overlapping year '{previous.current_year}' contains mismatched values: {details}"
@@ -114,16 +137,18 @@ def ensure_difference_consistency(table: ErtragslageTable) -> None:
         if prev_value is None or curr_value is None or diff_value is None:
             continue
         expected = curr_value - prev_value
-        if not math.isclose(expected, diff_value, abs_tol=0.01):
+        if abs(expected - diff_value) > TOLERANCE_CENTS:
             raise ValueError(
                 f"Difference mismatch for '{row.category}' in {table.current_year}: "
-                f"expected {expected:.2f}, found {diff_value:.2f}"
+                f"expected {format_german(expected)}, found {format_german(diff_value)}"
             )
 
 
-def build_combined_table(tables: list[ErtragslageTable]) -> list[list[str]]:
+def build_combined_table(tables: list[ErtragslageTable]) -> tuple[list[str], list[tuple[str, list[Optional[int]]]]]:
+    """Return the header and one row of integer cents per category across all years."""
+
     category_order: OrderedDict[str, None] = OrderedDict()
-    values: defaultdict[str, dict[str, Optional[float]]] = defaultdict(dict)
+    values: defaultdict[str, dict[str, Optional[int]]] = defaultdict(dict)
     all_years: set[str] = set()
 
     for table in tables:
@@ -138,23 +163,52 @@ def build_combined_table(tables: list[ErtragslageTable]) -> list[list[str]]:
 
     sorted_years = sorted(all_years)
     header = ["Kategorie", *sorted_years]
-    data_rows: list[list[str]] = [header]
-    for category in category_order:
-        row = [category]
-        for year in sorted_years:
-            row.append(format_decimal(values[category].get(year)))
-        data_rows.append(row)
-    return data_rows
+    rows = [(category, [values[category].get(year) for year in sorted_years]) for category in category_order]
+    return header, rows
+
+
+def write_combined_table(header: list[str], rows: list[tuple[str, list[Optional[int]]]]) -> None:
+    """Write the German formatted table and its integer-cents sidecar for the later stages."""
+
+    with OUTPUT_CSV.open("w", encoding="utf-8", newline="") as handle, cents_path(OUTPUT_CSV).open(
+        "w", encoding="utf-8", newline=""
+    ) as cents_handle:
+        writer = csv.writer(handle)
+        cents_writer = csv.writer(cents_handle)
+        writer.writerow(header)
+        cents_writer.writerow(header)
+        for category, cents in rows:
+            writer.writerow([category, *(format_german(value) for value in cents)])
+            cents_writer.writerow([category, *("" if value is None else value for value in cents)])
 
 
 def main() -> None:
-    csv_files = list(DATA_DIR.glob(CSV_PATTERN))
-    tables = load_ertragslage_tables(csv_files)
+    parser = argparse.ArgumentParser(description="Combine the yearly Ertragslage tables into one time series.")
+    parser.add_argument(
+        "--ndjson",
+        metavar="SOURCE",
+        help="Read rows from an NDJSON stream (file path or - for stdin) instead of the CSV files",
+    )
+    parser.add_argument(
+        "--follow",
+        action="store_true",
+        help="Keep reading a growing NDJSON file until its end-of-stream record",
+    )
+    args = parser.parse_args()
+
+    if args.ndjson:
+        from ndjson_stream import iter_ndjson
+
+        tables = load_ertragslage_stream(iter_ndjson(args.ndjson, follow=args.follow))
+    else:
+        csv_files = [
+            path
+            for path in DATA_DIR.glob(CSV_PATTERN)
+            if path != OUTPUT_CSV and not path.name.endswith(CENTS_SUFFIX)
+        ]
+        tables = load_ertragslage_tables(csv_files)
     ensure_overlap_consistency(tables)
-    combined_rows = build_combined_table(tables)
-    with OUTPUT_CSV.open("w", encoding="utf-8", newline="") as handle:
-        writer = csv.writer(handle)
-        writer.writerows(combined_rows)
+    write_combined_table(*build_combined_table(tables))
     print(f"Wrote {OUTPUT_CSV}")
 
 
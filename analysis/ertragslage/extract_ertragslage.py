@@ -1,20 +1,43 @@
 
 from __future__ import annotations
 
+import argparse
 import re
+import sys
+from contextlib import nullcontext
 from pathlib import Path
-from typing import List, Sequence
+from typing import Any, Iterable, List, Mapping, Optional, TextIO, Union
 
 import pandas as pd
 import pdfplumber
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "bin"))
+
+from ndjson_stream import open_writer  # noqa: E402
+from cents import parse_cents  # noqa: E402
+from fast_path_proofs import has_proof, proof_command, require_proof  # noqa: E402
+from provenance import Source, write_provenance  # noqa: E402
+from range_source import open_pdf  # noqa: E402
+from settings_tuner import Candidate, Evaluation, SettingsStore, choose_settings, report, tune  # noqa: E402
+from word_store import WordStore  # noqa: E402
+
 PDF_DIR = Path("input/balance")
 OUTPUT_DIR = Path("analysis/ertragslage")
-OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
 NUMBER_PATTERN = re.compile(r"^-?(?:\d{1,3}(?:\.\d{3})*|\d+),\d{2}-?$")
 COLUMN_HEADER_PATTERN = re.compile(r"^(?:\d{4}|Differenz)$", re.IGNORECASE)
 
+SEARCH_PAGES = 60
+
+# Candidates for the settings tuner, the hard-coded default first.
+WORD_FAMILY = "ertragslage"
+WORD_CANDIDATES = [
+    Candidate("text_flow", {"word_options": {"use_text_flow": True}, "y_tolerance": 1.5}),
+    Candidate("ohne_text_flow", {"word_options": {"use_text_flow": False}, "y_tolerance": 1.5}),
+    Candidate("ohne_text_flow_y3", {"word_options": {"use_text_flow": False}, "y_tolerance": 3}),
+]
+DEFAULT_WORD_SETTINGS = WORD_CANDIDATES[0].settings
+
 
 def clean_number(token: str) -> str:
     """Normalise a numeric token by moving a trailing hyphen to the front."""
@@ -24,70 +47,65 @@ def clean_number(token: str) -> str:
     return token
 
 
-def group_words_by_line(words: Sequence[dict], y_tolerance: float = 1.5) -> List[List[dict]]:
-    sorted_words = sorted(
-        words,
-        key=lambda w: (w.get("__page_index__", 0), w["top"], w["x0"]),
-    )
-    lines: List[List[dict]] = []
-    for word in sorted_words:
-        if not lines:
-            lines.append([word])
-            continue
-        last_line = lines[-1]
-        if (
-            word.get("__page_index__", 0) == last_line[0].get("__page_index__", 0)
-            and abs(word["top"] - last_line[0]["top"]) <= y_tolerance
-        ):
-            last_line.append(word)
-        else:
-            lines.append([word])
-    return lines
+def group_words_by_line(words: WordStore, y_tolerance: float = 1.5) -> List[List[str]]:
+    return words.line_tokens(y_tolerance)
 
 
 def extract_section_words(
-    pdf: pdfplumber.PDF, section_label: str = "6.4", next_section: str = "6.5"
-) -> List[dict]:
+    pdf: pdfplumber.PDF,
+    section_label: str = "6.4",
+    next_section: str = "6.5",
+    word_options: Mapping[str, Any] = DEFAULT_WORD_SETTINGS["word_options"],
+) -> WordStore:
     total_pages = len(pdf.pages)
-    search_start = max(0, total_pages - 60)
+    search_start = max(0, total_pages - SEARCH_PAGES)
     start_index = None
+    start_words: List[dict] = []
 
     for idx in range(search_start, total_pages):
-        words = pdf.pages[idx].extract_words(use_text_flow=True) or []
+        words = pdf.pages[idx].extract_words(**word_options) or []
         tokens = {w["text"].strip() for w in words}
         if any(token.startswith(section_label) for token in tokens) and "Ertragslage" in tokens:
             start_index = idx
+            start_words = words
             break
     if start_index is None:
         raise ValueError(f"Section '{section_label} Ertragslage' not found")
 
-    collected: List[dict] = []
+    collected: List[WordStore] = []
     for page_idx in range(start_index, total_pages):
-        words = pdf.pages[page_idx].extract_words(use_text_flow=True) or []
+        if page_idx == start_index:
+            words = start_words
+        else:
+            words = pdf.pages[page_idx].extract_words(**word_options) or []
         cutoff = None
         for word in words:
             token = word["text"].strip()
             if token.startswith(next_section):
                 cutoff = word["top"]
                 break
-        for word in words:
-            if cutoff is not None and word["top"] >= cutoff:
-                continue
-            word_copy = dict(word)
-            word_copy["__page_index__"] = page_idx
-            collected.append(word_copy)
+        collected.append(WordStore.from_words(words, page_idx, max_top=cutoff))
         if cutoff is not None:
             break
-    return collected
+    return WordStore.concat(collected)
 
 
-def parse_ertragslage_words(words: Sequence[dict]) -> tuple[List[str], List[List[str]]]:
-    lines = group_words_by_line(words)
+def parse_ertragslage_words(words: WordStore) -> tuple[List[str], List[List[str]]]:
+    columns, rows, _sources = parse_ertragslage_words_with_sources(words)
+    return columns, rows
+
+
+def parse_ertragslage_words_with_sources(
+    words: WordStore, y_tolerance: float = DEFAULT_WORD_SETTINGS["y_tolerance"]
+) -> tuple[List[str], List[List[str]], List[List[Source]]]:
+    """Parse the section like ``parse_ertragslage_words`` and keep the source of every number."""
+
     columns: List[str] | None = None
     rows: List[List[str]] = []
+    sources: List[List[Source]] = []
 
-    for line in lines:
-        tokens = [word["text"].strip() for word in sorted(line, key=lambda w: w["x0"])]
+    for indices in words.group_lines(y_tolerance):
+        tokens = words.words(indices)
         if not tokens:
             continue
         if tokens[0] in {"Gemeinde", "Lagebericht", "Seite", "erstellt"}:
@@ -96,18 +114,23 @@ def parse_ertragslage_words(words: Sequence[dict]) -> tuple[List[str], List[List
             continue
         while tokens and tokens[0] in {"6.4", "6,4"}:
             tokens = tokens[1:]
+            indices = indices[1:]
         if tokens and tokens[0] == "Ertragslage":
             tokens = tokens[1:]
+            indices = indices[1:]
         if all(COLUMN_HEADER_PATTERN.match(token) for token in tokens):
             columns = tokens
             continue
 
         numeric_tokens: List[str] = []
+        numeric_sources: List[Source] = []
         label_end = len(tokens)
         for index in range(len(tokens) - 1, -1, -1):
             token = tokens[index]
             if NUMBER_PATTERN.match(token):
                 numeric_tokens.insert(0, clean_number(token))
+                page, bbox = words.bounds(indices[index])
+                numeric_sources.insert(0, Source(page, bbox, token))
                 label_end = index
             else:
                 break
@@ -118,19 +141,84 @@ def parse_ertragslage_words(words: Sequence[dict]) -> tuple[List[str], List[List
         if not label:
             continue
         rows.append([label, *numeric_tokens])
+        sources.append(numeric_sources)
 
     if columns is None:
         raise ValueError("Column header row not found in section")
     if len(columns) != 3:
         raise ValueError(f"Unexpected number of columns: {columns}")
 
-    return columns, rows
+    return columns, rows, sources
+
+
+def extract_ertragslage(pdf_path: Union[Path, str]) -> pd.DataFrame:
+    return extract_ertragslage_with_sources(pdf_path)[0]
+
+
+def extract_ertragslage_with_sources(
+    pdf_path: Union[Path, str], settings: Optional[Mapping[str, Any]] = None
+) -> tuple[pd.DataFrame, List[List[Source]]]:
+    settings = settings or DEFAULT_WORD_SETTINGS
+    with open_pdf(pdf_path) as pdf:
+        words = extract_section_words(pdf, word_options=settings["word_options"])
+    columns, rows, sources = parse_ertragslage_words_with_sources(words, settings["y_tolerance"])
+    return build_ertragslage_frame(columns, rows), sources
+
 
+def differenz_violations(rows: List[List[str]]) -> List[str]:
+    """Rows whose Differenz is not the second year minus the first (one cent of rounding allowed)."""
+
+    violations = []
+    for label, *amounts in rows:
+        previous, current, differenz = (parse_cents(clean_number(amount)) for amount in amounts)
+        if None in (previous, current, differenz) or abs(current - previous - differenz) > 1:
+            violations.append(f"{label}: Differenz")
+    return violations
+
+
+def evaluate_word_settings(pdf: pdfplumber.PDF, candidate: Candidate) -> Evaluation:
+    words = extract_section_words(pdf, word_options=candidate.settings["word_options"])
+    columns, rows, _sources = parse_ertragslage_words_with_sources(words, candidate.settings["y_tolerance"])
+    build_ertragslage_frame(columns, rows)
+    return Evaluation((tuple(columns), tuple(row[0] for row in rows)), differenz_violations(rows))
+
+
+def tune_word_settings(pdf_path: Path, store: SettingsStore, log_stream: Any = None) -> Candidate:
+    """Try ``WORD_CANDIDATES`` on the Ertragslage section and store the fastest one that reconciles."""
 
-def extract_ertragslage(pdf_path: Path) -> pd.DataFrame:
     with pdfplumber.open(pdf_path) as pdf:
-        words = extract_section_words(pdf)
-    columns, rows = parse_ertragslage_words(words)
+        for page in pdf.pages[-SEARCH_PAGES:]:
+            page.chars  # parse the layout once, outside the timed runs
+        chosen, results = tune(WORD_CANDIDATES, lambda candidate: evaluate_word_settings(pdf, candidate))
+    store.record(WORD_FAMILY, pdf_path, chosen, results)
+    print(f"Word settings for {pdf_path.name}:", file=log_stream)
+    report(results, chosen, file=log_stream)
+    return chosen
+
+
+def proven_word_settings(year: str, pdf_path: Path, candidate: Candidate, log_stream: TextIO) -> Candidate:
+    """``candidate`` if the differential check proved it for ``pdf_path``, otherwise the default settings."""
+
+    fast_path = f"{WORD_FAMILY}={candidate.name}"
+    if candidate == WORD_CANDIDATES[0] or has_proof(fast_path, pdf_path):
+        return candidate
+    print(
+        f"Word settings {candidate.name} not proven for {pdf_path.name}, using {WORD_CANDIDATES[0].name}. "
+        f"Prove with: {proof_command(fast_path, year, pdf_path)}",
+        file=log_stream,
+    )
+    return WORD_CANDIDATES[0]
+
+
+def frame_sources(df: pd.DataFrame, sources: List[List[Source]]) -> Iterable[tuple[int, str, Source]]:
+    """Yield the provenance of every numeric cell of the frame built from ``sources``."""
+
+    for row_number, row_sources in enumerate(sources, start=1):
+        for column, source in zip(df.columns[1:], row_sources):
+            yield row_number, column, source
+
+
+def build_ertragslage_frame(columns: List[str], rows: List[List[str]]) -> pd.DataFrame:
     data = []
     for row in rows:
         if len(row) != 4:
@@ -141,16 +229,57 @@ def extract_ertragslage(pdf_path: Path) -> pd.DataFrame:
 
 
 def main() -> None:
-    pdf_files = sorted(PDF_DIR.glob("Schlussbilanz *.pdf"))
-    for pdf_file in pdf_files:
-        year_match = re.search(r"(20\d{2})", pdf_file.stem)
-        if not year_match:
-            continue
-        year = year_match.group(1)
-        df = extract_ertragslage(pdf_file)
-        output_path = OUTPUT_DIR / f"ertragslage_{year}.csv"
-        df.to_csv(output_path, index=False)
-        print(f"Wrote {output_path}")
+    parser = argparse.ArgumentParser(description="Extract section 6.4 Ertragslage from the Schlussbilanz PDFs.")
+    parser.add_argument(
+        "--ndjson",
+        metavar="TARGET",
+        help="Additionally emit every row as NDJSON as soon as it is parsed (file path or - for stdout)",
+    )
+    parser.add_argument(
+        "--tune",
+        action="store_true",
+        help=(
+            "First try cheaper word settings on each PDF and store the fastest one whose Differenz column "
+            "reconciles; later runs use the stored choice once bin/differential.py has proven it"
+        ),
+    )
+    parser.add_argument(
+        "--settings",
+        choices=[candidate.name for candidate in WORD_CANDIDATES],
+        help="Use these word settings (other than the default only with a proof from bin/differential.py)",
+    )
+    args = parser.parse_args()
+    if args.tune and args.settings:
+        raise SystemExit("--tune and --settings cannot be combined.")
+    log_stream = sys.stderr if args.ndjson == "-" else sys.stdout
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    store = SettingsStore()
+    # The NDJSON stream gets its end record after the last year, or an error record if a year fails.
+    with open_writer(args.ndjson) or nullcontext() as writer:
+        pdf_files = sorted(PDF_DIR.glob("Schlussbilanz *.pdf"))
+        for pdf_file in pdf_files:
+            year_match = re.search(r"(20\d{2})", pdf_file.stem)
+            if not year_match:
+                continue
+            year = year_match.group(1)
+            if args.settings:
+                candidate = next(candidate for candidate in WORD_CANDIDATES if candidate.name == args.settings)
+                if candidate != WORD_CANDIDATES[0]:
+                    require_proof(f"{WORD_FAMILY}={candidate.name}", year, pdf_file)
+            elif args.tune:
+                tuned = tune_word_settings(pdf_file, store, log_stream)
+                candidate = proven_word_settings(year, pdf_file, tuned, log_stream)
+            else:
+                stored = choose_settings(WORD_FAMILY, pdf_file, WORD_CANDIDATES, store)
+                candidate = proven_word_settings(year, pdf_file, stored, log_stream)
+            df, sources = extract_ertragslage_with_sources(pdf_file, candidate.settings)
+            output_path = OUTPUT_DIR / f"ertragslage_{year}.csv"
+            if writer is not None:
+                for record in df.to_dict(orient="records"):
+                    writer.write({"quelle": output_path.stem, **record})
+            df.to_csv(output_path, index=False)
+            write_provenance(output_path, pdf_file, frame_sources(df, sources))
+            print(f"Wrote {output_path}", file=log_stream)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""Compute derived KPIs (growth, CAGR, shares, plan attainment, volatility) from the zeitreihe tables."""
+
+from __future__ import annotations
+
+import argparse
+import re
+import sys
+import time
+import warnings
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parent
+ERGEBNIS_DIR = BASE_DIR.parent / "ergebnisrechnung"
+ERTRAGSLAGE_DIR = BASE_DIR.parent / "ertragslage"
+
+sys.path.insert(0, str(BASE_DIR.parents[1] / "bin"))
+
+from cents import CENTS_SUFFIX, cents_path  # noqa: E402
+
+YEAR_COLUMN_PATTERN = re.compile(r"(?:^|\s)(\d{4})$")
+ACCOUNT_KEY = ["Kontenbereich", "Lfd. Nr.", "Ertrags- und Aufwandsarten"]
+# Optional columns that separate otherwise identical rows, e.g. after a cross-municipality aggregation.
+PARTITION_COLUMNS = ["Gemeinde"]
+# Rows inspected to tell German (1.234,56) from plain (1234.56) number formats.
+FORMAT_SAMPLE_ROWS = 200
+
+
+@dataclass
+class Zeitreihe:
+    """A wide time-series table split into its key columns and a rows × years float matrix."""
+
+    keys: pd.DataFrame
+    years: List[int]
+    values: np.ndarray
+
+    def partition_columns(self) -> List[str]:
+        return [column for column in PARTITION_COLUMNS if column in self.keys.columns]
+
+
+def parse_numbers(frame: pd.DataFrame) -> np.ndarray:
+    """Parse German (``1.234,56``/``1.234,56-``) and plain (``1234.56``) numbers; blanks become NaN."""
+
+    cells = pd.Series(frame.to_numpy(dtype=object).ravel()).fillna("").astype(str).str.strip()
+    negative = cells.str.endswith("-").to_numpy()
+    text = cells.str.rstrip("-")
+    german = text.str.contains(",", regex=False)
+    text = text.where(~german, text.str.replace(".", "", regex=False).str.replace(",", ".", regex=False))
+    numbers = pd.to_numeric(text, errors="coerce").to_numpy(dtype=float)
+    return np.where(negative, -numbers, numbers).reshape(frame.shape)
+
+
+def load_zeitreihe(path: Path) -> Zeitreihe:
+    """Load a zeitreihe table; the year columns are parsed by the C reader of ``read_csv``.
+
+    The number format is detected from the first rows. Columns the reader
+    cannot convert (e.g. trailing minus signs) fall back to ``parse_numbers``.
+    Integer-cents sidecars (``*.cents.csv``) are converted to euros.
+    """
+
+    columns = pd.read_csv(path, nrows=0).columns
+    year_columns = [column for column in columns if YEAR_COLUMN_PATTERN.search(column)]
+    years = [int(YEAR_COLUMN_PATTERN.search(column).group(1)) for column in year_columns]
+    sample = pd.read_csv(path, usecols=year_columns, dtype=str, nrows=FORMAT_SAMPLE_ROWS, keep_default_na=False)
+    german = sample.apply(lambda column: column.str.contains(",", regex=False)).to_numpy().any()
+    frame = pd.read_csv(
+        path,
+        dtype={column: str for column in columns if column not in year_columns},
+        keep_default_na=False,
+        na_values={column: [""] for column in year_columns},
+        **({"decimal": ",", "thousands": "."} if german else {}),
+    )
+    values = np.empty((len(frame), len(year_columns)))
+    fallback = []
+    for offset, column in enumerate(year_columns):
+        if pd.api.types.is_numeric_dtype(frame[column]):
+            values[:, offset] = frame[column].to_numpy(dtype=float)
+        else:
+            fallback.append(offset)
+    if fallback:
+        values[:, fallback] = parse_numbers(frame[[year_columns[offset] for offset in fallback]])
+    if path.name.endswith(CENTS_SUFFIX):
+        values /= 100
+    keys = frame.drop(columns=year_columns).reset_index(drop=True)
+    return Zeitreihe(keys, years, values)
+
+
+def growth_rates(values: np.ndarray) -> np.ndarray:
+    """Year-over-year growth in percent; NaN where the previous value is missing or zero."""
+
+    previous, current = values[:, :-1], values[:, 1:]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rates = (current - previous) / np.abs(previous) * 100
+    return np.where(np.isfinite(rates), rates, np.nan)
+
+
+def first_last_valid(values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    valid = ~np.isnan(values)
+    first = np.argmax(valid, axis=1)
+    last = values.shape[1] - 1 - np.argmax(valid[:, ::-1], axis=1)
+    has_any = valid.any(axis=1)
+    return np.where(has_any, first, -1), np.where(has_any, last, -1)
+
+
+def cagr(values: np.ndarray, years: Sequence[int]) -> np.ndarray:
+    """Compound annual growth rate in percent between the first and last available positive values."""
+
+    first, last = first_last_valid(values)
+    rows = np.arange(values.shape[0])
+    year_array = np.asarray(years, dtype=float)
+    start = values[rows, first]
+    end = values[rows, last]
+    span = year_array[last] - year_array[first]
+    usable = (first >= 0) & (span > 0) & (start > 0) & (end > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rates = (np.power(end / start, 1 / np.where(span > 0, span, 1)) - 1) * 100
+    return np.where(usable, rates, np.nan)
+
+
+def volatility(values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Standard deviation of the growth rates and coefficient of variation of the levels, in percent."""
+
+    rates = growth_rates(values)
+    counts = (~np.isnan(rates)).sum(axis=1)
+    level_counts = (~np.isnan(values)).sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"), quiet_nan_warnings():
+        growth_std = np.where(counts >= 2, np.nanstd(rates, axis=1, ddof=1), np.nan)
+        mean = np.nanmean(values, axis=1)
+        level_std = np.where(level_counts >= 2, np.nanstd(values, axis=1, ddof=1), np.nan)
+        variation = np.where(mean != 0, level_std / np.abs(mean) * 100, np.nan)
+    return growth_std, variation
+
+
+@contextmanager
+def quiet_nan_warnings() -> Iterator[None]:
+    """Silence the RuntimeWarnings NumPy emits for all-NaN rows."""
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        yield
+
+
+def shares(values: np.ndarray, groups: np.ndarray, is_total: np.ndarray) -> np.ndarray:
+    """Share in percent of every row in the total row of its group (NaN for groups without a total)."""
+
+    group_count = int(groups.max()) + 1 if len(groups) else 0
+    total_row = np.full(group_count, -1)
+    total_row[groups[is_total]] = np.flatnonzero(is_total)
+    row_total = total_row[groups]
+    totals = np.where(row_total[:, None] >= 0, values[np.maximum(row_total, 0)], np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result = values / totals * 100
+    return np.where(np.isfinite(result), result, np.nan)
+
+
+def group_codes(keys: pd.DataFrame, columns: Sequence[str]) -> np.ndarray:
+    if not columns:
+        return np.zeros(len(keys), dtype=int)
+    codes, _ = pd.MultiIndex.from_frame(keys[list(columns)]).factorize()
+    return codes
+
+
+def align(target: Zeitreihe, other: Zeitreihe, key: Sequence[str]) -> np.ndarray:
+    """Return ``other``'s values in ``target``'s row and year order (NaN where missing)."""
+
+    target_index = pd.MultiIndex.from_frame(target.keys[list(key)])
+    other_index = pd.MultiIndex.from_frame(other.keys[list(key)])
+    positions = other_index.get_indexer(target_index)
+    year_positions = [other.years.index(year) if year in other.years else -1 for year in target.years]
+    aligned = np.full(target.values.shape, np.nan)
+    rows = positions >= 0
+    for column, source in enumerate(year_positions):
+        if source >= 0:
+            aligned[rows, column] = other.values[positions[rows], source]
+    return aligned
+
+
+def kpi_table(series: Zeitreihe, extra: Optional[Dict[str, np.ndarray]] = None) -> pd.DataFrame:
+    """Standard KPI columns for every row of ``series`` plus any ``extra`` per-year matrices."""
+
+    columns: Dict[str, np.ndarray] = {}
+    rates = growth_rates(series.values)
+    for offset, year in enumerate(series.years[1:]):
+        columns[f"Wachstum {year} %"] = rates[:, offset]
+    span = f"{series.years[0]}-{series.years[-1]}" if series.years else ""
+    columns[f"CAGR {span} %"] = cagr(series.values, series.years)
+    growth_std, variation = volatility(series.values)
+    columns["Volatilität Wachstum %"] = growth_std
+    columns["Variationskoeffizient %"] = variation
+    for label, matrix in (extra or {}).items():
+        for offset, year in enumerate(series.years):
+            columns[f"{label} {year} %"] = matrix[:, offset]
+    return pd.concat([series.keys, pd.DataFrame(columns)], axis=1)
+
+
+def ergebnisrechnung_kpis(ergebnis_dir: Path) -> pd.DataFrame:
+    ist = load_zeitreihe(cents_path(ergebnis_dir / "gesamt_ergebnisse_zeitreihe.csv"))
+    plan = load_zeitreihe(cents_path(ergebnis_dir / "gesamt_haushaltsplanung_zeitreihe.csv"))
+    key = [*ist.partition_columns(), *ACCOUNT_KEY]
+    planned = align(ist, plan, key)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        attainment = np.where(planned != 0, ist.values / planned * 100, np.nan)
+    table = kpi_table(ist, {"Planerfüllung": attainment})
+    with quiet_nan_warnings():
+        table["Planerfüllung Mittel %"] = np.nanmean(attainment, axis=1)
+    return table
+
+
+def teilergebnis_kpis(ergebnis_dir: Path) -> pd.DataFrame:
+    tables = []
+    for path in sorted(ergebnis_dir.glob("zeitreihe_*.csv")):
+        series = load_zeitreihe(path)
+        groups = group_codes(series.keys, [*series.partition_columns(), "Kontenbereich", "Lfd. Nr.", "Art"])
+        is_total = (series.keys["Scope"] == "Gesamtsumme").to_numpy()
+        table = kpi_table(series, {"Anteil an Gesamtsumme": shares(series.values, groups, is_total)})
+        table.insert(0, "Quelle", path.stem)
+        tables.append(table)
+    return pd.concat(tables, ignore_index=True) if tables else pd.DataFrame()
+
+
+def ertragsbestandteile_kpis(ertragslage_dir: Path) -> pd.DataFrame:
+    series = load_zeitreihe(ertragslage_dir / "ertragsbestandteile_gesamtuebersicht.csv")
+    keys = series.keys
+    partitions = series.partition_columns()
+    is_aggregate = (keys["Unterkategorie"] == "Gesamtsumme").to_numpy()
+    # Rows of a Kategorie relative to its Gesamtsumme; Gesamtsummen relative to all Erträge.
+    within = shares(series.values, group_codes(keys, [*partitions, "Kategorie"]), is_aggregate)
+    overall_total = is_aggregate & (keys["Kategorie"] == "Erträge").to_numpy()
+    overall = shares(series.values, group_codes(keys, partitions), overall_total)
+    share = np.where(is_aggregate[:, None], overall, within)
+    # Shares only make sense for euro rows; the Gewerbesteuer counts (Anzahl Betriebe) are not part of any sum.
+    is_currency = (keys["Kennzahl"] == "Ertrag").to_numpy()
+    share = np.where(is_currency[:, None], share, np.nan)
+    return kpi_table(series, {"Anteil": share})
+
+
+OUTPUTS = {
+    "kennzahlen_ergebnisrechnung.csv": lambda args: ergebnisrechnung_kpis(args.ergebnis_dir),
+    "kennzahlen_teilergebnisse.csv": lambda args: teilergebnis_kpis(args.ergebnis_dir),
+    "kennzahlen_ertragsbestandteile.csv": lambda args: ertragsbestandteile_kpis(args.ertragslage_dir),
+}
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--ergebnis-dir", type=Path, default=ERGEBNIS_DIR)
+    parser.add_argument("--ertragslage-dir", type=Path, default=ERTRAGSLAGE_DIR)
+    parser.add_argument("--output-dir", type=Path, default=BASE_DIR)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+    for name, build in OUTPUTS.items():
+        started = time.perf_counter()
+        table = build(args)
+        output_path = args.output_dir / name
+        table.to_csv(output_path, index=False, float_format="%.2f", decimal=",")
+        print(f"{output_path} erstellt (Zeilen: {len(table)}, {time.perf_counter() - started:.3f}s)")
+
+
+if __name__ == "__main__":
+    main()
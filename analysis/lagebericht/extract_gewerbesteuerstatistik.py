@@ -5,12 +5,18 @@ from __future__ import annotations
 import argparse
 import csv
 import re
+import sys
 from collections import defaultdict
 from pathlib import Path
-from typing import Dict, Iterable, List
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import quote
 
 import pdfplumber
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "bin"))
+
+from range_source import Source, open_pdf, source_name, transfer_summary  # noqa: E402
+
 PDF_DIR = Path("input/balance")
 OUTPUT_CSV = Path("analysis/lagebericht/gewerbesteuer_betriebe_counts.csv")
 CATEGORY_PATTERN = re.compile(r"^(?P<count>\d+)\s+(?P<label>.*?)\s+(?P<percent>\d{1,3},\d{2})\s*%$")
@@ -27,6 +33,12 @@ def clean_label(raw: str) -> str:
     return " ".join(label.split())
 
 
+def page_text_lines(page: pdfplumber.page.Page) -> List[str]:
+    """The text lines of a page as ``extract_text()`` lays them out; the committed counts were read from these."""
+
+    return (page.extract_text() or "").split("\n")
+
+
 def iter_gewerbesteuer_rows(text_lines: Iterable[str]) -> Iterable[tuple[str, int]]:
     capture = False
     for line in text_lines:
@@ -52,26 +64,46 @@ def iter_gewerbesteuer_rows(text_lines: Iterable[str]) -> Iterable[tuple[str, in
         yield label, count
 
 
-def extract_counts_for_year(pdf_path: Path) -> Dict[str, int]:
-    with pdfplumber.open(pdf_path) as pdf:
-        for page in reversed(pdf.pages):
-            text = page.extract_text() or ""
-            if "6.8 Entwicklung der Gemeinde" not in text:
-                continue
-            lines = text.split("\n")
-            rows = list(iter_gewerbesteuer_rows(lines))
-            if rows:
-                return dict(rows)
-    raise ExtractionError(f"Tabelle in {pdf_path.name} nicht gefunden")
+def find_counts(pdf: pdfplumber.PDF) -> Optional[Dict[str, int]]:
+    """Search the pages from the back for the Gewerbesteuer table and return its counts."""
+
+    for page in reversed(pdf.pages):
+        lines = page_text_lines(page)
+        if not any("6.8 Entwicklung der Gemeinde" in line for line in lines):
+            continue
+        rows = list(iter_gewerbesteuer_rows(lines))
+        if rows:
+            return dict(rows)
+    return None
+
+
+def extract_counts_for_year(pdf_path: Source) -> Dict[str, int]:
+    """The counts of one Schlussbilanz, from a local path or an HTTP(S) URL (read by byte ranges)."""
+
+    with open_pdf(pdf_path) as pdf:
+        counts = find_counts(pdf)
+        summary = transfer_summary(pdf)
+    if summary is not None:
+        print(summary)
+    if counts is None:
+        raise ExtractionError(f"Tabelle in {source_name(pdf_path)} nicht gefunden")
+    return counts
+
+
+def pdf_source(year: int, base_url: Optional[str] = None) -> Source:
+    name = f"Schlussbilanz {year}.pdf"
+    if base_url:
+        return f"{base_url.rstrip('/')}/{quote(name)}"
+    pdf_path = PDF_DIR / name
+    if not pdf_path.exists():
+        raise FileNotFoundError(pdf_path)
+    return pdf_path
 
 
-def collect_counts(years: List[int]) -> Dict[str, Dict[int, int]]:
+def collect_counts(years: List[int], base_url: Optional[str] = None) -> Dict[str, Dict[int, int]]:
     data: Dict[str, Dict[int, int]] = defaultdict(dict)
     for year in years:
-        pdf_path = PDF_DIR / f"Schlussbilanz {year}.pdf"
-        if not pdf_path.exists():
-            raise FileNotFoundError(pdf_path)
-        counts = extract_counts_for_year(pdf_path)
+        counts = extract_counts_for_year(pdf_source(year, base_url))
         for label, value in counts.items():
             data[label][year] = value
     return data
@@ -90,8 +122,10 @@ def write_csv(data: Dict[str, Dict[int, int]], years: List[int], output_path: Pa
             writer.writerow(row)
 
 
-def main(years: Iterable[int] | None = None, output: Path = OUTPUT_CSV) -> None:
+def main(years: Iterable[int] | None = None, output: Path = OUTPUT_CSV, base_url: Optional[str] = None) -> None:
     if years is None:
+        if base_url:
+            raise SystemExit("Mit --base-url müssen die Jahre (--years) angegeben werden.")
         years = sorted(
             int(path.stem.split()[-1])
             for path in PDF_DIR.glob("Schlussbilanz *.pdf")
@@ -99,7 +133,7 @@ def main(years: Iterable[int] | None = None, output: Path = OUTPUT_CSV) -> None:
         )
     else:
         years = sorted(years)
-    data = collect_counts(list(years))
+    data = collect_counts(list(years), base_url)
     write_csv(data, list(years), output)
 
 
@@ -107,5 +141,9 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description=__doc__)
     parser.add_argument("--years", nargs="*", type=int, help="Einschränkung auf bestimmte Jahre")
     parser.add_argument("--output", type=Path, default=OUTPUT_CSV, help="Pfad zur Ergebnis-CSV")
+    parser.add_argument(
+        "--base-url",
+        help="PDFs per HTTP-Range-Anfragen von diesem Dokumentserver lesen statt aus input/balance",
+    )
     args = parser.parse_args()
-    main(args.years, args.output)
+    main(args.years, args.output, args.base_url)
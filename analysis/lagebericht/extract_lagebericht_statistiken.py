@@ -0,0 +1,165 @@
+"""Extracts all recognised statistics tables of the Lagebericht in a single pass."""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+import pdfplumber
+
+from extract_gewerbesteuerstatistik import CATEGORY_PATTERN, PDF_DIR, clean_label, page_text_lines
+
+OUTPUT_CSV = Path("analysis/lagebericht/lagebericht_statistiken.csv")
+TAIL_PAGES = 60
+PAGE_FURNITURE = {"Gemeinde", "Lagebericht", "Seite", "erstellt"}
+
+
+@dataclass(frozen=True)
+class StatistikRow:
+    tabelle: str
+    kategorie: str
+    wert: str
+
+
+@dataclass(frozen=True)
+class StatistikTabelle:
+    """Declares a table by the line introducing it and the pattern of its rows.
+
+    ``parse_row`` turns a regex match into ``(Kategorie, Wert)`` or ``None`` for
+    rows to skip (e.g. totals). Capturing ends at the first non-matching line
+    after at least one row was read.
+    """
+
+    name: str
+    start_marker: str
+    row_pattern: re.Pattern[str]
+    parse_row: Callable[[re.Match[str]], Optional[tuple[str, str]]]
+
+
+def parse_gewerbesteuer_row(match: re.Match[str]) -> Optional[tuple[str, str]]:
+    if match.group("percent") == "100,00":
+        return None
+    label = clean_label(match.group("label"))
+    if not label:
+        return None
+    return label, str(int(match.group("count")))
+
+
+# Only tables checked against the Lagebericht pages of the Schlussbilanz PDFs are declared here; a new table needs
+# its real section heading as start_marker and a row pattern that stops at the end of the table.
+TABLES: Sequence[StatistikTabelle] = (
+    StatistikTabelle(
+        name="gewerbesteuer_betriebe",
+        start_marker="Bei der Gewerbesteuer ergibt sich",
+        row_pattern=CATEGORY_PATTERN,
+        parse_row=parse_gewerbesteuer_row,
+    ),
+)
+
+
+class TableCapture:
+    """Line-level state machine for one ``StatistikTabelle``."""
+
+    def __init__(self, table: StatistikTabelle):
+        self.table = table
+        self.capturing = False
+        self.done = False
+        self.rows: List[StatistikRow] = []
+
+    def feed(self, line: str) -> None:
+        if self.done:
+            return
+        if not self.capturing:
+            if self.table.start_marker in line:
+                self.capturing = True
+            return
+        match = self.table.row_pattern.match(line.strip())
+        if not match:
+            if self.rows:
+                self.done = True
+            return
+        parsed = self.table.parse_row(match)
+        if parsed is not None:
+            self.rows.append(StatistikRow(self.table.name, *parsed))
+
+
+def iter_statistik_rows(
+    text_lines: Iterable[str], tables: Sequence[StatistikTabelle] = TABLES
+) -> List[StatistikRow]:
+    """Feed every line once to all table captures and return their rows."""
+
+    captures = [TableCapture(table) for table in tables]
+    for line in text_lines:
+        for capture in captures:
+            capture.feed(line)
+        if all(capture.done for capture in captures):
+            break
+    return [row for capture in captures for row in capture.rows]
+
+
+def without_page_furniture(text_lines: Iterable[str]) -> Iterable[str]:
+    """Drop the page header and footer lines."""
+
+    for line in text_lines:
+        if line.split(" ", 1)[0] not in PAGE_FURNITURE:
+            yield line
+
+
+def iter_lagebericht_lines(pdf: pdfplumber.PDF, tail_pages: int = TAIL_PAGES) -> Iterable[str]:
+    """Yield the text lines of the document tail without page headers and footers.
+
+    The lines are those of ``page_text_lines``, from which ``find_counts`` reads the same Gewerbesteuer table.
+    """
+
+    total_pages = len(pdf.pages)
+    for page in pdf.pages[max(0, total_pages - tail_pages) :]:
+        yield from without_page_furniture(page_text_lines(page))
+
+
+def extract_statistiken_for_year(
+    pdf_path: Path, tables: Sequence[StatistikTabelle] = TABLES
+) -> List[StatistikRow]:
+    with pdfplumber.open(pdf_path) as pdf:
+        return iter_statistik_rows(iter_lagebericht_lines(pdf), tables)
+
+
+def write_csv(data: Dict[int, List[StatistikRow]], output_path: Path) -> None:
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with output_path.open("w", newline="", encoding="utf-8") as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=["Tabelle", "Kategorie", "Jahr", "Wert"])
+        writer.writeheader()
+        for year in sorted(data):
+            for row in data[year]:
+                writer.writerow(
+                    {"Tabelle": row.tabelle, "Kategorie": row.kategorie, "Jahr": year, "Wert": row.wert}
+                )
+
+
+def main(years: Iterable[int] | None = None, output: Path = OUTPUT_CSV) -> None:
+    if years is None:
+        years = [
+            int(path.stem.split()[-1])
+            for path in PDF_DIR.glob("Schlussbilanz *.pdf")
+            if path.stem.split()[-1].isdigit()
+        ]
+    data: Dict[int, List[StatistikRow]] = {}
+    for year in sorted(years):
+        pdf_path = PDF_DIR / f"Schlussbilanz {year}.pdf"
+        if not pdf_path.exists():
+            raise FileNotFoundError(pdf_path)
+        data[year] = extract_statistiken_for_year(pdf_path)
+        found = sorted({row.tabelle for row in data[year]})
+        print(f"{pdf_path.name}: {len(data[year])} Zeilen aus {', '.join(found) or 'keiner Tabelle'}")
+    write_csv(data, output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--years", nargs="*", type=int, help="Einschränkung auf bestimmte Jahre")
+    parser.add_argument("--output", type=Path, default=OUTPUT_CSV, help="Pfad zur Ergebnis-CSV")
+    args = parser.parse_args()
+    main(args.years, args.output)
@@ -0,0 +1,79 @@
+"""Compare serial, thread-pool and process-pool runs of ``iter_teilergebnis_tables``."""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+import pdfplumber
+
+from extract_account_teilergebnisse import (
+    iter_teilergebnis_tables,
+    iter_teilergebnis_tables_pooled,
+    teilergebnis_tables_job,
+)
+from page_pool import PagePool, gil_disabled, resolve_mode
+
+Tables = List[Tuple[str, str, List[List[str]]]]
+
+
+def run_serial(pdf_path: Path, account: str) -> Tables:
+    with pdfplumber.open(pdf_path) as pdf:
+        return list(iter_teilergebnis_tables(pdf, account))
+
+
+def run_gil_threads(pdf_path: Path, account: str, workers: int) -> Tables:
+    """Thread pool even under the GIL, to show what it costs on a regular interpreter."""
+
+    with pdfplumber.open(pdf_path) as pdf:
+        page_count = len(pdf.pages)
+    pool = PagePool(
+        pdf_path, lambda pdf, index: teilergebnis_tables_job((account,), pdf, index), "threads", workers, True
+    )
+    return [table for _index, tables in pool.map(range(page_count)) for table in tables]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("pdf", type=Path, help="Schlussbilanz-PDF")
+    parser.add_argument("account", help="Ertrags- oder Aufwandsart, z.B. 'Steuern und ähnliche Abgaben'")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=1, help="Durchläufe je Modus (das schnellste zählt)")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    print(f"Python {sys.version.split()[0]}, GIL {'aus' if gil_disabled() else 'an'}, {args.workers} Worker")
+    runs = {
+        "serial": lambda: run_serial(args.pdf, args.account),
+        "threads": lambda: list(iter_teilergebnis_tables_pooled(args.pdf, args.account, "threads", args.workers)),
+        "processes": lambda: list(iter_teilergebnis_tables_pooled(args.pdf, args.account, "processes", args.workers)),
+    }
+    if not gil_disabled():
+        runs["threads (mit GIL)"] = lambda: run_gil_threads(args.pdf, args.account, args.workers)
+    reference = None
+    baseline = None
+    for name, run in runs.items():
+        best = float("inf")
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            tables = run()
+            best = min(best, time.perf_counter() - started)
+        if reference is None:
+            reference, baseline = tables, best
+        status = "identisch" if tables == reference else "ABWEICHEND"
+        effective = resolve_mode(name.split()[0], args.workers, allow_gil_threads="GIL" in name)
+        print(
+            f"{name:<18} läuft als {effective:<9} {best:7.2f}s  x{baseline / best:4.2f}  "
+            f"{len(tables)} Tabellen, {status}"
+        )
+        if tables != reference:
+            raise SystemExit(f"Modus {name} liefert andere Tabellen als serial")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Exact money amounts as integer cents.
+
+Amounts are held as ``int`` cents inside every stage. Intermediate tables
+exchange them as ``*.cents.csv`` sidecars with plain integer cells; German
+formatting ("1.234,56") is applied only when a table is written for readers.
+"""
+
+from __future__ import annotations
+
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from pathlib import Path
+from typing import Optional
+
+CENTS_SUFFIX = ".cents.csv"
+CENT = Decimal("0.01")
+
+
+def from_decimal(value: Decimal) -> int:
+    return int(value.quantize(CENT, rounding=ROUND_HALF_UP).scaleb(2))
+
+
+def to_decimal(cents: int) -> Decimal:
+    return Decimal(cents).scaleb(-2)
+
+
+def parse_cents(text: Optional[str]) -> Optional[int]:
+    """Parse German (``1.234,56``, ``1.234,56-``) or plain (``-1234.56``) amounts; blanks are ``None``.
+
+    Raises ``ValueError`` for text that is not an amount.
+    """
+
+    if text is None:
+        return None
+    value = text.strip()
+    if not value:
+        return None
+    negative = value.endswith("-")
+    if negative:
+        value = value[:-1].strip()
+    if "," in value:
+        value = value.replace(".", "").replace(" ", "").replace(",", ".")
+    try:
+        cents = from_decimal(Decimal(value))
+    except InvalidOperation as exc:
+        raise ValueError(f"Kein Betrag: {text!r}") from exc
+    return -cents if negative else cents
+
+
+def format_german(cents: Optional[int]) -> str:
+    """``123456`` → ``1.234,56``; for exports read by people."""
+
+    if cents is None:
+        return ""
+    sign = "-" if cents < 0 else ""
+    whole, fraction = divmod(abs(cents), 100)
+    return f"{sign}{whole:,}".replace(",", ".") + f",{fraction:02d}"
+
+
+def format_fixed(cents: Optional[int]) -> str:
+    """``-123456`` → ``-1234.56``; the plain two-decimal text of the machine-readable tables."""
+
+    if cents is None:
+        return ""
+    sign = "-" if cents < 0 else ""
+    whole, fraction = divmod(abs(cents), 100)
+    return f"{sign}{whole}.{fraction:02d}"
+
+
+def cents_path(path: Path) -> Path:
+    """``gesamt_ergebnisse_zeitreihe.csv`` → ``gesamt_ergebnisse_zeitreihe.cents.csv``."""
+
+    return path.with_name(path.stem + CENTS_SUFFIX)
@@ -0,0 +1,127 @@
+"""Page-granular checkpoints so that long extraction runs can be resumed."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+
+# A killed process loses nothing that was flushed; fsync is batched to bound what a power loss can take.
+FSYNC_INTERVAL = 2.0
+
+
+def checkpoint_path(directory: Path, stem: str, scope: str) -> Path:
+    """One checkpoint file per scope, so that a fresh run never wipes the progress of another account set."""
+
+    digest = hashlib.sha256(scope.encode("utf-8")).hexdigest()[:12]
+    return directory / f".{stem}.{digest}.checkpoint.jsonl"
+
+
+def document_key(pdf_path: Path, scope: str) -> str:
+    """Identify a document pass; a modified PDF never resumes from old progress."""
+
+    stat = pdf_path.stat()
+    return f"{pdf_path.name}|{stat.st_size}|{stat.st_mtime_ns}|{scope}"
+
+
+class DocumentProgress:
+    """Progress of one pass over one document inside a ``Checkpoint``."""
+
+    def __init__(self, checkpoint: "Checkpoint", key: str):
+        self.checkpoint = checkpoint
+        self.key = key
+        self.pages: List[Dict[str, Any]] = []
+        self.result: Optional[Any] = None
+        self.done = False
+
+    @property
+    def next_page(self) -> int:
+        return self.pages[-1]["page"] + 1 if self.pages else 0
+
+    def record_page(self, page_index: int, payload: Any) -> None:
+        record = {"document": self.key, "page": page_index, "payload": payload}
+        self.pages.append(record)
+        self.checkpoint.append(record)
+
+    def finish(self, result: Any = None) -> None:
+        self.result = result
+        self.done = True
+        self.checkpoint.append({"document": self.key, "done": True, "result": result})
+
+    def payloads(self) -> List[Any]:
+        return [record["payload"] for record in self.pages]
+
+
+class Checkpoint:
+    """Append-only JSON Lines log of completed pages and documents.
+
+    Every record is flushed before the next page is processed, so an
+    interrupted run loses at most the page that was being extracted. Records
+    are fsynced at most every ``FSYNC_INTERVAL`` seconds and on close, so that
+    a power loss costs the last seconds of work rather than every page an
+    fsync. A truncated last line (from a crash while writing) is ignored on
+    resume.
+    """
+
+    def __init__(self, path: Path, resume: bool = False):
+        self.path = path
+        self._documents: Dict[str, DocumentProgress] = {}
+        self._synced_at = time.monotonic()
+        if resume and path.exists():
+            self._load()
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text("", encoding="utf-8")
+        self._handle = path.open("a", encoding="utf-8")
+
+    def _load(self) -> None:
+        valid_length = 0
+        with self.path.open("rb") as handle:
+            for line in handle:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                valid_length += len(line)
+                progress = self.document(record["document"])
+                if record.get("done"):
+                    progress.done = True
+                    progress.result = record.get("result")
+                else:
+                    progress.pages.append(record)
+        with self.path.open("r+b") as handle:
+            handle.truncate(valid_length)
+
+    def document(self, key: str) -> DocumentProgress:
+        if key not in self._documents:
+            self._documents[key] = DocumentProgress(self, key)
+        return self._documents[key]
+
+    def append(self, record: Dict[str, Any]) -> None:
+        self._handle.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._handle.flush()
+        if time.monotonic() - self._synced_at >= FSYNC_INTERVAL:
+            self._sync()
+
+    def _sync(self) -> None:
+        os.fsync(self._handle.fileno())
+        self._synced_at = time.monotonic()
+
+    def close(self, remove: bool = False) -> None:
+        if not remove:
+            self._sync()
+        self._handle.close()
+        if remove:
+            self.path.unlink(missing_ok=True)
+
+    def __enter__(self) -> "Checkpoint":
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        self.close(remove=exc_type is None)
@@ -0,0 +1,402 @@
+"""Differential check of the fast extraction paths against the reference extractors.
+
+Every fast path (a page pool, supervised page workers, cheaper table or word
+settings, the resident server, the single-pass section engine and its split
+into page ranges by the work queue) has to produce exactly the CSVs the
+reference run produces. For one
+Schlussbilanz this script runs the reference command and each selected fast
+path as the production CLIs, each in its own temporary working directory, and
+compares every CSV the reference wrote cell by cell with the fast path's. It
+reports whether they are identical and the speed-up, and records a proof in
+``analysis/fast_path_proofs.json`` for every fast path that matches (a
+mismatch revokes an earlier proof). The CLIs refuse or skip the opt-in fast
+paths for documents without a proof::
+
+    python bin/differential.py 2024 "Steuern und ähnliche Abgaben" --fast-paths page-mode=processes
+
+Times are wall-clock times of the whole command, interpreter start-up
+included, as a workflow calling the CLI would see them; the best of
+``--repeat`` runs counts. For the server paths the second of two runs is
+timed and compared, since the first one only fills the server's caches.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+BIN_DIR = Path(__file__).resolve().parent
+ERTRAGSLAGE_DIR = BIN_DIR.parent / "analysis" / "ertragslage"
+LAGEBERICHT_DIR = BIN_DIR.parent / "analysis" / "lagebericht"
+if str(ERTRAGSLAGE_DIR) not in sys.path:
+    sys.path.append(str(ERTRAGSLAGE_DIR))
+
+from extract_account_teilergebnisse import TABLE_CANDIDATES, TABLE_FAMILY  # noqa: E402
+from extract_ertragslage import WORD_CANDIDATES, WORD_FAMILY  # noqa: E402
+from extraction_server import DISABLE_ENV, SOCKET_ENV, connect  # noqa: E402
+from fast_path_proofs import TRIAL_ENV, ProofStore  # noqa: E402
+from sections import SECTIONS, is_page_local  # noqa: E402
+
+TEILERGEBNIS = "teilergebnis"
+ERGEBNISRECHNUNG = "ergebnisrechnung"
+ERTRAGSLAGE = "ertragslage"
+LAGEBERICHT = "lagebericht"
+PARTITIONEN = "partitionen"
+
+SERVER_START_TIMEOUT = 60.0
+
+
+@dataclass(frozen=True)
+class FastPath:
+    name: str
+    family: str
+    script: str
+    arguments: Tuple[str, ...] = ()
+    runs: int = 1
+    server: bool = False
+    directory: Path = BIN_DIR
+
+
+TEILERGEBNIS_SCRIPT = "extract_account_teilergebnisse"
+# The Schlussbilanz as the only partition, written below analysis/ so that its CSVs are compared. Only the
+# page-local sections are split into page ranges; the others run as a whole like in scheduler.py.
+PARTITION_ARGUMENTS = (
+    "--legacy-gemeinde",
+    "differential",
+    "--output-root",
+    "analysis/gemeinden",
+    "--workers",
+    "1",
+    "--sections",
+    *(name for name, spec in SECTIONS.items() if is_page_local(spec)),
+)
+
+REFERENCES = {
+    TEILERGEBNIS: FastPath("referenz", TEILERGEBNIS, TEILERGEBNIS_SCRIPT, ("--full",)),
+    ERGEBNISRECHNUNG: FastPath("referenz", ERGEBNISRECHNUNG, "extract_ergebnisrechnung"),
+    ERTRAGSLAGE: FastPath("referenz", ERTRAGSLAGE, "extract_ertragslage", directory=ERTRAGSLAGE_DIR),
+    LAGEBERICHT: FastPath("referenz", LAGEBERICHT, "extract_lagebericht_statistiken", directory=LAGEBERICHT_DIR),
+    PARTITIONEN: FastPath("referenz", PARTITIONEN, "scheduler", ("extract", *PARTITION_ARGUMENTS)),
+}
+
+FAST_PATHS = {
+    fast_path.name: fast_path
+    for fast_path in (
+        *(
+            FastPath(f"page-mode={mode}", TEILERGEBNIS, TEILERGEBNIS_SCRIPT, ("--full", "--page-mode", mode))
+            for mode in ("threads", "processes", "auto")
+        ),
+        *(
+            FastPath(
+                f"{TABLE_FAMILY}={candidate.name}",
+                TEILERGEBNIS,
+                TEILERGEBNIS_SCRIPT,
+                ("--full", "--settings", candidate.name),
+            )
+            for candidate in TABLE_CANDIDATES[1:]
+        ),
+        FastPath("supervised", TEILERGEBNIS, TEILERGEBNIS_SCRIPT, ("--full", "--supervised")),
+        FastPath("server", TEILERGEBNIS, TEILERGEBNIS_SCRIPT, ("--full",), runs=2, server=True),
+        FastPath("abschnitte", ERGEBNISRECHNUNG, "sections", ("--sections", "ergebnisrechnung")),
+        FastPath("abschnitte-ertragslage", ERTRAGSLAGE, "sections", ("--sections", "ertragslage")),
+        FastPath("abschnitte-statistiken", LAGEBERICHT, "sections", ("--sections", "lagebericht_statistiken")),
+        # Every page its own task: if single pages concatenate to the whole-document result, any split does.
+        FastPath("seitenbereiche", PARTITIONEN, "work_queue", ("local", *PARTITION_ARGUMENTS, "--pages-per-task", "1")),
+        FastPath("server-ergebnisrechnung", ERGEBNISRECHNUNG, "extract_ergebnisrechnung", runs=2, server=True),
+        *(
+            FastPath(
+                f"{WORD_FAMILY}={candidate.name}",
+                ERTRAGSLAGE,
+                "extract_ertragslage",
+                ("--settings", candidate.name),
+                directory=ERTRAGSLAGE_DIR,
+            )
+            for candidate in WORD_CANDIDATES[1:]
+        ),
+    )
+}
+
+# Fast paths whose output does not depend on the accounts; the others need at least one.
+ACCOUNT_FREE = {ERGEBNISRECHNUNG, ERTRAGSLAGE, LAGEBERICHT, PARTITIONEN}
+
+
+class RunFailed(Exception):
+    """Raised when a command of the check exits with an error."""
+
+
+@dataclass
+class CellDifference:
+    file: str
+    row: int
+    column: str
+    reference: Optional[str]
+    fast: Optional[str]
+
+
+@dataclass
+class Comparison:
+    files: int = 0
+    cells: int = 0
+    differences: List[CellDifference] = field(default_factory=list)
+
+    @property
+    def identical(self) -> bool:
+        return not self.differences
+
+
+@dataclass
+class RunResult:
+    seconds: float
+    outputs: Dict[str, List[List[str]]]
+
+
+def read_csv(path: Path) -> List[List[str]]:
+    with path.open(newline="", encoding="utf-8") as handle:
+        return list(csv.reader(handle))
+
+
+def collect_outputs(workspace: Path) -> Dict[str, List[List[str]]]:
+    """Every CSV below ``analysis/`` of a workspace, keyed by its relative path."""
+
+    root = workspace / "analysis"
+    return {path.relative_to(root).as_posix(): read_csv(path) for path in sorted(root.rglob("*.csv"))}
+
+
+def compare_outputs(reference: Dict[str, List[List[str]]], fast: Dict[str, List[List[str]]]) -> Comparison:
+    """Compare each reference CSV with the fast path's cell by cell; the header row names the columns."""
+
+    comparison = Comparison(files=len(reference))
+    for name, reference_rows in reference.items():
+        fast_rows = fast.get(name)
+        if fast_rows is None:
+            comparison.differences.append(CellDifference(name, 0, "", "vorhanden", None))
+            continue
+        header = reference_rows[0] if reference_rows else []
+        for row_number in range(max(len(reference_rows), len(fast_rows))):
+            reference_row = reference_rows[row_number] if row_number < len(reference_rows) else []
+            fast_row = fast_rows[row_number] if row_number < len(fast_rows) else []
+            for column in range(max(len(reference_row), len(fast_row))):
+                reference_cell = reference_row[column] if column < len(reference_row) else None
+                fast_cell = fast_row[column] if column < len(fast_row) else None
+                comparison.cells += 1
+                if reference_cell != fast_cell:
+                    label = header[column] if column < len(header) else str(column + 1)
+                    comparison.differences.append(
+                        CellDifference(name, row_number, label, reference_cell, fast_cell)
+                    )
+    for name in fast.keys() - reference.keys():
+        comparison.differences.append(CellDifference(name, 0, "", None, "vorhanden"))
+    return comparison
+
+
+def prepare_workspace(root: Path, name: str, year: str, pdf_path: Path) -> Path:
+    workspace = root / name.replace("=", "_")
+    input_dir = workspace / "input" / "balance"
+    input_dir.mkdir(parents=True)
+    (input_dir / f"Schlussbilanz {year}.pdf").symlink_to(pdf_path.resolve())
+    return workspace
+
+
+def command(fast_path: FastPath, year: str, accounts: Sequence[str]) -> List[str]:
+    leading = [year, *accounts] if fast_path.family == TEILERGEBNIS else []
+    return [sys.executable, str(fast_path.directory / f"{fast_path.script}.py"), *leading, *fast_path.arguments]
+
+
+def run_command(arguments: List[str], workspace: Path, env: Dict[str, str]) -> float:
+    started = time.perf_counter()
+    completed = subprocess.run(arguments, cwd=workspace, env=env, capture_output=True, text=True)
+    seconds = time.perf_counter() - started
+    if completed.returncode != 0:
+        lines = completed.stderr.strip().splitlines() or [f"Exit {completed.returncode}"]
+        raise RunFailed(lines[-1])
+    return seconds
+
+
+def start_server(workspace: Path, env: Dict[str, str]) -> subprocess.Popen:
+    socket_path = Path(env[SOCKET_ENV])
+    server = subprocess.Popen(
+        [sys.executable, str(BIN_DIR / "extraction_server.py"), "start", "--socket", str(socket_path)],
+        cwd=workspace,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        connection = connect(socket_path)
+        if connection is not None:
+            connection.close()
+            return server
+        if server.poll() is not None:
+            raise SystemExit(f"Extraktionsserver nicht gestartet:\n{server.stderr.read().strip()}")
+        time.sleep(0.1)
+    server.kill()
+    raise SystemExit("Extraktionsserver hat sich nicht rechtzeitig gemeldet.")
+
+
+def stop_server(server: subprocess.Popen, env: Dict[str, str]) -> None:
+    subprocess.run(
+        [sys.executable, str(BIN_DIR / "extraction_server.py"), "stop", "--socket", env[SOCKET_ENV]],
+        env=env,
+        capture_output=True,
+    )
+    try:
+        server.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        server.kill()
+
+
+def run_fast_path(
+    fast_path: FastPath, root: Path, year: str, pdf_path: Path, accounts: Sequence[str], attempt: int
+) -> RunResult:
+    """Run ``fast_path`` (or a reference) in a fresh workspace and time its last run."""
+
+    workspace = prepare_workspace(root, f"{fast_path.family}-{fast_path.name}-{attempt}", year, pdf_path)
+    env = {**os.environ, DISABLE_ENV: "0", TRIAL_ENV: "1"}
+    server = None
+    if fast_path.server:
+        env[SOCKET_ENV] = str(workspace / "server.sock")
+        del env[DISABLE_ENV]
+        server = start_server(workspace, env)
+    try:
+        seconds = 0.0
+        for _ in range(fast_path.runs):
+            seconds = run_command(command(fast_path, year, accounts), workspace, env)
+    finally:
+        if server is not None:
+            stop_server(server, env)
+    return RunResult(seconds, collect_outputs(workspace))
+
+
+def best_run(
+    fast_path: FastPath, root: Path, year: str, pdf_path: Path, accounts: Sequence[str], repeat: int
+) -> RunResult:
+    runs = [run_fast_path(fast_path, root, year, pdf_path, accounts, attempt) for attempt in range(repeat)]
+    return min(runs, key=lambda run: run.seconds)
+
+
+def write_difference_report(output_path: Path, differences: Sequence[Tuple[str, CellDifference]]) -> None:
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with output_path.open("w", newline="", encoding="utf-8") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(["schneller_pfad", "datei", "zeile", "spalte", "referenz", "schnell"])
+        for name, difference in differences:
+            writer.writerow(
+                [name, difference.file, difference.row, difference.column, difference.reference, difference.fast]
+            )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Vergleicht schnelle Extraktionspfade Zelle für Zelle mit der Referenzextraktion."
+    )
+    parser.add_argument("year", help="Haushaltsjahr (z.B. 2024)")
+    parser.add_argument(
+        "accounts",
+        nargs="*",
+        metavar="account",
+        help="Ertrags- oder Aufwandsarten für die Teilergebnis-Extraktion",
+    )
+    parser.add_argument(
+        "--pdf",
+        dest="pdf_path",
+        type=Path,
+        help="Pfad zur Schlussbilanz-PDF. Standard: input/balance/Schlussbilanz {Jahr}.pdf",
+    )
+    parser.add_argument(
+        "--fast-paths",
+        nargs="+",
+        choices=sorted(FAST_PATHS),
+        help="Zu prüfende schnelle Pfade. Standard: alle, die mit den angegebenen Konten möglich sind",
+    )
+    parser.add_argument("--repeat", type=int, default=1, help="Durchläufe je Pfad (der schnellste zählt)")
+    parser.add_argument("--max-differences", type=int, default=10, help="Angezeigte Abweichungen je Pfad")
+    parser.add_argument("--report", type=Path, help="Alle Abweichungen zusätzlich als CSV schreiben")
+    parser.add_argument("--no-record", action="store_true", help="Keine Nachweise speichern oder widerrufen")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    pdf_path = args.pdf_path or Path("input/balance") / f"Schlussbilanz {args.year}.pdf"
+    if not pdf_path.exists():
+        raise SystemExit(f"PDF nicht gefunden: {pdf_path}")
+    names = args.fast_paths or [
+        name for name, fast_path in FAST_PATHS.items() if args.accounts or fast_path.family in ACCOUNT_FREE
+    ]
+    selected = [FAST_PATHS[name] for name in names]
+    if not args.accounts and any(fast_path.family not in ACCOUNT_FREE for fast_path in selected):
+        raise SystemExit("Für die Teilergebnis-Pfade mindestens eine Ertrags- oder Aufwandsart angeben.")
+
+    store = None if args.no_record else ProofStore()
+    differences: List[Tuple[str, CellDifference]] = []
+    failed: List[str] = []
+    with tempfile.TemporaryDirectory(prefix="grn-differential-") as tmp:
+        root = Path(tmp)
+        references: Dict[str, RunResult] = {}
+        for fast_path in selected:
+            if fast_path.family not in references:
+                try:
+                    references[fast_path.family] = best_run(
+                        REFERENCES[fast_path.family], root, args.year, pdf_path, args.accounts, args.repeat
+                    )
+                except RunFailed as error:
+                    raise SystemExit(f"Referenzlauf ({fast_path.family}) fehlgeschlagen: {error}")
+                reference = references[fast_path.family]
+                if not reference.outputs:
+                    raise SystemExit(f"Referenzlauf ({fast_path.family}) hat keine CSV geschrieben.")
+                print(
+                    f"Referenz {fast_path.family:<17} {reference.seconds:7.2f}s  "
+                    f"{len(reference.outputs)} Dateien"
+                )
+            reference = references[fast_path.family]
+            try:
+                result = best_run(fast_path, root, args.year, pdf_path, args.accounts, args.repeat)
+            except RunFailed as error:
+                print(f"{fast_path.name:<26} fehlgeschlagen: {error}")
+                failed.append(fast_path.name)
+                if store is not None:
+                    store.revoke(fast_path.name, pdf_path)
+                continue
+            comparison = compare_outputs(reference.outputs, result.outputs)
+            status = "identisch" if comparison.identical else f"{len(comparison.differences)} ABWEICHUNGEN"
+            print(
+                f"{fast_path.name:<26} {result.seconds:7.2f}s  x{reference.seconds / result.seconds:5.2f}  "
+                f"{comparison.cells} Zellen in {comparison.files} Dateien: {status}"
+            )
+            for difference in comparison.differences[: args.max_differences]:
+                print(
+                    f"    {difference.file} Zeile {difference.row}, {difference.column or '-'}: "
+                    f"{difference.reference!r} != {difference.fast!r}"
+                )
+            differences.extend((fast_path.name, difference) for difference in comparison.differences)
+            if not comparison.identical:
+                failed.append(fast_path.name)
+            if store is None:
+                continue
+            accounts = args.accounts if fast_path.family == TEILERGEBNIS else ()
+            if comparison.identical:
+                store.record(
+                    fast_path.name, pdf_path, accounts, comparison.cells, reference.seconds, result.seconds
+                )
+            else:
+                store.revoke(fast_path.name, pdf_path)
+
+    if args.report is not None:
+        write_difference_report(args.report, differences)
+        print(f"Abweichungen -> {args.report}")
+    if failed:
+        raise SystemExit(f"Nicht nachgewiesen: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main()
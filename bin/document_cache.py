@@ -0,0 +1,120 @@
+"""Keep recently used PDFs open across extraction runs inside one process.
+
+Outside the resident extraction server nothing is cached: ``open_document``
+opens and closes the file like ``pdfplumber.open`` and ``memoise`` just
+computes. Once the server has installed a ``DocumentCache`` with
+``use_cache``, documents stay open between requests together with their
+page tree, the page texts (``page_text``) and any values memoised for them,
+such as the page fingerprints. The extractors close every page after use, so
+the parsed characters and layout of a page never outlive the request; what a
+resident document costs is its page texts, not its layout. A document is
+reopened as soon as its file's size or modification time changes.
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+import pdfplumber
+
+T = TypeVar("T")
+
+
+@dataclass
+class CachedDocument:
+    path: Path
+    signature: Tuple[int, int]
+    pdf: pdfplumber.PDF
+    memo: Dict[str, Any] = field(default_factory=dict)
+    hits: int = 0
+
+
+def file_signature(path: Path) -> Tuple[int, int]:
+    stat = path.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+class DocumentCache:
+    """LRU of open documents, at most ``max_documents`` at a time."""
+
+    def __init__(self, max_documents: int = 4):
+        self.max_documents = max_documents
+        self._documents: "OrderedDict[Path, CachedDocument]" = OrderedDict()
+
+    def get(self, path: Path) -> CachedDocument:
+        key = Path(path).resolve()
+        signature = file_signature(key)
+        cached = self._documents.get(key)
+        if cached is not None and cached.signature == signature:
+            self._documents.move_to_end(key)
+            cached.hits += 1
+            return cached
+        if cached is not None:
+            self._evict(key)
+        cached = CachedDocument(key, signature, pdfplumber.open(key))
+        self._documents[key] = cached
+        while len(self._documents) > self.max_documents:
+            self._evict(next(iter(self._documents)))
+        return cached
+
+    def find(self, pdf: pdfplumber.PDF) -> Optional[CachedDocument]:
+        for cached in self._documents.values():
+            if cached.pdf is pdf:
+                return cached
+        return None
+
+    def _evict(self, key: Path) -> None:
+        self._documents.pop(key).pdf.close()
+
+    def clear(self) -> None:
+        while self._documents:
+            self._evict(next(iter(self._documents)))
+
+    def status(self) -> List[Dict[str, Any]]:
+        return [
+            {"pdf": str(cached.path), "seiten": len(cached.pdf.pages), "treffer": cached.hits}
+            for cached in self._documents.values()
+        ]
+
+
+_cache: Optional[DocumentCache] = None
+
+
+def use_cache(cache: Optional[DocumentCache]) -> None:
+    global _cache
+    _cache = cache
+
+
+@contextmanager
+def open_document(path: Path) -> Iterator[pdfplumber.PDF]:
+    """Like ``pdfplumber.open``, but served from the active cache and left open there."""
+
+    if _cache is None:
+        with pdfplumber.open(path) as pdf:
+            yield pdf
+        return
+    yield _cache.get(path).pdf
+
+
+def memoise(pdf: pdfplumber.PDF, name: str, compute: Callable[[pdfplumber.PDF], T]) -> T:
+    """Compute ``compute(pdf)`` once per cached document; without a cache on every call."""
+
+    cached = _cache.find(pdf) if _cache is not None else None
+    if cached is None:
+        return compute(pdf)
+    if name not in cached.memo:
+        cached.memo[name] = compute(pdf)
+    return cached.memo[name]
+
+
+def page_text(pdf: pdfplumber.PDF, index: int) -> str:
+    """``extract_text()`` of a page, kept with a cached document so that the page itself can be closed."""
+
+    texts: Dict[int, str] = memoise(pdf, "page_texts", lambda _pdf: {})
+    if index not in texts:
+        texts[index] = pdf.pages[index].extract_text() or ""
+    return texts[index]
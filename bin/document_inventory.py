@@ -0,0 +1,362 @@
+"""Inventory of the Haushalt and Schlussbilanz PDFs and the dataset review built from it.
+
+For every PDF under ``input/budget`` and ``input/balance`` the scanner reads
+only the file header, the trailer and cross-reference table, the page tree,
+the document info and whether there is an outline, and hashes the file. No
+page content is parsed. Documents are scanned in a process pool, and a file
+whose size and modification time match the previous inventory
+(``analysis/dokumente_inventar.json``) is not opened at all, so that a rerun
+over unchanged input takes a fraction of a second.
+
+A document counts as complete if its cross-reference table could be read
+without falling back to a scan of the whole file, it ends with ``%%EOF`` and
+its page tree holds as many pages as its ``/Count`` says. The review in
+``analysis/dataset_review.md`` lists the documents, the years missing from
+either series (compared with the years covered by the other one), incomplete
+documents and the files that changed since the previous inventory.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from pdfminer.pdfdocument import PDFDocument
+from pdfminer.pdfparser import PDFParser
+from pdfminer.pdftypes import PDFObjRef, resolve1
+from pdfminer.psparser import PSLiteral
+from pdfminer.utils import decode_text
+
+from partitions import DOCUMENT_HAUSHALT, DOCUMENT_SCHLUSSBILANZ, LEGACY_FOLDERS, Partition, legacy_partitions
+from settings_tuner import document_id
+
+DEFAULT_MANIFEST = Path("analysis/dokumente_inventar.json")
+DEFAULT_REVIEW = Path("analysis/dataset_review.md")
+GEMEINDE = "lensahn"
+
+DOCUMENT_ORDER = (DOCUMENT_HAUSHALT, DOCUMENT_SCHLUSSBILANZ)
+DOCUMENT_TITLES = {DOCUMENT_HAUSHALT: "Haushaltsplanungen", DOCUMENT_SCHLUSSBILANZ: "Schlussbilanzen"}
+DOCUMENT_SHORT = {DOCUMENT_HAUSHALT: "Haushaltsplan", DOCUMENT_SCHLUSSBILANZ: "Schlussbilanz"}
+INFO_FIELDS = {"Title": "titel", "Producer": "erzeuger", "CreationDate": "erstellt"}
+
+# Bytes at the end of a file searched for the end-of-file marker.
+EOF_WINDOW = 2048
+
+
+@dataclass
+class DocumentRecord:
+    pfad: str
+    dokument: str
+    jahr: int
+    groesse: int
+    mtime_ns: int
+    sha: str = ""
+    pdf_version: str = ""
+    seiten: int = 0
+    seitenbaum: int = 0
+    gliederung: bool = False
+    eof: bool = False
+    xref_fallback: bool = False
+    info: Dict[str, str] = field(default_factory=dict)
+    fehler: str = ""
+
+    @property
+    def problems(self) -> List[str]:
+        problems = [] if self.eof else ["kein %%EOF am Dateiende"]
+        if self.fehler:
+            return [*problems, self.fehler]
+        if self.xref_fallback:
+            problems.append("Querverweistabelle nicht lesbar")
+        if self.seiten == 0 or self.seitenbaum != self.seiten:
+            problems.append(f"Seitenbaum mit {self.seitenbaum} statt {self.seiten} Seiten")
+        return problems
+
+
+def info_text(value: Any) -> str:
+    value = resolve1(value)
+    if isinstance(value, bytes):
+        return decode_text(value).strip()
+    if isinstance(value, PSLiteral):
+        return str(value.name)
+    return "" if value is None else str(value)
+
+
+def count_page_tree(pages: Any) -> int:
+    """Number of leaves of the page tree, reading only its nodes and no page content."""
+
+    leaves = 0
+    seen = set()
+    stack = [pages]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, PDFObjRef):
+            if node.objid in seen:
+                continue
+            seen.add(node.objid)
+        node = resolve1(node)
+        if not isinstance(node, dict):
+            continue
+        kids = resolve1(node.get("Kids"))
+        if kids is None:
+            leaves += 1
+        else:
+            stack.extend(reversed(kids))
+    return leaves
+
+
+def scan_document(partition: Partition) -> DocumentRecord:
+    stat = partition.path.stat()
+    record = DocumentRecord(
+        str(partition.path), partition.dokument, partition.jahr, stat.st_size, stat.st_mtime_ns
+    )
+    record.sha = document_id(partition.path)
+    with partition.path.open("rb") as handle:
+        header = handle.read(16)
+        handle.seek(max(0, stat.st_size - EOF_WINDOW))
+        record.eof = b"%%EOF" in handle.read()
+        handle.seek(0)
+        if header.startswith(b"%PDF-"):
+            record.pdf_version = header[5:8].decode("ascii", "replace")
+        try:
+            parser = PDFParser(handle)
+            document = PDFDocument(parser)
+            record.xref_fallback = bool(parser.fallback)
+            pages = document.catalog.get("Pages")
+            record.seiten = int(resolve1(resolve1(pages).get("Count", 0)))
+            record.seitenbaum = count_page_tree(pages)
+            record.gliederung = resolve1(document.catalog.get("Outlines")) is not None
+            info: Dict[str, Any] = {}
+            for entries in document.info:
+                info.update(entries)
+            record.info = {label: info_text(info[key]) for key, label in INFO_FIELDS.items() if key in info}
+        except Exception as error:  # noqa: BLE001 - a broken document is reported, not fatal
+            record.fehler = f"{type(error).__name__}: {error}"
+    return record
+
+
+def load_manifest(path: Path) -> Dict[str, DocumentRecord]:
+    if not path.exists():
+        return {}
+    data = json.loads(path.read_text(encoding="utf-8"))
+    return {record["pfad"]: DocumentRecord(**record) for record in data}
+
+
+def write_manifest(path: Path, records: Sequence[DocumentRecord]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    text = json.dumps([asdict(record) for record in records], ensure_ascii=False, indent=2) + "\n"
+    path.write_text(text, encoding="utf-8")
+
+
+def discover(input_dir: Path) -> List[Partition]:
+    return sorted(
+        partition for dokument in DOCUMENT_ORDER for partition in legacy_partitions(GEMEINDE, input_dir, dokument)
+    )
+
+
+def is_unchanged(partition: Partition, previous: Optional[DocumentRecord]) -> bool:
+    if previous is None:
+        return False
+    stat = partition.path.stat()
+    return previous.groesse == stat.st_size and previous.mtime_ns == stat.st_mtime_ns
+
+
+def scan_all(
+    partitions: Sequence[Partition], previous: Dict[str, DocumentRecord], workers: int, full: bool = False
+) -> Tuple[List[DocumentRecord], int]:
+    """Records for ``partitions`` in their order and the number of documents actually scanned."""
+
+    todo = [p for p in partitions if full or not is_unchanged(p, previous.get(str(p.path)))]
+    scanned: Dict[Path, DocumentRecord] = {}
+    if len(todo) > 1 and workers > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(todo))) as executor:
+            scanned = dict(zip((p.path for p in todo), executor.map(scan_document, todo)))
+    else:
+        scanned = {p.path: scan_document(p) for p in todo}
+    records = [scanned.get(p.path) or previous[str(p.path)] for p in partitions]
+    return records, len(todo)
+
+
+@dataclass
+class Changes:
+    neu: List[DocumentRecord] = field(default_factory=list)
+    geaendert: List[DocumentRecord] = field(default_factory=list)
+    entfernt: List[DocumentRecord] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.neu or self.geaendert or self.entfernt)
+
+
+def detect_changes(records: Sequence[DocumentRecord], previous: Dict[str, DocumentRecord]) -> Changes:
+    changes = Changes()
+    current = {record.pfad for record in records}
+    for record in records:
+        before = previous.get(record.pfad)
+        if before is None:
+            changes.neu.append(record)
+        elif before.sha != record.sha:
+            changes.geaendert.append(record)
+    changes.entfernt = [record for path, record in previous.items() if path not in current]
+    return changes
+
+
+def years_by_document(records: Sequence[DocumentRecord]) -> Dict[str, List[int]]:
+    return {dokument: sorted(r.jahr for r in records if r.dokument == dokument) for dokument in DOCUMENT_ORDER}
+
+
+def missing_years(records: Sequence[DocumentRecord]) -> Dict[str, List[int]]:
+    """Years of each series that the other series (or a gap in its own range) covers but it lacks."""
+
+    years = years_by_document(records)
+    covered = {year for present in years.values() for year in present}
+    if not covered:
+        return {}
+    expected = set(range(min(covered), max(covered) + 1))
+    return {
+        dokument: sorted(expected - set(present)) for dokument, present in years.items() if expected - set(present)
+    }
+
+
+def year_span(records: Sequence[DocumentRecord]) -> str:
+    years = sorted(record.jahr for record in records)
+    if not years:
+        return "keine Dateien vorhanden"
+    if len(years) == 1:
+        return f"Datei für das Jahr {years[0]} vorhanden"
+    gaps = sorted(set(range(years[0], years[-1] + 1)) - set(years))
+    without = f" (ohne {join_years(gaps)})" if gaps else ""
+    return f"Dateien für die Jahre {years[0]} bis {years[-1]}{without} vorhanden"
+
+
+def join_years(years: Sequence[int]) -> str:
+    labels = [str(year) for year in years]
+    return labels[0] if len(labels) == 1 else f"{', '.join(labels[:-1])} und {labels[-1]}"
+
+
+def missing_year_notes(records: Sequence[DocumentRecord]) -> List[str]:
+    notes = []
+    years = years_by_document(records)
+    for dokument, missing in missing_years(records).items():
+        present = years[dokument]
+        title = DOCUMENT_TITLES[dokument]
+        if not present:
+            notes.append(f"Für die {title} liegen keine Dateien vor (erwartet: {join_years(missing)}).")
+            continue
+        before = [year for year in missing if year < present[0]]
+        after = [year for year in missing if year > present[-1]]
+        gaps = [year for year in missing if present[0] < year < present[-1]]
+        if before:
+            notes.append(
+                f"Für die {title} fehlen die Jahre vor {present[0]} ({join_years(before)}), "
+                "die die andere Reihe bereits abdeckt."
+            )
+        if len(after) == 1:
+            notes.append(
+                f"Es liegt keine {DOCUMENT_SHORT[dokument]} für {after[0]} vor, "
+                "obwohl die andere Reihe dieses Jahr bereits enthält."
+            )
+        elif after:
+            notes.append(f"Für die {title} fehlen die Jahre nach {present[-1]} ({join_years(after)}).")
+        if gaps:
+            notes.append(f"Die {title} haben eine Lücke: {join_years(gaps)}.")
+    return notes
+
+
+def format_size(size: int) -> str:
+    return f"{size / 1_000_000:.1f} MB".replace(".", ",")
+
+
+def render_review(records: Sequence[DocumentRecord], changes: Changes, has_previous: bool) -> str:
+    lines = ["# Prüfung der Haushalts- und Bilanzdokumente der Gemeinde Lensahn", "", "## Überblick"]
+    by_type = {dokument: [r for r in records if r.dokument == dokument] for dokument in DOCUMENT_ORDER}
+    for dokument in DOCUMENT_ORDER:
+        folder = LEGACY_FOLDERS[dokument][0].capitalize()
+        lines.append(f"- **{DOCUMENT_TITLES[dokument]} ({folder})**: {year_span(by_type[dokument])}.")
+    incomplete = [record for record in records if record.problems]
+    lines.append("")
+    if incomplete:
+        lines.append(f"{len(incomplete)} von {len(records)} PDF-Dateien sind unvollständig oder nicht lesbar.")
+    else:
+        lines.append(
+            "Alle PDF-Dateien sind lesbar: Querverweistabelle und Seitenbaum sind intakt und die Dateien enden "
+            "mit `%%EOF`, die Dokumente wurden also vollständig übertragen."
+        )
+
+    notes = missing_year_notes(records)
+    notes.extend(f"{Path(record.pfad).name}: {'; '.join(record.problems)}." for record in incomplete)
+    lines.extend(["", "## Auffälligkeiten"])
+    lines.extend(f"- {note}" for note in notes or ["Keine."])
+
+    lines.extend(["", "## Änderungen seit der letzten Prüfung"])
+    if not has_previous:
+        lines.append("- Erste Prüfung, keine frühere Bestandsaufnahme vorhanden.")
+    elif not changes:
+        lines.append("- Keine.")
+    else:
+        lines.extend(f"- Neu: {Path(record.pfad).name}" for record in changes.neu)
+        lines.extend(
+            f"- Geändert: {Path(record.pfad).name} (neuer Hash {record.sha[:12]})" for record in changes.geaendert
+        )
+        lines.extend(f"- Entfernt: {Path(record.pfad).name}" for record in changes.entfernt)
+
+    lines.extend(["", "## Detailübersicht"])
+    for dokument in DOCUMENT_ORDER:
+        lines.extend(["", f"### {DOCUMENT_TITLES[dokument]} (input/{LEGACY_FOLDERS[dokument][0]})"])
+        lines.append("| Jahr | Datei | Seiten | Größe | PDF | Gliederung | SHA-256 | Status |")
+        lines.append("| --- | --- | ---: | ---: | --- | --- | --- | --- |")
+        for record in by_type[dokument]:
+            status = "; ".join(record.problems) or "vollständig"
+            lines.append(
+                f"| {record.jahr} | {Path(record.pfad).name} | {record.seiten} | {format_size(record.groesse)} "
+                f"| {record.pdf_version} | {'ja' if record.gliederung else 'nein'} | `{record.sha[:12]}` | {status} |"
+            )
+
+    recommendations = [
+        f"Ergänzung der {DOCUMENT_TITLES[dokument]} für {join_years(missing)}, sofern verfügbar."
+        for dokument, missing in missing_years(records).items()
+    ]
+    recommendations.extend(f"{Path(record.pfad).name} erneut beschaffen." for record in incomplete)
+    lines.extend(["", "## Empfehlung"])
+    lines.extend(f"- {item}" for item in recommendations or ["Keine Maßnahmen erforderlich."])
+    return "\n".join(lines) + "\n"
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Erfasst alle Haushalts- und Schlussbilanz-PDFs ohne Layoutanalyse und aktualisiert die Datenprüfung."
+        )
+    )
+    parser.add_argument("--input-dir", type=Path, default=Path("input"))
+    parser.add_argument("--manifest", type=Path, default=DEFAULT_MANIFEST)
+    parser.add_argument("--review", type=Path, default=DEFAULT_REVIEW)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--full", action="store_true", help="Auch unveränderte Dateien erneut einlesen")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    started = time.perf_counter()
+    partitions = discover(args.input_dir)
+    if not partitions:
+        raise SystemExit(f"Keine Haushalts- oder Schlussbilanz-PDFs unter {args.input_dir} gefunden.")
+    previous = load_manifest(args.manifest)
+    records, scanned = scan_all(partitions, previous, args.workers, args.full)
+    changes = detect_changes(records, previous)
+    write_manifest(args.manifest, records)
+    args.review.parent.mkdir(parents=True, exist_ok=True)
+    args.review.write_text(render_review(records, changes, bool(previous)), encoding="utf-8")
+    summary = f"{len(changes.neu)} neu, {len(changes.geaendert)} geändert, {len(changes.entfernt)} entfernt"
+    print(
+        f"{len(records)} Dokumente ({scanned} eingelesen; {summary}) in {time.perf_counter() - started:.2f}s "
+        f"-> {args.review}"
+    )
+
+
+if __name__ == "__main__":
+    main()
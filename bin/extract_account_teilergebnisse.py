@@ -5,18 +5,88 @@ from __future__ import annotations
 import argparse
 import csv
 import re
-from dataclasses import dataclass
+import sys
+from contextlib import nullcontext
+from dataclasses import dataclass, field
 from decimal import Decimal
+from functools import lru_cache, partial
 from pathlib import Path
-from typing import Iterable, List, Optional
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    Hashable,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    TextIO,
+    Tuple,
+)
+
+from extraction_server import forward_if_running
 
-import pdfplumber
+if __name__ == "__main__":
+    # Hand the call to a running extraction server before paying for the imports below.
+    forward_if_running(__file__)
+
+import pdfplumber  # noqa: E402
+
+from cents import parse_cents  # noqa: E402
+from checkpoint import Checkpoint, DocumentProgress, checkpoint_path, document_key  # noqa: E402
+from document_cache import memoise, open_document, page_text  # noqa: E402
+from fast_path_proofs import code_version, has_proof, proof_command, require_proof  # noqa: E402
+from ndjson_stream import open_writer  # noqa: E402
+from page_fingerprint import PageCache, document_fingerprints  # noqa: E402
+from page_pool import MODES as PAGE_MODES  # noqa: E402
+from page_pool import PagePool  # noqa: E402
+from page_watchdog import SupervisedDocument, write_issue_report  # noqa: E402
+from provenance import BBox, Source, extract_tables_with_cells, write_provenance  # noqa: E402
+from settings_tuner import (  # noqa: E402
+    Candidate,
+    Evaluation,
+    SettingsStore,
+    choose_settings,
+    report,
+    sample_evenly,
+    tune,
+)
+from page_matcher import (  # noqa: E402
+    MARKER_ERTRAGSARTEN,
+    MARKER_PRODUKT,
+    SECTION_ERGEBNISRECHNUNG,
+    SECTION_TEILERGEBNISRECHNUNG,
+    PageMatcher,
+    account_key,
+    build_page_matcher,
+)
 
 TABLE_SETTINGS = {
     "vertical_strategy": "lines",
     "horizontal_strategy": "lines",
 }
 
+# Candidates for the settings tuner, the hard-coded default first.
+TABLE_FAMILY = "tabellen"
+TABLE_CANDIDATES = [
+    Candidate("lines", TABLE_SETTINGS),
+    Candidate("lines_strict", {"vertical_strategy": "lines_strict", "horizontal_strategy": "lines_strict"}),
+    Candidate("lines_min_edge_10", {**TABLE_SETTINGS, "edge_min_length": 10}),
+    Candidate("lines_text", {"vertical_strategy": "lines", "horizontal_strategy": "text"}),
+    Candidate("text", {"vertical_strategy": "text", "horizontal_strategy": "text"}),
+]
+
+# Subtotal lines of the Ergebnisrechnung and Teilergebnisrechnung: Lfd. Nr. -> (Lfd. Nr., sign) of its parts.
+ERGEBNIS_SUBTOTALS = {
+    "10": tuple((str(number), 1) for number in range(1, 10)),
+    "17": tuple((str(number), 1) for number in range(11, 17)),
+    "18": (("10", 1), ("17", -1)),
+    "21": (("19", 1), ("20", 1)),
+    "22": (("18", 1), ("21", 1)),
+}
+
 
 @dataclass
 class AccountSummary:
@@ -24,6 +94,7 @@ class AccountSummary:
     laufende_nummer: str
     bezeichnung: str
     ist_ergebnis: Decimal
+    source: Optional[Source] = field(default=None, compare=False)
 
 
 @dataclass
@@ -31,6 +102,7 @@ class TeilergebnisEntry:
     produkt: str
     produkt_name: str
     ist_ergebnis: Decimal
+    source: Optional[Source] = field(default=None, compare=False)
 
 
 class ExtractionError(Exception):
@@ -74,8 +146,14 @@ def normalise_account_name(name: str) -> str:
 
 
 def extract_data_rows(table: List[List[Optional[str]]]) -> Iterable[List[str]]:
+    return (row for _index, row in iter_data_rows(table))
+
+
+def iter_data_rows(table: List[List[Optional[str]]]) -> Iterable[tuple[int, List[str]]]:
+    """Yield the data rows of a table together with their index in ``table``."""
+
     if not table:
-        return []
+        return
     width = len(table[0])
     start_index = 0
     for idx, row in enumerate(table):
@@ -84,101 +162,392 @@ def extract_data_rows(table: List[List[Optional[str]]]) -> Iterable[List[str]]:
         if first_non_empty.isdigit():
             start_index = idx
             break
-    for row in table[start_index:]:
-        normalised = normalise_row(row, width)
+    for index in range(start_index, len(table)):
+        normalised = normalise_row(table[index], width)
         if all(cell == "" for cell in normalised):
             continue
-        yield normalised
-
-
-def extract_ergebnis_summary(pdf: pdfplumber.PDF, account_name: str) -> AccountSummary:
-    target_name = normalise_account_name(account_name)
-    for page in pdf.pages:
-        text = page.extract_text() or ""
-        if "Ergebnisrechnung" not in text or "Ertrags-" not in text:
+        yield index, normalised
+
+
+def cell_source(
+    page_index: int, cells: List[List[Optional[BBox]]], row_index: int, column: int, raw: str
+) -> Optional[Source]:
+    row_cells = cells[row_index] if row_index < len(cells) else []
+    bbox = row_cells[column] if column < len(row_cells) else None
+    return Source(page_index, bbox, raw) if bbox is not None else None
+
+
+def iter_classified_pages(
+    pdf: pdfplumber.PDF, matcher: PageMatcher, start: int = 0
+) -> Iterable[tuple[int, pdfplumber.page.Page, FrozenSet[Hashable]]]:
+    """Yield index, page and the set of matcher keys found in its text, from ``start`` on.
+
+    Each page is closed once the caller moves on, so that a document kept open
+    by the extraction server does not accumulate the layout of every page.
+    """
+
+    for index in range(start, len(pdf.pages)):
+        page = pdf.pages[index]
+        try:
+            yield index, page, matcher.scan(page_text(pdf, index))
+        finally:
+            page.close()
+
+
+def extract_ergebnis_summaries(
+    pdf: pdfplumber.PDF,
+    account_names: Sequence[str],
+    matcher: Optional[PageMatcher] = None,
+    progress: Optional[DocumentProgress] = None,
+    settings: Mapping[str, Any] = TABLE_SETTINGS,
+) -> Dict[str, AccountSummary]:
+    if progress is not None and progress.done:
+        return {
+            name: AccountSummary(
+                kontenbereich=values[0],
+                laufende_nummer=values[1],
+                bezeichnung=values[2],
+                ist_ergebnis=Decimal(values[3]),
+                source=Source.from_list(values[4:]) if len(values) > 4 else None,
+            )
+            for name, values in progress.result.items()
+        }
+    targets = {normalise_account_name(name): name for name in account_names}
+    matcher = matcher or build_page_matcher(account_names)
+    summaries: Dict[str, AccountSummary] = {}
+    for index, page, hits in iter_classified_pages(pdf, matcher):
+        if SECTION_ERGEBNISRECHNUNG not in hits or MARKER_ERTRAGSARTEN not in hits:
             continue
-        tables = page.extract_tables(TABLE_SETTINGS)
-        for table in tables:
+        # No account filter here: a label wrapped or hyphenated in the page text would hide the page, while the
+        # table cells are matched after clean_cell. The Ergebnisrechnung is only a few pages long.
+        for table, cells in extract_tables_with_cells(page, settings):
             if not table or not table[0]:
                 continue
             first_cell = clean_cell(table[0][0])
             if "Ergebnisrechnung" not in first_cell:
                 continue
-            for row in extract_data_rows(table):
+            for row_index, row in iter_data_rows(table):
                 if len(row) < 6:
                     continue
-                if normalise_account_name(row[2]) != target_name:
+                name = normalise_account_name(row[2])
+                if name not in targets or targets[name] in summaries:
                     continue
-                ist_ergebnis = parse_german_number(row[5])
-                return AccountSummary(
+                summaries[targets[name]] = AccountSummary(
                     kontenbereich=clean_cell(row[0]),
                     laufende_nummer=clean_cell(row[1]),
-                    bezeichnung=normalise_account_name(row[2]),
-                    ist_ergebnis=ist_ergebnis,
+                    bezeichnung=name,
+                    ist_ergebnis=parse_german_number(row[5]),
+                    source=cell_source(index, cells, row_index, 5, row[5]),
                 )
-    raise ExtractionError(
-        f"Konnte die Ertrags- oder Aufwandsart '{account_name}' nicht in der Ergebnisrechnung finden."
-    )
+        if len(summaries) == len(targets):
+            break
+    missing = [name for name in account_names if name not in summaries]
+    if missing:
+        raise ExtractionError(
+            "Konnte die Ertrags- oder Aufwandsart '{}' nicht in der Ergebnisrechnung finden.".format(
+                "', '".join(missing)
+            )
+        )
+    if progress is not None:
+        progress.finish(summaries_to_payload(summaries))
+    return summaries
+
+
+def summaries_to_payload(summaries: Dict[str, AccountSummary]) -> Dict[str, List[Any]]:
+    return {
+        name: [
+            summary.kontenbereich,
+            summary.laufende_nummer,
+            summary.bezeichnung,
+            str(summary.ist_ergebnis),
+            *(summary.source.to_list() if summary.source else []),
+        ]
+        for name, summary in summaries.items()
+    }
+
+
+def extract_ergebnis_summary(pdf: pdfplumber.PDF, account_name: str) -> AccountSummary:
+    return extract_ergebnis_summaries(pdf, [account_name])[account_name]
 
 
 PRODUKT_PATTERN = re.compile(r"Produkt\s*-\s*(?P<num>\d+)\s*-\s*(?P<name>.+)")
 
 
-def iter_teilergebnis_tables(
-    pdf: pdfplumber.PDF, account_name: str
-) -> Iterable[tuple[str, str, List[List[str]]]]:
-    normalised_target = normalise_account_name(account_name)
-    for page in pdf.pages:
-        text = page.extract_text() or ""
-        if "Teilergebnisrechnung" not in text:
+def page_teilergebnis_tables(
+    page: pdfplumber.page.Page,
+    hits: FrozenSet[Hashable],
+    page_index: int = 0,
+    settings: Mapping[str, Any] = TABLE_SETTINGS,
+) -> List[tuple[str, str, List[List[str]], List[Optional[Source]]]]:
+    """Return the Teilergebnis tables of a page mentioning at least one matcher account.
+
+    Each table comes with the source of the Ist-Ergebnis cell of every row.
+    """
+
+    if SECTION_TEILERGEBNISRECHNUNG not in hits or MARKER_PRODUKT not in hits:
+        return []
+    if not any(isinstance(key, tuple) and key[0] == "account" for key in hits):
+        return []
+    result: List[tuple[str, str, List[List[str]], List[Optional[Source]]]] = []
+    for table, cells in extract_tables_with_cells(page, settings):
+        if not table or not table[0]:
             continue
-        if account_name not in text and normalised_target not in text:
+        header = clean_cell(table[0][0])
+        if "Teilergebnisrechnung" not in header:
             continue
-        tables = page.extract_tables(TABLE_SETTINGS)
-        for table in tables:
-            if not table or not table[0]:
-                continue
-            header = clean_cell(table[0][0])
-            if "Teilergebnisrechnung" not in header:
-                continue
-            match = PRODUKT_PATTERN.search(header)
-            if not match:
-                continue
-            produkt = match.group("num").strip()
-            produkt_name = match.group("name").strip()
-            rows = list(extract_data_rows(table))
-            if rows:
-                yield produkt, produkt_name, rows
+        match = PRODUKT_PATTERN.search(header)
+        if not match:
+            continue
+        produkt = match.group("num").strip()
+        produkt_name = match.group("name").strip()
+        rows: List[List[str]] = []
+        sources: List[Optional[Source]] = []
+        for row_index, row in iter_data_rows(table):
+            rows.append(row)
+            sources.append(cell_source(page_index, cells, row_index, 5, row[5]) if len(row) > 5 else None)
+        if rows:
+            result.append((produkt, produkt_name, rows, sources))
+    return result
 
 
-def extract_teilergebnis_entries(
+def iter_teilergebnis_page_tables(
+    pdf: pdfplumber.PDF, matcher: PageMatcher
+) -> Iterable[tuple[FrozenSet[Hashable], str, str, List[List[str]]]]:
+    """Yield Teilergebnis tables of pages mentioning at least one matcher account.
+
+    Each table comes with the page's hit set so that callers can dispatch the
+    rows to the accounts actually present on the page.
+    """
+
+    for index, page, hits in iter_classified_pages(pdf, matcher):
+        for produkt, produkt_name, rows, _sources in page_teilergebnis_tables(page, hits, index):
+            yield hits, produkt, produkt_name, rows
+
+
+def iter_teilergebnis_tables(
     pdf: pdfplumber.PDF, account_name: str
-) -> List[TeilergebnisEntry]:
-    target_name = normalise_account_name(account_name)
-    entries: List[TeilergebnisEntry] = []
-    for produkt, produkt_name, rows in iter_teilergebnis_tables(pdf, account_name):
-        for row in rows:
+) -> Iterable[tuple[str, str, List[List[str]]]]:
+    matcher = build_page_matcher([account_name])
+    for _hits, produkt, produkt_name, rows in iter_teilergebnis_page_tables(pdf, matcher):
+        yield produkt, produkt_name, rows
+
+
+@lru_cache(maxsize=None)
+def cached_page_matcher(account_names: tuple[str, ...]) -> PageMatcher:
+    return build_page_matcher(account_names)
+
+
+def teilergebnis_tables_job(
+    account_names: tuple[str, ...], pdf: pdfplumber.PDF, index: int
+) -> List[tuple[str, str, List[List[str]]]]:
+    """Page job for ``PagePool``: the Teilergebnis tables of one page."""
+
+    page = pdf.pages[index]
+    hits = cached_page_matcher(account_names).scan(page.extract_text() or "")
+    tables = [(produkt, name, rows) for produkt, name, rows, _sources in page_teilergebnis_tables(page, hits, index)]
+    page.close()
+    return tables
+
+
+def iter_teilergebnis_tables_pooled(
+    pdf_path: Path, account_name: str, mode: str = "auto", workers: int = 4
+) -> Iterable[tuple[str, str, List[List[str]]]]:
+    """``iter_teilergebnis_tables`` with the pages spread over a ``PagePool``."""
+
+    with pdfplumber.open(pdf_path) as pdf:
+        page_count = len(pdf.pages)
+    pool = PagePool(pdf_path, partial(teilergebnis_tables_job, (account_name,)), mode, workers)
+    for _index, tables in pool.map(range(page_count)):
+        yield from tables
+
+
+def teilergebnis_entries_job(
+    account_names: tuple[str, ...],
+    pdf: pdfplumber.PDF,
+    index: int,
+    settings: Mapping[str, Any] = TABLE_SETTINGS,
+) -> List[tuple[str, TeilergebnisEntry]]:
+    """Page job for ``PagePool``: the entries of one page, as ``parse_page_entries`` returns them."""
+
+    targets = {normalise_account_name(name): name for name in account_names}
+    page = pdf.pages[index]
+    hits = cached_page_matcher(account_names).scan(page.extract_text() or "")
+    entries = parse_page_entries(page, hits, index, targets, settings)
+    page.close()
+    return entries
+
+
+def entries_to_payload(page_entries: Sequence[tuple[str, TeilergebnisEntry]]) -> List[List[str]]:
+    return [
+        [
+            account_name,
+            entry.produkt,
+            entry.produkt_name,
+            str(entry.ist_ergebnis),
+            *(entry.source.to_list() if entry.source else []),
+        ]
+        for account_name, entry in page_entries
+    ]
+
+
+def entries_from_payload(payload: Iterable[Sequence[Any]]) -> List[tuple[str, TeilergebnisEntry]]:
+    return [
+        (
+            account_name,
+            TeilergebnisEntry(
+                produkt=produkt,
+                produkt_name=produkt_name,
+                ist_ergebnis=Decimal(ist_wert),
+                source=Source.from_list(source) if source else None,
+            ),
+        )
+        for account_name, produkt, produkt_name, ist_wert, *source in payload
+    ]
+
+
+def parse_page_entries(
+    page: pdfplumber.page.Page,
+    hits: FrozenSet[Hashable],
+    index: int,
+    targets: Dict[str, str],
+    settings: Mapping[str, Any] = TABLE_SETTINGS,
+) -> List[tuple[str, TeilergebnisEntry]]:
+    return table_entries(page_teilergebnis_tables(page, hits, index, settings), hits, targets)
+
+
+def table_entries(
+    tables: Iterable[tuple[str, str, List[List[str]], List[Optional[Source]]]],
+    hits: FrozenSet[Hashable],
+    targets: Dict[str, str],
+) -> List[tuple[str, TeilergebnisEntry]]:
+    """The non-zero rows of ``page_teilergebnis_tables`` output that belong to a target account on the page."""
+
+    page_entries: List[tuple[str, TeilergebnisEntry]] = []
+    for produkt, produkt_name, rows, sources in tables:
+        for row, source in zip(rows, sources):
             if len(row) < 6:
                 continue
-            if normalise_account_name(row[2]) != target_name:
+            name = normalise_account_name(row[2])
+            if name not in targets or account_key(name) not in hits:
                 continue
             ist_wert = parse_german_number(row[5])
             if ist_wert == 0:
                 continue
-            entries.append(
-                TeilergebnisEntry(
-                    produkt=produkt,
-                    produkt_name=produkt_name,
-                    ist_ergebnis=ist_wert,
+            page_entries.append(
+                (
+                    targets[name],
+                    TeilergebnisEntry(
+                        produkt=produkt,
+                        produkt_name=produkt_name,
+                        ist_ergebnis=ist_wert,
+                        source=source,
+                    ),
                 )
             )
-    if not entries:
-        raise ExtractionError(
-            f"Keine Teilergebnisse mit Betrag ungleich 0 für '{account_name}' gefunden."
-        )
+    return page_entries
+
+
+def extract_teilergebnis_entries_for_accounts(
+    pdf: pdfplumber.PDF,
+    account_names: Sequence[str],
+    matcher: Optional[PageMatcher] = None,
+    progress: Optional[DocumentProgress] = None,
+    on_entry: Optional[Callable[[str, TeilergebnisEntry], None]] = None,
+    page_cache: Optional[PageCache] = None,
+    pool: Optional[PagePool] = None,
+    settings: Mapping[str, Any] = TABLE_SETTINGS,
+) -> Dict[str, List[TeilergebnisEntry]]:
+    """Collect the Teilergebnisse of several accounts in a single pass over the PDF.
+
+    With ``progress``, the entries of every page are checkpointed and a resumed
+    run continues after the last completed page. With ``page_cache``, pages
+    whose fingerprint matches the previous revision are taken from the cache
+    instead of being extracted again. ``on_entry`` is called for every entry as
+    soon as its page has been parsed. With ``pool`` (running
+    ``teilergebnis_entries_job``), the remaining pages are parsed on the pool;
+    their results are still collected and checkpointed in page order.
+    ``settings`` are the table settings; the pool's job must be bound to the same.
+    """
+
+    targets = {normalise_account_name(name): name for name in account_names}
+    matcher = matcher or build_page_matcher(account_names)
+    entries: Dict[str, List[TeilergebnisEntry]] = {name: [] for name in account_names}
+
+    def collect(index: int, page_entries: List[tuple[str, TeilergebnisEntry]]) -> None:
+        for account_name, entry in page_entries:
+            entries[account_name].append(entry)
+            if on_entry is not None:
+                on_entry(account_name, entry)
+        if page_cache is not None:
+            page_cache.put(index, entries_to_payload(page_entries))
+
+    start_page = 0
+    if progress is not None:
+        for record in progress.pages:
+            collect(record["page"], entries_from_payload(record["payload"]))
+        start_page = progress.next_page
+    page_indices = [] if progress is not None and progress.done else range(start_page, len(pdf.pages))
+    pooled = None
+    if pool is not None:
+        pooled = pool.map(index for index in page_indices if page_cache is None or page_cache.get(index) is None)
+    for index in page_indices:
+        cached = page_cache.get(index) if page_cache is not None else None
+        if cached is not None:
+            page_entries = entries_from_payload(cached)
+        elif pooled is not None:
+            _index, page_entries = next(pooled)
+        else:
+            page = pdf.pages[index]
+            page_entries = parse_page_entries(page, matcher.scan(page_text(pdf, index)), index, targets, settings)
+            page.close()
+        collect(index, page_entries)
+        if progress is not None:
+            progress.record_page(index, entries_to_payload(page_entries))
+    if progress is not None and not progress.done:
+        progress.finish()
+    for account_name, account_entries in entries.items():
+        if not account_entries:
+            raise ExtractionError(
+                f"Keine Teilergebnisse mit Betrag ungleich 0 für '{account_name}' gefunden."
+            )
     return entries
 
 
+def extract_teilergebnis_entries(
+    pdf: pdfplumber.PDF, account_name: str
+) -> List[TeilergebnisEntry]:
+    return extract_teilergebnis_entries_for_accounts(pdf, [account_name])[account_name]
+
+
+OUTPUT_FIELDNAMES = [
+    "jahr",
+    "kontenbereich",
+    "laufende_nummer",
+    "art",
+    "scope",
+    "produkt",
+    "produkt_name",
+    "ist_ergebnis_eur",
+]
+
+
+def output_record(
+    year: str, summary: AccountSummary, entry: Optional[TeilergebnisEntry] = None
+) -> Dict[str, str]:
+    """Return the output row of the Gesamtsumme (``entry`` is None) or of a Teilergebnis."""
+
+    return {
+        "jahr": year,
+        "kontenbereich": summary.kontenbereich,
+        "laufende_nummer": summary.laufende_nummer,
+        "art": summary.bezeichnung,
+        "scope": "Gesamtsumme" if entry is None else "Teilergebnis",
+        "produkt": "" if entry is None else entry.produkt,
+        "produkt_name": "" if entry is None else entry.produkt_name,
+        "ist_ergebnis_eur": f"{(summary if entry is None else entry).ist_ergebnis:.2f}",
+    }
+
+
 def write_output_csv(
     output_path: Path,
     year: str,
@@ -186,44 +555,80 @@ def write_output_csv(
     entries: List[TeilergebnisEntry],
 ) -> None:
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    fieldnames = [
-        "jahr",
-        "kontenbereich",
-        "laufende_nummer",
-        "art",
-        "scope",
-        "produkt",
-        "produkt_name",
-        "ist_ergebnis_eur",
-    ]
     with output_path.open("w", newline="", encoding="utf-8") as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        writer = csv.DictWriter(csvfile, fieldnames=OUTPUT_FIELDNAMES)
         writer.writeheader()
-        writer.writerow(
-            {
-                "jahr": year,
-                "kontenbereich": summary.kontenbereich,
-                "laufende_nummer": summary.laufende_nummer,
-                "art": summary.bezeichnung,
-                "scope": "Gesamtsumme",
-                "produkt": "",
-                "produkt_name": "",
-                "ist_ergebnis_eur": f"{summary.ist_ergebnis:.2f}",
-            }
-        )
+        writer.writerow(output_record(year, summary))
         for entry in entries:
-            writer.writerow(
+            writer.writerow(output_record(year, summary, entry))
+
+
+def output_sources(
+    summary: AccountSummary, entries: List[TeilergebnisEntry]
+) -> Iterable[tuple[int, str, Optional[Source]]]:
+    """Yield the provenance of the Ist-Ergebnis of every row written by ``write_output_csv``."""
+
+    yield 1, "ist_ergebnis_eur", summary.source
+    for row_number, entry in enumerate(entries, start=2):
+        yield row_number, "ist_ergebnis_eur", entry.source
+
+
+REVISION_FIELDNAMES = ["seite", "art", "scope", "produkt", "produkt_name", "bisher_eur", "neu_eur"]
+
+
+def format_amount(value: Optional[Decimal]) -> str:
+    return "" if value is None else f"{value:.2f}"
+
+
+def revision_changes(page_cache: PageCache, summaries: Dict[str, AccountSummary]) -> List[Dict[str, str]]:
+    """List the figures that differ from the previous revision stored in ``page_cache``."""
+
+    changes: List[Dict[str, str]] = []
+    previous_summaries = page_cache.old_result or {}
+    for account, summary in summaries.items():
+        previous = previous_summaries.get(account)
+        previous_value = Decimal(previous[3]) if previous else None
+        if previous_value != summary.ist_ergebnis:
+            changes.append(
+                {
+                    "seite": str(summary.source.page + 1) if summary.source else "",
+                    "art": account,
+                    "scope": "Gesamtsumme",
+                    "produkt": "",
+                    "produkt_name": "",
+                    "bisher_eur": format_amount(previous_value),
+                    "neu_eur": format_amount(summary.ist_ergebnis),
+                }
+            )
+    for index in page_cache.changed_pages():
+        before = {(a, e.produkt): e for a, e in entries_from_payload(page_cache.previous(index) or [])}
+        after = {(a, e.produkt): e for a, e in entries_from_payload(page_cache.pages.get(index, []))}
+        for key in sorted(before.keys() | after.keys()):
+            old_entry, new_entry = before.get(key), after.get(key)
+            old_value = old_entry.ist_ergebnis if old_entry else None
+            new_value = new_entry.ist_ergebnis if new_entry else None
+            if old_value == new_value:
+                continue
+            changes.append(
                 {
-                    "jahr": year,
-                    "kontenbereich": summary.kontenbereich,
-                    "laufende_nummer": summary.laufende_nummer,
-                    "art": summary.bezeichnung,
+                    "seite": str(index + 1),
+                    "art": key[0],
                     "scope": "Teilergebnis",
-                    "produkt": entry.produkt,
-                    "produkt_name": entry.produkt_name,
-                    "ist_ergebnis_eur": f"{entry.ist_ergebnis:.2f}",
+                    "produkt": key[1],
+                    "produkt_name": (new_entry or old_entry).produkt_name,
+                    "bisher_eur": format_amount(old_value),
+                    "neu_eur": format_amount(new_value),
                 }
             )
+    return changes
+
+
+def write_revision_report(output_path: Path, changes: List[Dict[str, str]]) -> None:
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with output_path.open("w", newline="", encoding="utf-8") as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=REVISION_FIELDNAMES)
+        writer.writeheader()
+        writer.writerows(changes)
 
 
 def check_consistency(summary: AccountSummary, entries: List[TeilergebnisEntry]) -> None:
@@ -237,18 +642,118 @@ def check_consistency(summary: AccountSummary, entries: List[TeilergebnisEntry])
         )
 
 
+def amount_cents(text: str) -> Optional[int]:
+    try:
+        return parse_cents(text)
+    except ValueError:
+        return None
+
+
+def subtotal_violations(rows: Iterable[List[str]], context: str) -> List[str]:
+    """Check the subtotal lines of an Ergebnis- or Teilergebnisrechnung table, column by column.
+
+    A subtotal is only checked if at least one of its parts is in the table;
+    missing parts count as zero. Each part may be off by one cent of rounding.
+    """
+
+    values: Dict[str, List[Optional[int]]] = {}
+    for row in rows:
+        if len(row) >= 6:
+            values[clean_cell(row[1])] = [amount_cents(cell) for cell in row[3:]]
+    violations: List[str] = []
+    for total, parts in ERGEBNIS_SUBTOTALS.items():
+        present = [(number, sign) for number, sign in parts if number in values]
+        if total not in values or not present:
+            continue
+        for column, total_value in enumerate(values[total]):
+            if total_value is None:
+                continue
+            expected = sum(
+                sign * (values[number][column] or 0) for number, sign in present if column < len(values[number])
+            )
+            if abs(expected - total_value) > len(present):
+                violations.append(f"{context}: Zeile {total}, Spalte {column + 4}")
+    return violations
+
+
+def sample_table_pages(pdf: pdfplumber.PDF, size: int) -> List[int]:
+    """The Ergebnisrechnung pages and up to ``size`` Teilergebnisrechnung pages spread over the document."""
+
+    ergebnis: List[int] = []
+    teilergebnis: List[int] = []
+    for index, _page, hits in iter_classified_pages(pdf, cached_page_matcher(())):
+        if SECTION_TEILERGEBNISRECHNUNG in hits and MARKER_PRODUKT in hits:
+            teilergebnis.append(index)
+        elif SECTION_ERGEBNISRECHNUNG in hits and MARKER_ERTRAGSARTEN in hits:
+            ergebnis.append(index)
+    return sorted(ergebnis + sample_evenly(teilergebnis, size))
+
+
+def evaluate_table_settings(pdf: pdfplumber.PDF, pages: Sequence[int], candidate: Candidate) -> Evaluation:
+    structure = []
+    violations: List[str] = []
+    for index in pages:
+        for table, _cells in extract_tables_with_cells(pdf.pages[index], candidate.settings):
+            if not table or not table[0]:
+                continue
+            header = clean_cell(table[0][0])
+            if "Ergebnisrechnung" not in header and SECTION_TEILERGEBNISRECHNUNG not in header:
+                continue
+            rows = list(extract_data_rows(table))
+            structure.append((index, header, tuple(clean_cell(row[1]) for row in rows if len(row) > 1)))
+            violations.extend(subtotal_violations(rows, f"Seite {index + 1}"))
+    return Evaluation(tuple(structure), violations)
+
+
+def tune_table_settings(
+    pdf_path: Path, sample_size: int, store: SettingsStore, log_stream: Optional[TextIO] = None
+) -> Candidate:
+    """Try ``TABLE_CANDIDATES`` on a sample of ``pdf_path`` and store the fastest one that reconciles."""
+
+    with open_document(pdf_path) as pdf:
+        pages = sample_table_pages(pdf, sample_size)
+        if not pages:
+            raise ExtractionError(f"Keine Ergebnis- oder Teilergebnisrechnung in {pdf_path} gefunden.")
+        chosen, results = tune(TABLE_CANDIDATES, partial(evaluate_table_settings, pdf, pages))
+    store.record(TABLE_FAMILY, pdf_path, chosen, results)
+    print(f"Tabelleneinstellungen für {pdf_path.name} ({len(pages)} Stichprobenseiten):", file=log_stream)
+    report(results, chosen, file=log_stream)
+    return chosen
+
+
+def proven_settings(
+    year: str, pdf_path: Path, accounts: Sequence[str], candidate: Candidate, log_stream: TextIO
+) -> Candidate:
+    """``candidate`` if the differential check proved it for ``pdf_path``, otherwise the default settings."""
+
+    fast_path = f"{TABLE_FAMILY}={candidate.name}"
+    if candidate == TABLE_CANDIDATES[0] or has_proof(fast_path, pdf_path, accounts):
+        return candidate
+    print(
+        f"Tabelleneinstellungen {candidate.name} ohne Nachweis, verwende {TABLE_CANDIDATES[0].name}. "
+        f"Nachweis mit: {proof_command(fast_path, year, pdf_path, accounts)}",
+        file=log_stream,
+    )
+    return TABLE_CANDIDATES[0]
+
+
 def build_default_pdf_path(year: str) -> Path:
     return Path("input/balance") / f"Schlussbilanz {year}.pdf"
 
 
-def parse_args() -> argparse.Namespace:
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser(
         description=(
             "Extrahiert die Gesamtsumme und Teilergebnisse einer Ertrags- oder Aufwandsart aus einer Schlussbilanz."
         )
     )
     parser.add_argument("year", help="Haushaltsjahr (z.B. 2024)")
-    parser.add_argument("account", help="Bezeichnung der Ertrags- oder Aufwandsart")
+    parser.add_argument(
+        "accounts",
+        nargs="+",
+        metavar="account",
+        help="Bezeichnung der Ertrags- oder Aufwandsart (mehrere werden in einem Durchlauf extrahiert)",
+    )
     parser.add_argument(
         "--pdf",
         dest="pdf_path",
@@ -259,33 +764,234 @@ def parse_args() -> argparse.Namespace:
         "--output",
         dest="output_path",
         type=Path,
-        help="Pfad zur Ausgabedatei (CSV)",
+        help="Pfad zur Ausgabedatei (CSV, nur bei einer einzelnen Ertrags- oder Aufwandsart)",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Einen abgebrochenen Lauf ab der letzten abgeschlossenen Seite fortsetzen",
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Alle Seiten neu extrahieren, auch wenn ihr Fingerabdruck unverändert ist",
+    )
+    parser.add_argument(
+        "--supervised",
+        action="store_true",
+        help=(
+            "Seiten in überwachten Worker-Prozessen mit Zeit- und Speicherbudget extrahieren "
+            "(nur mit Nachweis aus bin/differential.py)"
+        ),
+    )
+    parser.add_argument(
+        "--page-mode",
+        choices=PAGE_MODES,
+        default="serial",
+        help=(
+            "Teilergebnis-Seiten parallel verarbeiten: threads (nur mit freigeschaltetem GIL, "
+            "z.B. CPython 3.13t), processes, auto oder serial. Ohne free-threaded Build "
+            "fallen threads und auto auf processes zurück."
+        ),
+    )
+    parser.add_argument(
+        "--workers", type=int, default=4, help="Anzahl Worker (mit --supervised oder --page-mode)"
+    )
+    parser.add_argument(
+        "--page-timeout", type=float, default=60.0, help="Zeitbudget je Seite in Sekunden (mit --supervised)"
+    )
+    parser.add_argument(
+        "--page-memory", type=int, default=2048, help="Speicherbudget je Worker in MB (mit --supervised)"
+    )
+    parser.add_argument(
+        "--tune",
+        action="store_true",
+        help=(
+            "Vorher günstigere Tabelleneinstellungen an einer Stichprobe prüfen und die schnellste, "
+            "deren Zwischensummen aufgehen, für dieses PDF speichern (spätere Läufe verwenden sie automatisch)"
+        ),
+    )
+    parser.add_argument(
+        "--tune-sample", type=int, default=12, help="Anzahl Teilergebnisrechnungs-Seiten der Stichprobe (mit --tune)"
+    )
+    parser.add_argument(
+        "--settings",
+        choices=[candidate.name for candidate in TABLE_CANDIDATES],
+        help="Bestimmte Tabelleneinstellungen verwenden (außer dem Standard nur mit Nachweis aus bin/differential.py)",
+    )
+    parser.add_argument(
+        "--ndjson",
+        metavar="ZIEL",
+        help="Zeilen zusätzlich sofort als NDJSON ausgeben (Dateipfad oder - für stdout)",
+    )
+    return parser.parse_args(argv)
+
+
+def server_proofs(argv: List[str]) -> List[Tuple[str, str, Path, Sequence[str]]]:
+    """The proof the extraction server needs before it runs this command line."""
+
+    args = parse_args(argv)
+    pdf_path = args.pdf_path or build_default_pdf_path(args.year)
+    return [("server", args.year, pdf_path, args.accounts)] if pdf_path.exists() else []
+
+
+def account_slug(account: str) -> str:
+    return account.lower().replace(" ", "_").replace(".", "")
+
+
+def build_default_output_path(year: str, account: str) -> Path:
+    return Path("analysis/ergebnisrechnung") / f"teilergebnis_{year}_{account_slug(account)}.csv"
 
 
 def main() -> None:
     args = parse_args()
     year = args.year
-    account = args.account
+    accounts = args.accounts
+    if args.output_path and len(accounts) > 1:
+        raise SystemExit("--output ist nur mit einer einzelnen Ertrags- oder Aufwandsart möglich.")
     pdf_path = args.pdf_path or build_default_pdf_path(year)
-    output_path = args.output_path or Path("analysis/ergebnisrechnung") / (
-        f"teilergebnis_{year}_{account.lower().replace(' ', '_').replace('.', '')}.csv"
-    )
 
     if not pdf_path.exists():
         raise SystemExit(f"PDF nicht gefunden: {pdf_path}")
-
-    with pdfplumber.open(pdf_path) as pdf:
-        summary = extract_ergebnis_summary(pdf, account)
-        entries = extract_teilergebnis_entries(pdf, account)
-
-    check_consistency(summary, entries)
-    write_output_csv(output_path, year, summary, entries)
-    print(
-        f"Extraktion abgeschlossen. Gesamtsumme: {summary.ist_ergebnis:.2f} EUR, "
-        f"Teilergebnisse: {len(entries)} -> {output_path}"
+    if args.supervised and args.page_mode != "serial":
+        raise SystemExit("--supervised und --page-mode können nicht kombiniert werden.")
+    if args.supervised and (args.tune or args.settings):
+        raise SystemExit("--supervised kann nicht mit --tune oder --settings kombiniert werden.")
+    if args.tune and args.settings:
+        raise SystemExit("--tune und --settings können nicht kombiniert werden.")
+    if args.page_mode != "serial":
+        require_proof(f"page-mode={args.page_mode}", year, pdf_path, accounts)
+    if args.supervised:
+        require_proof("supervised", year, pdf_path, accounts)
+    log_stream = sys.stderr if args.ndjson == "-" else sys.stdout
+
+    if args.settings:
+        candidate = next(candidate for candidate in TABLE_CANDIDATES if candidate.name == args.settings)
+        if candidate != TABLE_CANDIDATES[0]:
+            require_proof(f"{TABLE_FAMILY}={candidate.name}", year, pdf_path, accounts)
+    elif args.tune:
+        tuned = tune_table_settings(pdf_path, args.tune_sample, SettingsStore(), log_stream)
+        candidate = proven_settings(year, pdf_path, accounts, tuned, log_stream)
+    elif args.supervised:
+        candidate = TABLE_CANDIDATES[0]
+    else:
+        stored = choose_settings(TABLE_FAMILY, pdf_path, TABLE_CANDIDATES)
+        candidate = proven_settings(year, pdf_path, accounts, stored, log_stream)
+    matcher = build_page_matcher(accounts)
+    scope = "|".join(sorted(accounts))
+    if candidate != TABLE_CANDIDATES[0]:
+        # Cached and checkpointed pages only count for the settings they were extracted with.
+        scope += f"|{candidate.name}"
+        print(f"Tabelleneinstellungen: {candidate.name}", file=log_stream)
+    with open_document(pdf_path) as raw_pdf:
+        fingerprints = memoise(raw_pdf, "fingerprints", document_fingerprints)
+    # A cached page is only reused for the same page content, code version and accounts/settings scope, which
+    # is everything its parse reads, so the cache needs no proof from differential.py.
+    page_cache = PageCache(
+        Path("analysis/ergebnisrechnung") / f"teilergebnis_{year}.fingerprints.json",
+        scope,
+        fingerprints,
+        code_version(),
+        reuse=not args.full,
     )
+    if args.supervised:
+        document = SupervisedDocument(
+            pdf_path,
+            workers=args.workers,
+            timeout=args.page_timeout,
+            memory_mb=args.page_memory,
+            table_filter=(
+                (SECTION_ERGEBNISRECHNUNG, SECTION_TEILERGEBNISRECHNUNG),
+                tuple(accounts) + tuple(map(normalise_account_name, accounts)),
+            ),
+            # A page over budget is retried with cheaper table settings, but only with those proven for this PDF.
+            modes=[
+                (fallback.name, fallback.settings)
+                for fallback in TABLE_CANDIDATES
+                if fallback == candidate or has_proof(f"{TABLE_FAMILY}={fallback.name}", pdf_path, accounts)
+            ],
+        )
+    else:
+        document = open_document(pdf_path)
+    if page_cache.has_previous:
+        print(
+            f"{len(page_cache.changed_pages())} von {len(fingerprints)} Seiten seit der letzten Extraktion geändert",
+            file=log_stream,
+        )
+    pool = None
+    if args.page_mode != "serial":
+        pool = PagePool(
+            pdf_path,
+            partial(teilergebnis_entries_job, tuple(accounts), settings=candidate.settings),
+            args.page_mode,
+            args.workers,
+        )
+        print(f"Seitenmodus: {pool.mode} ({args.workers} Worker)", file=log_stream)
+    checkpoint_file = checkpoint_path(Path("analysis/ergebnisrechnung"), f"teilergebnis_{year}", scope)
+    # The NDJSON stream gets its end record when the block is left, or an error record if it raises.
+    streaming = open_writer(args.ndjson) or nullcontext()
+    try:
+        with streaming as writer, Checkpoint(checkpoint_file, resume=args.resume) as checkpoint, document as pdf:
+            summaries = extract_ergebnis_summaries(
+                pdf,
+                accounts,
+                matcher,
+                checkpoint.document(document_key(pdf_path, f"ergebnis|{scope}")),
+                candidate.settings,
+            )
+            on_entry = None
+            if writer is not None:
+                for account in accounts:
+                    writer.write({**output_record(year, summaries[account]), "kategorie": account_slug(account)})
+
+                def on_entry(account: str, entry: TeilergebnisEntry) -> None:
+                    writer.write(
+                        {**output_record(year, summaries[account], entry), "kategorie": account_slug(account)}
+                    )
+
+            entries_by_account = extract_teilergebnis_entries_for_accounts(
+                pdf,
+                accounts,
+                matcher,
+                checkpoint.document(document_key(pdf_path, f"teilergebnis|{scope}")),
+                on_entry=on_entry,
+                page_cache=page_cache,
+                pool=pool,
+                settings=candidate.settings,
+            )
+            # Still inside the block, so that the streamed rows are only confirmed once their totals add up.
+            for account in accounts:
+                check_consistency(summaries[account], entries_by_account[account])
+    finally:
+        # Also when a page failed or the totals do not add up: the report says which pages fell back.
+        if args.supervised and document.issues:
+            report_path = Path("analysis/ergebnisrechnung") / f"teilergebnis_{year}_seitenprobleme.csv"
+            write_issue_report(document.issues, report_path)
+            print(f"{len(document.issues)} fehlgeschlagene Seitenversuche -> {report_path}", file=log_stream)
+
+    for account in accounts:
+        summary = summaries[account]
+        entries = entries_by_account[account]
+        output_path = args.output_path or build_default_output_path(year, account)
+        write_output_csv(output_path, year, summary, entries)
+        write_provenance(output_path, pdf_path, output_sources(summary, entries))
+        print(
+            f"Extraktion abgeschlossen. Gesamtsumme: {summary.ist_ergebnis:.2f} EUR, "
+            f"Teilergebnisse: {len(entries)} -> {output_path}",
+            file=log_stream,
+        )
+
+    if page_cache.has_previous:
+        changes = revision_changes(page_cache, summaries)
+        report_path = Path("analysis/ergebnisrechnung") / f"teilergebnis_{year}_revision.csv"
+        if changes:
+            write_revision_report(report_path, changes)
+            print(
+                f"{len(changes)} Werte gegenüber der vorherigen Revision geändert -> {report_path}", file=log_stream
+            )
+        else:
+            report_path.unlink(missing_ok=True)
+    page_cache.save(summaries_to_payload(summaries))
 
 
 if __name__ == "__main__":
@@ -1,9 +1,24 @@
+import argparse
 import re
+import sys
+from contextlib import nullcontext
 from pathlib import Path
-from typing import Iterable, List
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
 
-import pandas as pd
-import pdfplumber
+from extraction_server import forward_if_running
+
+if __name__ == "__main__":
+    # Hand the call to a running extraction server before paying for the imports below.
+    forward_if_running(__file__)
+
+import pandas as pd  # noqa: E402
+
+from checkpoint import Checkpoint, DocumentProgress, document_key  # noqa: E402
+from document_cache import open_document, page_text  # noqa: E402
+from ndjson_stream import open_writer  # noqa: E402
+from page_matcher import MARKER_ERTRAGSARTEN, SECTION_ERGEBNISRECHNUNG, build_page_matcher  # noqa: E402
+
+INPUT_DIR = Path("input/balance")
 
 TABLE_SETTINGS = {
     "vertical_strategy": "lines",
@@ -50,44 +65,115 @@ def extract_table_rows(table: List[List[str | None]]) -> Iterable[List[str]]:
     return data_rows
 
 
-def extract_ergebnis_rows(pdf_path: Path) -> List[List[str]]:
-    rows: List[List[str]] = []
-    with pdfplumber.open(pdf_path) as pdf:
-        in_section = False
-        for page in pdf.pages:
-            text = page.extract_text() or ""
-            if "Ergebnisrechnung" not in text or "Ertrags-" not in text:
+def iter_ergebnis_rows(
+    pdf_path: Path, progress: Optional[DocumentProgress] = None
+) -> Iterator[List[str]]:
+    """Yield the Ergebnisrechnung rows page by page, recording each page in ``progress``.
+
+    With a ``progress`` from an earlier run, the rows of its completed pages are
+    yielded first and extraction continues with the next page.
+    """
+
+    in_section = False
+    start_page = 0
+    if progress is not None:
+        for payload in progress.payloads():
+            yield from payload["rows"]
+            in_section = in_section or payload["in_section"]
+        if progress.done:
+            return
+        start_page = progress.next_page
+    matcher = build_page_matcher()
+    with open_document(pdf_path) as pdf:
+        for page_index in range(start_page, len(pdf.pages)):
+            page = pdf.pages[page_index]
+            page_rows: List[List[str]] = []
+            hits = matcher.scan(page_text(pdf, page_index))
+            if SECTION_ERGEBNISRECHNUNG not in hits or MARKER_ERTRAGSARTEN not in hits:
+                page.close()
                 if in_section:
                     break
+                if progress is not None:
+                    progress.record_page(page_index, {"in_section": False, "rows": []})
                 continue
             in_section = True
             tables = page.extract_tables(TABLE_SETTINGS)
+            page.close()
             for table in tables:
                 first_cell = table[0][0] if table and table[0] else ""
                 if "Ergebnisrechnung" not in (first_cell or ""):
                     continue
-                rows.extend(extract_table_rows(table))
-    return rows
+                page_rows.extend(extract_table_rows(table))
+            if progress is not None:
+                progress.record_page(page_index, {"in_section": True, "rows": page_rows})
+            yield from page_rows
+    if progress is not None:
+        progress.finish()
+
+
+def extract_ergebnis_rows(
+    pdf_path: Path, progress: Optional[DocumentProgress] = None
+) -> List[List[str]]:
+    return list(iter_ergebnis_rows(pdf_path, progress))
+
+
+def ergebnis_record(year: str, row: List[str]) -> dict:
+    return {"jahr": int(year), **dict(zip(COLUMN_NAMES, row))}
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Extrahiert die Ergebnisrechnung aller Schlussbilanzen unter input/balance."
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Einen abgebrochenen Lauf ab der letzten abgeschlossenen Seite fortsetzen",
+    )
+    parser.add_argument(
+        "--ndjson",
+        metavar="ZIEL",
+        help="Zeilen zusätzlich sofort als NDJSON ausgeben (Dateipfad oder - für stdout)",
+    )
+    return parser.parse_args(argv)
+
+
+def schlussbilanzen(input_dir: Path) -> Iterator[Tuple[str, Path]]:
+    for pdf_path in sorted(input_dir.glob("Schlussbilanz *.pdf")):
+        match = re.search(r"(\d{4})", pdf_path.name)
+        if match:
+            yield match.group(1), pdf_path
+
+
+def server_proofs(argv: List[str]) -> List[Tuple[str, str, Path, Sequence[str]]]:
+    """The proofs the extraction server needs before it runs this command line: one per Schlussbilanz."""
+
+    parse_args(argv)
+    return [("server-ergebnisrechnung", year, pdf_path, ()) for year, pdf_path in schlussbilanzen(INPUT_DIR)]
 
 
 def main() -> None:
-    input_dir = Path("input/balance")
+    args = parse_args()
     output_dir = Path("analysis/ergebnisrechnung")
     output_dir.mkdir(parents=True, exist_ok=True)
-
-    for pdf_path in sorted(input_dir.glob("Schlussbilanz *.pdf")):
-        match = re.search(r"(\d{4})", pdf_path.name)
-        if not match:
-            continue
-        year = match.group(1)
-        rows = extract_ergebnis_rows(pdf_path)
-        if not rows:
-            print(f"Keine Ergebnisrechnung in {pdf_path.name} gefunden.")
-            continue
-        df = pd.DataFrame(rows, columns=COLUMN_NAMES)
-        output_path = output_dir / f"ergebnisrechnung_{year}.csv"
-        df.to_csv(output_path, index=False)
-        print(f"{output_path} erstellt (Zeilen: {len(df)})")
+    log_stream = sys.stderr if args.ndjson == "-" else sys.stdout
+    checkpoint = Checkpoint(output_dir / ".ergebnisrechnung.checkpoint.jsonl", resume=args.resume)
+    # The NDJSON stream gets its end record when the block is left, or an error record if it raises.
+    with open_writer(args.ndjson) or nullcontext() as writer, checkpoint:
+        for year, pdf_path in schlussbilanzen(INPUT_DIR):
+            progress = checkpoint.document(document_key(pdf_path, "ergebnisrechnung"))
+            rows: List[List[str]] = []
+            for row in iter_ergebnis_rows(pdf_path, progress):
+                rows.append(row)
+                if writer is not None:
+                    writer.write(ergebnis_record(year, row))
+            if not rows:
+                print(f"Keine Ergebnisrechnung in {pdf_path.name} gefunden.", file=log_stream)
+                continue
+            df = pd.DataFrame(rows, columns=COLUMN_NAMES)
+            output_path = output_dir / f"ergebnisrechnung_{year}.csv"
+            df.to_csv(output_path, index=False)
+            print(f"{output_path} erstellt (Zeilen: {len(df)})", file=log_stream)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,113 @@
+"""Extract the Teilergebnisplan of every Produkt from the Haushalt PDFs."""
+
+from __future__ import annotations
+
+import argparse
+import re
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+import pandas as pd
+import pdfplumber
+
+from document_cache import open_document
+from extract_account_teilergebnisse import (
+    PRODUKT_PATTERN,
+    TABLE_SETTINGS,
+    clean_cell,
+    iter_data_rows,
+)
+from page_matcher import MARKER_PRODUKT, PageMatcher
+
+SECTION_TEILERGEBNISPLAN = "Teilergebnisplan"
+
+OUTPUT_COLUMNS = [
+    "Produkt",
+    "Produktname",
+    "Kontenbereich",
+    "Lfd. Nr.",
+    "Ertrags- und Aufwandsarten",
+    "Ansatz des Haushaltsjahres in EUR",
+]
+
+# Column of the Ansatz des Haushaltsjahres in the Muster layout (Kontenbereich, Lfd. Nr., Art,
+# Ergebnis des Vorvorjahres, Ansatz des Vorjahres, Ansatz des Haushaltsjahres, Planungsjahre).
+DEFAULT_ANSATZ_COLUMN = 5
+
+
+def find_ansatz_column(table: List[List[Optional[str]]], year: str) -> int:
+    """Locate the Ansatz of the Haushaltsjahr from the header rows; fall back to the Muster column."""
+
+    for row in table[:4]:
+        for index, cell in enumerate(row):
+            text = clean_cell(cell)
+            if "Ansatz" not in text or "Vorjahr" in text:
+                continue
+            if year in text or "Haushaltsjahr" in text:
+                return index
+    return DEFAULT_ANSATZ_COLUMN
+
+
+def iter_teilergebnisplan_rows(pdf: pdfplumber.PDF, year: str) -> Iterator[List[str]]:
+    """Yield one output row per account line of every Teilergebnisplan table."""
+
+    matcher = PageMatcher([(SECTION_TEILERGEBNISPLAN, SECTION_TEILERGEBNISPLAN), (MARKER_PRODUKT, MARKER_PRODUKT)])
+    for page in pdf.pages:
+        hits = matcher.scan(page.extract_text() or "")
+        if SECTION_TEILERGEBNISPLAN in hits and MARKER_PRODUKT in hits:
+            for table in page.extract_tables(TABLE_SETTINGS):
+                if not table or not table[0]:
+                    continue
+                header = clean_cell(table[0][0])
+                match = PRODUKT_PATTERN.search(header)
+                if SECTION_TEILERGEBNISPLAN not in header or not match:
+                    continue
+                ansatz_column = find_ansatz_column(table, year)
+                for _index, row in iter_data_rows(table):
+                    if len(row) <= ansatz_column:
+                        continue
+                    yield [
+                        match.group("num").strip(),
+                        match.group("name").strip(),
+                        row[0],
+                        row[1],
+                        row[2],
+                        row[ansatz_column],
+                    ]
+        page.close()
+
+
+def extract_teilergebnisplan(pdf_path: Path, year: str) -> pd.DataFrame:
+    with open_document(pdf_path) as pdf:
+        return pd.DataFrame(list(iter_teilergebnisplan_rows(pdf, year)), columns=OUTPUT_COLUMNS)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Extrahiert die Teilergebnispläne aller Produkte aus den Haushaltsplänen unter input/budget."
+    )
+    parser.add_argument("--years", nargs="*", help="Einschränkung auf bestimmte Jahre")
+    parser.add_argument("--input-dir", type=Path, default=Path("input/budget"))
+    parser.add_argument("--output-dir", type=Path, default=Path("analysis/haushalt"))
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+    for pdf_path in sorted(args.input_dir.glob("Haushalt *.pdf")):
+        match = re.search(r"(\d{4})", pdf_path.name)
+        if not match or (args.years and match.group(1) not in args.years):
+            continue
+        year = match.group(1)
+        df = extract_teilergebnisplan(pdf_path, year)
+        if df.empty:
+            print(f"Kein Teilergebnisplan in {pdf_path.name} gefunden.")
+            continue
+        output_path = args.output_dir / f"teilergebnisplan_{year}.csv"
+        df.to_csv(output_path, index=False)
+        print(f"{output_path} erstellt (Zeilen: {len(df)}, Produkte: {df['Produkt'].nunique()})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+"""Resident extraction server on a local Unix socket.
+
+A scripted workflow that calls the extraction CLIs dozens of times pays on
+every call for interpreter start-up, importing pdfplumber and pandas and
+re-reading the PDF's cross-reference table and page tree. The server keeps
+the CLI modules imported and the recently used documents open (see
+``document_cache``); the CLIs hand their command line to it whenever it is
+running and fall back to running locally otherwise. The server only takes a
+request once ``differential.py`` has proven for every PDF it reads that the
+server run matches the reference (see ``fast_path_proofs``); otherwise it
+hands the request back and the CLI runs locally::
+
+    python bin/extraction_server.py start &
+    python bin/extract_account_teilergebnisse.py 2024 "Steuern und ähnliche Abgaben"
+    python bin/extraction_server.py status
+    python bin/extraction_server.py stop
+
+Requests are handled one at a time in the caller's working directory, and
+stdout and stderr are streamed back to the caller. The server does not
+reload code, so restart it after changing the scripts. Setting
+``GRN_EXTRACTION_SERVER=0`` makes the CLIs ignore a running server.
+
+Only the standard library is imported at module level so that forwarding
+from a CLI costs no more than connecting to the socket.
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib
+import io
+import json
+import os
+import socket
+import sys
+import tempfile
+import time
+import traceback
+from contextlib import redirect_stderr, redirect_stdout
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+SOCKET_ENV = "GRN_EXTRACTION_SOCKET"
+DISABLE_ENV = "GRN_EXTRACTION_SERVER"
+
+# CLI modules the server may run; each exposes ``main()``, which reads ``sys.argv``, and
+# ``server_proofs(argv)``, which lists the proofs a request needs as (fast path, year, PDF, accounts).
+SCRIPTS = ("extract_account_teilergebnisse", "extract_ergebnisrechnung")
+
+CONNECT_TIMEOUT = 0.5
+
+
+def default_socket_path() -> Path:
+    configured = os.environ.get(SOCKET_ENV)
+    if configured:
+        return Path(configured)
+    return Path(tempfile.gettempdir()) / f"grn-lensahn-extraction-{os.getuid()}.sock"
+
+
+def send_frame(connection: socket.socket, frame: Dict[str, Any]) -> None:
+    connection.sendall(json.dumps(frame, ensure_ascii=False).encode("utf-8") + b"\n")
+
+
+def read_frames(connection: socket.socket):
+    with connection.makefile("r", encoding="utf-8") as stream:
+        for line in stream:
+            yield json.loads(line)
+
+
+def connect(socket_path: Path) -> Optional[socket.socket]:
+    if not socket_path.exists():
+        return None
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    connection.settimeout(CONNECT_TIMEOUT)
+    try:
+        connection.connect(str(socket_path))
+    except OSError:
+        connection.close()
+        return None
+    connection.settimeout(None)
+    return connection
+
+
+def request(frame: Dict[str, Any], socket_path: Optional[Path] = None) -> Optional[int]:
+    """Send one request and relay its output; ``None`` if no server is listening or it hands the request back."""
+
+    connection = connect(socket_path or default_socket_path())
+    if connection is None:
+        return None
+    with connection:
+        send_frame(connection, frame)
+        for reply in read_frames(connection):
+            if "stdout" in reply:
+                sys.stdout.write(reply["stdout"])
+                sys.stdout.flush()
+            elif "stderr" in reply:
+                sys.stderr.write(reply["stderr"])
+                sys.stderr.flush()
+            elif "lokal" in reply:
+                return None
+            elif "exit" in reply:
+                return reply["exit"]
+    raise SystemExit("Verbindung zum Extraktionsserver unterbrochen.")
+
+
+def forward_if_running(script: str) -> None:
+    """Run the calling CLI in the resident server if one is listening, then exit with its code."""
+
+    if os.environ.get(DISABLE_ENV) == "0":
+        return
+    code = request({"script": Path(script).stem, "argv": sys.argv[1:], "cwd": os.getcwd()})
+    if code is not None:
+        sys.exit(code)
+
+
+class _FrameStream(io.TextIOBase):
+    """Text stream that passes every write on to the client as one frame."""
+
+    def __init__(self, connection: socket.socket, name: str):
+        self._connection = connection
+        self._name = name
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        if text:
+            send_frame(self._connection, {self._name: text})
+        return len(text)
+
+
+class ExtractionServer:
+    def __init__(self, socket_path: Path, max_documents: int):
+        # Deferred so that clients importing this module for forwarding stay cheap.
+        from document_cache import DocumentCache, use_cache
+
+        self.socket_path = socket_path
+        self.cache = DocumentCache(max_documents)
+        use_cache(self.cache)
+        self.modules = {name: importlib.import_module(name) for name in SCRIPTS}
+        self.started = time.time()
+        self.requests = 0
+        self.running = True
+
+    def serve(self) -> None:
+        if connect(self.socket_path) is not None:
+            raise SystemExit(f"Extraktionsserver läuft bereits: {self.socket_path}")
+        self.socket_path.unlink(missing_ok=True)
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        previous_umask = os.umask(0o177)
+        try:
+            listener.bind(str(self.socket_path))
+        finally:
+            os.umask(previous_umask)
+        listener.listen()
+        print(f"Extraktionsserver bereit: {self.socket_path}", flush=True)
+        try:
+            with listener:
+                while self.running:
+                    connection, _address = listener.accept()
+                    with connection:
+                        try:
+                            self.handle(connection)
+                        except (BrokenPipeError, ConnectionResetError):
+                            pass
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.socket_path.unlink(missing_ok=True)
+            self.cache.clear()
+
+    def handle(self, connection: socket.socket) -> None:
+        frame = next(read_frames(connection), None)
+        if frame is None:
+            return
+        command = frame.get("command")
+        if command == "stop":
+            self.running = False
+            send_frame(connection, {"exit": 0})
+        elif command == "status":
+            send_frame(connection, {"stdout": json.dumps(self.status(), ensure_ascii=False, indent=2) + "\n"})
+            send_frame(connection, {"exit": 0})
+        elif frame.get("script") in self.modules:
+            missing = self.missing_proofs(frame)
+            if missing:
+                send_frame(connection, {"stderr": "".join(f"{line}\n" for line in missing)})
+                send_frame(connection, {"lokal": True})
+            else:
+                send_frame(connection, {"exit": self.run(connection, frame)})
+        else:
+            send_frame(connection, {"stderr": f"Unbekannte Anfrage: {frame}\n"})
+            send_frame(connection, {"exit": 2})
+
+    def missing_proofs(self, frame: Dict[str, Any]) -> List[str]:
+        """One line for every proof the request lacks; a request the CLI rejects is run to report its error."""
+
+        from fast_path_proofs import has_proof, proof_command
+
+        module = self.modules[frame["script"]]
+        saved_cwd = os.getcwd()
+        try:
+            os.chdir(frame["cwd"])
+            with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
+                try:
+                    required = module.server_proofs(frame["argv"])
+                except SystemExit:
+                    return []
+            return [
+                f"{fast_path} ist für {pdf_path.name} nicht nachgewiesen, Lauf ohne Extraktionsserver. "
+                f"Nachweis mit: {proof_command(fast_path, year, pdf_path, accounts)}"
+                for fast_path, year, pdf_path, accounts in required
+                if not has_proof(fast_path, pdf_path, accounts)
+            ]
+        finally:
+            os.chdir(saved_cwd)
+
+    def run(self, connection: socket.socket, frame: Dict[str, Any]) -> int:
+        module = self.modules[frame["script"]]
+        argv = [module.__file__, *frame["argv"]]
+        stdout = _FrameStream(connection, "stdout")
+        stderr = _FrameStream(connection, "stderr")
+        saved_argv, saved_cwd = sys.argv, os.getcwd()
+        self.requests += 1
+        try:
+            os.chdir(frame["cwd"])
+            sys.argv = argv
+            with redirect_stdout(stdout), redirect_stderr(stderr):
+                try:
+                    module.main()
+                except SystemExit as exit:
+                    return exit_code(exit, stderr)
+                except Exception:
+                    stderr.write(traceback.format_exc())
+                    return 1
+            return 0
+        finally:
+            sys.argv = saved_argv
+            os.chdir(saved_cwd)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "socket": str(self.socket_path),
+            "pid": os.getpid(),
+            "laufzeit_s": round(time.time() - self.started, 1),
+            "anfragen": self.requests,
+            "dokumente": self.cache.status(),
+        }
+
+
+def exit_code(exit: SystemExit, stderr: io.TextIOBase) -> int:
+    """Mirror the interpreter: integer codes as they are, messages to stderr with code 1."""
+
+    if exit.code is None:
+        return 0
+    if isinstance(exit.code, int):
+        return exit.code
+    stderr.write(f"{exit.code}\n")
+    return 1
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Hält Module und zuletzt verwendete PDFs für wiederholte Extraktionsaufrufe geladen."
+    )
+    parser.add_argument("command", choices=("start", "stop", "status"))
+    parser.add_argument(
+        "--socket",
+        type=Path,
+        default=None,
+        help=f"Pfad des Unix-Sockets. Standard: ${SOCKET_ENV} oder ein Socket im temporären Verzeichnis",
+    )
+    parser.add_argument("--max-documents", type=int, default=4, help="Anzahl gleichzeitig offener PDFs")
+    return parser.parse_args(argv)
+
+
+def main() -> None:
+    args = parse_args()
+    socket_path = args.socket or default_socket_path()
+    if args.command == "start":
+        ExtractionServer(socket_path, args.max_documents).serve()
+        return
+    code = request({"command": args.command}, socket_path)
+    if code is None:
+        raise SystemExit(f"Kein Extraktionsserver unter {socket_path}")
+    if args.command == "stop":
+        print("Extraktionsserver beendet.")
+    sys.exit(code)
+
+
+if __name__ == "__main__":
+    main()
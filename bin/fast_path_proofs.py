@@ -0,0 +1,120 @@
+"""Proofs that a fast extraction path reproduces the reference output for a document.
+
+``differential.py`` runs the reference extractor and a fast path (a page pool,
+cheaper table settings, ...) over the same PDF and compares the CSVs cell by
+cell. Only if they are identical it records a proof here, keyed by the fast
+path and the document's content hash, in ``analysis/fast_path_proofs.json``.
+
+A proof only holds for the code it was made with: it stores a hash over the
+extraction scripts, and any change to them invalidates all proofs. For the
+Teilergebnis extraction it also lists the accounts that were compared, since
+a run for other accounts reads other tables.
+
+The CLIs call ``require_proof`` or ``has_proof`` before switching to a fast
+path. The harness sets ``GRN_FAST_PATH_TRIAL=1`` for its own trial runs,
+which are written to a temporary directory and never to ``analysis/``.
+
+Only the standard library is imported, so that checking costs the CLIs nothing.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Sequence
+
+from settings_tuner import document_id
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_STORE = Path("analysis/fast_path_proofs.json")
+TRIAL_ENV = "GRN_FAST_PATH_TRIAL"
+
+# Sources whose behaviour the proofs vouch for.
+CODE_PATTERNS = ("bin/*.py", "analysis/*/extract_*.py")
+
+
+def code_version(root: Path = REPO_ROOT) -> str:
+    digest = hashlib.sha256()
+    for pattern in CODE_PATTERNS:
+        for path in sorted(root.glob(pattern)):
+            digest.update(path.relative_to(root).as_posix().encode("utf-8") + b"\0")
+            digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def is_trial_run() -> bool:
+    return os.environ.get(TRIAL_ENV) == "1"
+
+
+class ProofStore:
+    """Persisted proofs as ``{fast_path: {document_id: {"pdf", "code", "konten", "sekunden", ...}}}``."""
+
+    def __init__(self, path: Path = DEFAULT_STORE):
+        self.path = path
+        self.data: Dict[str, Dict[str, Dict[str, Any]]] = (
+            json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+        )
+
+    def proof(self, fast_path: str, pdf_path: Path, accounts: Sequence[str] = ()) -> Optional[Dict[str, Any]]:
+        """The recorded proof if it covers ``accounts`` and was made with the current code."""
+
+        if not self.data.get(fast_path):
+            return None
+        entry = self.data[fast_path].get(document_id(pdf_path))
+        if entry is None or entry["code"] != code_version():
+            return None
+        if not set(accounts) <= set(entry.get("konten", ())):
+            return None
+        return entry
+
+    def record(
+        self,
+        fast_path: str,
+        pdf_path: Path,
+        accounts: Iterable[str],
+        cells: int,
+        reference_seconds: float,
+        fast_seconds: float,
+    ) -> None:
+        self.data.setdefault(fast_path, {})[document_id(pdf_path)] = {
+            "pdf": pdf_path.name,
+            "code": code_version(),
+            "konten": sorted(accounts),
+            "zellen": cells,
+            "sekunden": {"referenz": round(reference_seconds, 3), "schnell": round(fast_seconds, 3)},
+            "geprueft": date.today().isoformat(),
+        }
+        self.save()
+
+    def revoke(self, fast_path: str, pdf_path: Path) -> None:
+        if self.data.get(fast_path, {}).pop(document_id(pdf_path), None) is not None:
+            self.save()
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        text = json.dumps(self.data, ensure_ascii=False, indent=2, sort_keys=True) + "\n"
+        self.path.write_text(text, encoding="utf-8")
+
+
+def has_proof(fast_path: str, pdf_path: Path, accounts: Sequence[str] = (), store: Optional[ProofStore] = None) -> bool:
+    if is_trial_run():
+        return True
+    return (store or ProofStore()).proof(fast_path, pdf_path, accounts) is not None
+
+
+def proof_command(fast_path: str, year: str, pdf_path: Path, accounts: Sequence[str] = ()) -> str:
+    words = ["python bin/differential.py", year, *(f'"{account}"' for account in accounts)]
+    return " ".join([*words, f'--pdf "{pdf_path}"', "--fast-paths", fast_path])
+
+
+def require_proof(fast_path: str, year: str, pdf_path: Path, accounts: Sequence[str] = ()) -> None:
+    """Stop unless ``fast_path`` has been proven identical to the reference for ``pdf_path``."""
+
+    if not has_proof(fast_path, pdf_path, accounts):
+        raise SystemExit(
+            f"{fast_path} ist für {pdf_path.name} nicht nachgewiesen (oder der Code hat sich seitdem geändert). "
+            f"Nachweis erstellen mit:\n  {proof_command(fast_path, year, pdf_path, accounts)}"
+        )
@@ -0,0 +1,105 @@
+"""Newline-delimited JSON streams between extraction and aggregation stages."""
+
+from __future__ import annotations
+
+import json
+import sys
+import time
+from pathlib import Path
+from types import TracebackType
+from typing import Any, Dict, Iterator, Optional, TextIO, Type
+
+END_MARKER = "_end"
+ERROR_KEY = "_fehler"
+
+
+class StreamAborted(SystemExit):
+    """The writer gave up or vanished; a ``SystemExit`` so that aggregators stop without writing output."""
+
+
+class NdjsonWriter:
+    """Writes one JSON object per line and flushes it immediately.
+
+    ``target`` is a file path or ``-`` for stdout. Closing the writer appends an
+    end-of-stream record so that readers following a file know when to stop.
+    Used as a context manager, a writer left by an exception ends the stream
+    with an error record instead, which readers raise as ``StreamAborted``.
+    Extractors close the writer only after their consistency checks, so the
+    clean end record also vouches for the rows before it.
+    """
+
+    def __init__(self, target: str | Path):
+        self.target = str(target)
+        if self.target == "-":
+            self._handle: TextIO = sys.stdout
+        else:
+            Path(self.target).parent.mkdir(parents=True, exist_ok=True)
+            self._handle = open(self.target, "w", encoding="utf-8")
+
+    def write(self, record: Dict[str, Any]) -> None:
+        self._handle.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._handle.flush()
+
+    def close(self, error: Optional[str] = None) -> None:
+        self.write({END_MARKER: True} if error is None else {END_MARKER: True, ERROR_KEY: error})
+        if self._handle is not sys.stdout:
+            self._handle.close()
+
+    def __enter__(self) -> "NdjsonWriter":
+        return self
+
+    def __exit__(
+        self, exc_type: Optional[Type[BaseException]], exc: Optional[BaseException], traceback: Optional[TracebackType]
+    ) -> None:
+        self.close(None if exc_type is None else f"{exc_type.__name__}: {exc}")
+
+
+def open_writer(target: Optional[str | Path]) -> Optional[NdjsonWriter]:
+    return NdjsonWriter(target) if target else None
+
+
+def iter_ndjson(source: str | Path, follow: bool = False, poll_interval: float = 0.2) -> Iterator[Dict[str, Any]]:
+    """Yield the records of a stream as they arrive.
+
+    ``source`` is a file path or ``-`` for stdin. With ``follow``, a file that is
+    still being written is polled until its end-of-stream record appears;
+    otherwise end-of-stream records are skipped so that the output of several
+    writers can be concatenated into one pipe. An error record, or a stream
+    whose last record is not an end record, raises ``StreamAborted``.
+    """
+
+    if str(source) == "-":
+        handle: TextIO = sys.stdin
+    else:
+        handle = open(source, encoding="utf-8")
+    try:
+        pending = ""
+        ended = False
+        while True:
+            line = handle.readline()
+            if not line:
+                if follow and handle is not sys.stdin:
+                    time.sleep(poll_interval)
+                    continue
+                if pending.strip():
+                    raise StreamAborted(f"{source}: NDJSON-Strom endet mitten in einer Zeile")
+                if not ended:
+                    raise StreamAborted(f"{source}: NDJSON-Strom endet ohne Endemarker (Extraktion abgebrochen?)")
+                break
+            pending += line
+            if not pending.endswith("\n"):
+                continue
+            record = json.loads(pending)
+            pending = ""
+            if record.get(END_MARKER):
+                if record.get(ERROR_KEY):
+                    raise StreamAborted(f"{source}: Extraktion abgebrochen: {record[ERROR_KEY]}")
+                ended = True
+                if follow:
+                    break
+                continue
+            ended = False
+            yield record
+    finally:
+        if handle is not sys.stdin:
+            handle.close()
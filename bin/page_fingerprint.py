@@ -0,0 +1,169 @@
+"""Page-level content fingerprints to re-extract only the changed pages of a republished PDF."""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+import pdfplumber
+from pdfminer.pdftypes import PDFObjRef, PDFStream
+from pdfminer.psparser import PSLiteral
+
+# Stream attributes that only describe the encoding, not the content.
+ENCODING_KEYS = {"Length", "Filter", "DecodeParms"}
+
+
+class _Hasher:
+    """Digests PDF objects by value, memoised per indirect object.
+
+    Indirect references are resolved, so two revisions with renumbered but
+    otherwise identical objects (fonts, images) produce the same digest.
+    """
+
+    def __init__(self) -> None:
+        self._objects: Dict[int, bytes] = {}
+        self._active: Set[int] = set()
+
+    def digest(self, obj: Any) -> bytes:
+        if isinstance(obj, PDFObjRef):
+            if obj.objid in self._objects:
+                return self._objects[obj.objid]
+            if obj.objid in self._active:
+                return b"cycle"
+            self._active.add(obj.objid)
+            try:
+                result = self.digest(obj.resolve())
+            finally:
+                self._active.discard(obj.objid)
+            self._objects[obj.objid] = result
+            return result
+        hasher = hashlib.sha256()
+        if isinstance(obj, PDFStream):
+            hasher.update(b"stream")
+            hasher.update(self.digest({k: v for k, v in obj.attrs.items() if k not in ENCODING_KEYS}))
+            hasher.update(obj.get_data())
+        elif isinstance(obj, dict):
+            hasher.update(b"dict")
+            for key in sorted(obj):
+                if key == "Parent":
+                    continue
+                hasher.update(str(key).encode())
+                hasher.update(self.digest(obj[key]))
+        elif isinstance(obj, (list, tuple)):
+            hasher.update(b"list")
+            for item in obj:
+                hasher.update(self.digest(item))
+        elif isinstance(obj, PSLiteral):
+            hasher.update(b"/" + str(obj.name).encode())
+        else:
+            hasher.update(repr(obj).encode())
+        return hasher.digest()
+
+
+def document_fingerprints(pdf: pdfplumber.PDF) -> List[str]:
+    """Return one fingerprint per page over its content streams, resources and size.
+
+    Only the raw PDF objects are read; no text or layout analysis takes place.
+    """
+
+    hasher = _Hasher()
+    fingerprints: List[str] = []
+    for page in pdf.pages:
+        page_obj = page.page_obj
+        digest = hashlib.sha256()
+        digest.update(hasher.digest(list(page_obj.contents)))
+        digest.update(hasher.digest(page_obj.resources))
+        digest.update(repr((page_obj.mediabox, page_obj.attrs.get("Rotate", 0))).encode())
+        fingerprints.append(digest.hexdigest()[:32])
+    return fingerprints
+
+
+class PageCache:
+    """Per-page extraction results of the previous revision of a document.
+
+    Results are stored by page index together with the page fingerprint and
+    are only handed out for pages whose fingerprint is unchanged. Results of
+    changed pages stay readable through ``previous`` for revision reports.
+    With ``reuse=False`` nothing is handed out, but changes are still reported.
+
+    ``code`` identifies the extraction code (``fast_path_proofs.code_version``).
+    Results stored by other code are ignored as if there were none, so that a
+    fix to the parsing never keeps serving the rows of the old parser.
+    """
+
+    def __init__(self, path: Path, scope: str, fingerprints: List[str], code: str, reuse: bool = True):
+        self.path = path
+        self.scope = scope
+        self.fingerprints = fingerprints
+        self.code = code
+        self.reuse = reuse
+        self._stored: Dict[str, Any] = {}
+        if path.exists():
+            self._stored = json.loads(path.read_text(encoding="utf-8"))
+        entry = self._stored.get(scope, {})
+        if entry.get("code") != code:
+            entry = {}
+        self.old_fingerprints: List[str] = entry.get("fingerprints", [])
+        self.old_pages: Dict[int, Any] = {int(k): v for k, v in entry.get("pages", {}).items()}
+        self.old_result: Optional[Any] = entry.get("result")
+        self.pages: Dict[int, Any] = {}
+
+    @property
+    def has_previous(self) -> bool:
+        return bool(self.old_fingerprints)
+
+    def unchanged(self, index: int) -> bool:
+        return (
+            index < len(self.old_fingerprints)
+            and index < len(self.fingerprints)
+            and self.old_fingerprints[index] == self.fingerprints[index]
+            and index in self.old_pages
+        )
+
+    def changed_pages(self) -> List[int]:
+        return [index for index in range(len(self.fingerprints)) if not self.unchanged(index)]
+
+    def get(self, index: int) -> Optional[Any]:
+        return self.old_pages[index] if self.reuse and self.unchanged(index) else None
+
+    def previous(self, index: int) -> Optional[Any]:
+        return self.old_pages.get(index)
+
+    def put(self, index: int, payload: Any) -> None:
+        self.pages[index] = payload
+
+    def save(self, result: Any = None) -> None:
+        self._stored[self.scope] = {
+            "code": self.code,
+            "fingerprints": self.fingerprints,
+            "pages": {str(index): payload for index, payload in sorted(self.pages.items())},
+            "result": result,
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(json.dumps(self._stored, ensure_ascii=False), encoding="utf-8")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Geänderte Seiten zwischen zwei Revisionen eines PDFs ermitteln.")
+    parser.add_argument("old", type=Path, help="Bisherige Revision")
+    parser.add_argument("new", type=Path, help="Neue Revision")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    with pdfplumber.open(args.old) as pdf:
+        old = document_fingerprints(pdf)
+    with pdfplumber.open(args.new) as pdf:
+        new = document_fingerprints(pdf)
+    changed = [index + 1 for index in range(len(new)) if index >= len(old) or old[index] != new[index]]
+    print(f"{len(changed)} von {len(new)} Seiten geändert (bisher {len(old)} Seiten)")
+    if changed:
+        print("Seiten: " + ", ".join(map(str, changed)))
+
+
+if __name__ == "__main__":
+    main()
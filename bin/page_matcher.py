@@ -0,0 +1,107 @@
+"""Aho–Corasick matcher that classifies page text against many targets in one pass."""
+
+from __future__ import annotations
+
+from collections import deque
+from typing import Dict, FrozenSet, Hashable, Iterable, List, Tuple
+
+SECTION_ERGEBNISRECHNUNG = "Ergebnisrechnung"
+SECTION_TEILERGEBNISRECHNUNG = "Teilergebnisrechnung"
+MARKER_ERTRAGSARTEN = "Ertrags-"
+MARKER_PRODUKT = "Produkt"
+
+SECTION_MARKERS: Tuple[str, ...] = (
+    SECTION_ERGEBNISRECHNUNG,
+    SECTION_TEILERGEBNISRECHNUNG,
+    MARKER_ERTRAGSARTEN,
+    MARKER_PRODUKT,
+)
+
+
+class PageMatcher:
+    """Precompiled automaton returning the keys of all patterns found in a text.
+
+    Several patterns may share one key (e.g. an account name with and without
+    its ``+``/``=`` prefix); the key is reported once if any of them occurs.
+    """
+
+    def __init__(self, patterns: Iterable[Tuple[Hashable, str]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[FrozenSet[Hashable]] = [frozenset()]
+        keys = set()
+        for key, pattern in patterns:
+            if not pattern:
+                continue
+            self._add(key, pattern)
+            keys.add(key)
+        self.keys: FrozenSet[Hashable] = frozenset(keys)
+        self._build_failure_links()
+
+    def _add(self, key: Hashable, pattern: str) -> None:
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(frozenset())
+                self._goto[state][char] = next_state
+            state = next_state
+        self._output[state] = self._output[state] | {key}
+
+    def _build_failure_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._output[next_state] = self._output[next_state] | self._output[self._fail[next_state]]
+
+    def scan(self, text: str) -> FrozenSet[Hashable]:
+        """Return the keys of every pattern occurring in ``text``."""
+
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        remaining = len(self.keys)
+        hits: set = set()
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                new_hits = output[state] - hits
+                if new_hits:
+                    hits |= new_hits
+                    if len(hits) == remaining:
+                        break
+        return frozenset(hits)
+
+
+def account_key(account_name: str) -> Tuple[str, str]:
+    """Key under which an account's hits are reported."""
+
+    return ("account", account_name.lstrip("+-= ").strip())
+
+
+def build_page_matcher(account_names: Iterable[str] = ()) -> PageMatcher:
+    """Build a matcher for the section markers plus the given account names.
+
+    Accounts are keyed by their normalised name (without ``+``/``-``/``=``
+    prefix) and match either spelling.
+    """
+
+    patterns: List[Tuple[Hashable, str]] = [(marker, marker) for marker in SECTION_MARKERS]
+    for name in account_names:
+        key = account_key(name)
+        patterns.append((key, name))
+        patterns.append((key, key[1]))
+    return PageMatcher(patterns)
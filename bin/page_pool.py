@@ -0,0 +1,125 @@
+"""Run a per-page job over one PDF serially, on a thread pool or on a process pool.
+
+Threads only pay off on a free-threaded CPython build (3.13t with the GIL
+disabled): pdfminer and pdfplumber are pure Python, so under the GIL a thread
+pool is no faster than the serial loop. There, the thread pool keeps all
+results in memory without pickling them and each thread keeps its document
+open for all of its pages. pdfminer reads objects by seeking a shared file
+handle, so every thread opens its own handle instead of sharing one parsed
+document across threads.
+
+On a regular interpreter ``threads`` and ``auto`` fall back to the process
+pool, and a single worker always runs serially.
+"""
+
+from __future__ import annotations
+
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Generic, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+import pdfplumber
+
+MODES: Tuple[str, ...] = ("auto", "threads", "processes", "serial")
+
+T = TypeVar("T")
+PageJob = Callable[[pdfplumber.PDF, int], T]
+
+
+def gil_disabled() -> bool:
+    check = getattr(sys, "_is_gil_enabled", None)
+    return check is not None and not check()
+
+
+def resolve_mode(mode: str, workers: int, allow_gil_threads: bool = False) -> str:
+    """Map the requested mode to the one that will actually run on this interpreter."""
+
+    if mode not in MODES:
+        raise ValueError(f"Unbekannter Modus '{mode}' (erlaubt: {', '.join(MODES)})")
+    if mode == "serial" or workers <= 1:
+        return "serial"
+    if mode == "auto":
+        return "threads" if gil_disabled() else "processes"
+    if mode == "threads" and not gil_disabled() and not allow_gil_threads:
+        return "processes"
+    return mode
+
+
+_process_pdf: Optional[pdfplumber.PDF] = None
+_process_job: Optional[PageJob] = None
+
+
+def _init_process(pdf_path: Path, job: PageJob) -> None:
+    global _process_pdf, _process_job
+    _process_pdf = pdfplumber.open(pdf_path)
+    _process_job = job
+
+
+def _run_in_process(index: int) -> Tuple[int, object]:
+    assert _process_pdf is not None and _process_job is not None
+    return index, _process_job(_process_pdf, index)
+
+
+class PagePool(Generic[T]):
+    """Apply ``job(pdf, page_index)`` to pages of ``pdf_path``; results come back in page order.
+
+    For the process pool ``job`` must be picklable (a module-level function
+    or a ``functools.partial`` of one).
+    """
+
+    def __init__(
+        self,
+        pdf_path: Path,
+        job: PageJob,
+        mode: str = "auto",
+        workers: int = 4,
+        allow_gil_threads: bool = False,
+    ):
+        self.pdf_path = pdf_path
+        self.job = job
+        self.workers = workers
+        self.mode = resolve_mode(mode, workers, allow_gil_threads)
+
+    def map(self, indices: Iterable[int]) -> Iterator[Tuple[int, T]]:
+        indices = list(indices)
+        if not indices:
+            return iter(())
+        if self.mode == "threads":
+            return self._map_threads(indices)
+        if self.mode == "processes":
+            return self._map_processes(indices)
+        return self._map_serial(indices)
+
+    def _map_serial(self, indices: List[int]) -> Iterator[Tuple[int, T]]:
+        with pdfplumber.open(self.pdf_path) as pdf:
+            for index in indices:
+                yield index, self.job(pdf, index)
+
+    def _map_threads(self, indices: List[int]) -> Iterator[Tuple[int, T]]:
+        local = threading.local()
+        opened: List[pdfplumber.PDF] = []
+        lock = threading.Lock()
+
+        def run(index: int) -> Tuple[int, T]:
+            pdf = getattr(local, "pdf", None)
+            if pdf is None:
+                pdf = local.pdf = pdfplumber.open(self.pdf_path)
+                with lock:
+                    opened.append(pdf)
+            return index, self.job(pdf, index)
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                yield from executor.map(run, indices)
+        finally:
+            for pdf in opened:
+                pdf.close()
+
+    def _map_processes(self, indices: List[int]) -> Iterator[Tuple[int, T]]:
+        chunksize = max(1, len(indices) // (4 * self.workers))
+        with ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_init_process, initargs=(self.pdf_path, self.job)
+        ) as executor:
+            yield from executor.map(_run_in_process, indices, chunksize=chunksize)  # type: ignore[misc]
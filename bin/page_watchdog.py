@@ -0,0 +1,253 @@
+"""Supervised page extraction in worker processes with per-page time and memory budgets."""
+
+from __future__ import annotations
+
+import csv
+import multiprocessing
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from multiprocessing.connection import Connection, wait
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import pdfplumber
+
+TABLE_SETTINGS = {
+    "vertical_strategy": "lines",
+    "horizontal_strategy": "lines",
+}
+
+# Extraction modes as (name, table settings), from the reference settings to the cheapest fallback. Every mode
+# extracts the text and the tables; a fallback only changes how the tables are found.
+Mode = Tuple[str, Mapping[str, Any]]
+DEFAULT_MODES: Tuple[Mode, ...] = (("lines", TABLE_SETTINGS),)
+
+# Groups of alternatives; tables are only extracted if every group has a hit in the text.
+TableFilter = Tuple[Tuple[str, ...], ...]
+
+
+class PageExtractionFailed(Exception):
+    """Raised when pages could not be extracted in any mode within the budgets."""
+
+
+@dataclass(frozen=True)
+class PageIssue:
+    page: int
+    mode: str
+    reason: str
+    seconds: float
+
+
+@dataclass
+class SupervisedPage:
+    """Precomputed page content exposing the subset of the pdfplumber page API we use."""
+
+    index: int
+    mode: str
+    text: str
+    tables: List[List[List[Optional[str]]]] = field(default_factory=list)
+    table_cells: List[List[List[Optional[Tuple[float, float, float, float]]]]] = field(default_factory=list)
+
+    def extract_text(self) -> str:
+        return self.text
+
+    def extract_tables(self, table_settings: Optional[Dict[str, Any]] = None) -> List[List[List[Optional[str]]]]:
+        return self.tables
+
+    def close(self) -> None:
+        pass
+
+
+def wants_tables(text: str, table_filter: TableFilter) -> bool:
+    return all(any(marker in text for marker in group) for group in table_filter)
+
+
+def extract_page(
+    pdf: pdfplumber.PDF, index: int, mode: str, settings: Mapping[str, Any], table_filter: TableFilter
+) -> SupervisedPage:
+    page = pdf.pages[index]
+    try:
+        text = page.extract_text() or ""
+        if not wants_tables(text, table_filter):
+            return SupervisedPage(index, mode, text)
+        found = page.find_tables(dict(settings))
+        return SupervisedPage(
+            index,
+            mode,
+            text,
+            [table.extract() for table in found],
+            [[list(row.cells) for row in table.rows] for table in found],
+        )
+    finally:
+        page.close()
+
+
+def _worker_main(pdf_path: str, connection: Connection, memory_mb: Optional[int]) -> None:
+    if memory_mb:
+        import resource
+
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    with pdfplumber.open(pdf_path) as pdf:
+        while True:
+            request = connection.recv()
+            if request is None:
+                break
+            index, mode, settings, table_filter = request
+            try:
+                connection.send(("ok", extract_page(pdf, index, mode, settings, table_filter)))
+            except MemoryError:
+                connection.send(("memory", index))
+                break
+            except Exception as exc:  # noqa: BLE001 - reported per page
+                connection.send(("error", index, repr(exc)))
+
+
+class _Worker:
+    def __init__(self, context: Any, pdf_path: Path, memory_mb: Optional[int]):
+        self.connection, child = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main, args=(str(pdf_path), child, memory_mb), daemon=True
+        )
+        self.process.start()
+        child.close()
+        self.task: Optional[Tuple[int, int]] = None
+        self.started = 0.0
+
+    def submit(self, index: int, mode_index: int, mode: Mode, table_filter: TableFilter) -> None:
+        self.task = (index, mode_index)
+        self.started = time.monotonic()
+        self.connection.send((index, mode[0], dict(mode[1]), table_filter))
+
+    def stop(self, force: bool = False) -> None:
+        if force:
+            self.process.kill()
+        else:
+            try:
+                self.connection.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.connection.close()
+
+
+class SupervisedDocument:
+    """Extracts all pages of a PDF in supervised worker processes.
+
+    Each page gets ``timeout`` seconds and each worker ``memory_mb`` of address
+    space. A page exceeding a budget (or raising) is retried in a fresh worker
+    with the next of ``modes``, i.e. cheaper table settings; the caller passes
+    only settings proven to give the reference output. Reading ``pages``
+    raises ``PageExtractionFailed`` if a page fails in every mode, since an
+    empty page would silently drop its rows. All failed attempts are listed
+    in ``issues``. The object can be passed wherever the extractors expect an
+    opened ``pdfplumber.PDF``.
+    """
+
+    def __init__(
+        self,
+        pdf_path: Path,
+        workers: int = 4,
+        timeout: float = 60.0,
+        memory_mb: Optional[int] = 2048,
+        table_filter: TableFilter = (),
+        page_indices: Optional[Sequence[int]] = None,
+        modes: Sequence[Mode] = DEFAULT_MODES,
+    ):
+        self.pdf_path = pdf_path
+        self.modes = tuple(modes)
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.memory_mb = memory_mb
+        self.table_filter = table_filter
+        self.page_indices = page_indices
+        self.issues: List[PageIssue] = []
+        self.failed_pages: List[int] = []
+        self._pages: Optional[List[SupervisedPage]] = None
+
+    @property
+    def pages(self) -> List[SupervisedPage]:
+        if self._pages is None:
+            pages = self._run()
+            if self.failed_pages:
+                numbers = ", ".join(str(index + 1) for index in sorted(self.failed_pages))
+                raise PageExtractionFailed(
+                    f"Seiten {numbers} von {self.pdf_path.name} in keinem Modus innerhalb der Budgets extrahiert"
+                )
+            self._pages = pages
+        return self._pages
+
+    def __enter__(self) -> "SupervisedDocument":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        pass
+
+    def _run(self) -> List[Optional[SupervisedPage]]:
+        if self.page_indices is None:
+            with pdfplumber.open(self.pdf_path) as pdf:
+                indices = list(range(len(pdf.pages)))
+        else:
+            indices = list(self.page_indices)
+        results: Dict[int, Optional[SupervisedPage]] = {}
+        pending: Deque[Tuple[int, int]] = deque((index, 0) for index in indices)
+        context = multiprocessing.get_context()
+        pool = [_Worker(context, self.pdf_path, self.memory_mb) for _ in range(min(self.workers, len(indices) or 1))]
+        try:
+            while pending or any(worker.task for worker in pool):
+                for worker in pool:
+                    if worker.task is None and pending:
+                        index, mode_index = pending.popleft()
+                        worker.submit(index, mode_index, self.modes[mode_index], self.table_filter)
+                busy = [worker for worker in pool if worker.task is not None]
+                now = time.monotonic()
+                next_deadline = min(worker.started + self.timeout for worker in busy)
+                ready = wait([worker.connection for worker in busy], timeout=max(0.0, next_deadline - now))
+                for position, worker in enumerate(pool):
+                    if worker.task is None:
+                        continue
+                    index, mode_index = worker.task
+                    elapsed = time.monotonic() - worker.started
+                    if worker.connection in ready:
+                        try:
+                            message = worker.connection.recv()
+                        except EOFError:
+                            message = ("crashed", index)
+                        if message[0] == "ok":
+                            results[index] = message[1]
+                            worker.task = None
+                            continue
+                        reason = message[2] if message[0] == "error" else message[0]
+                        restart = message[0] != "error"
+                    elif elapsed >= self.timeout:
+                        reason = f"timeout nach {self.timeout:.0f}s"
+                        restart = True
+                    else:
+                        continue
+                    self.issues.append(PageIssue(index, self.modes[mode_index][0], reason, round(elapsed, 3)))
+                    worker.task = None
+                    if restart:
+                        worker.stop(force=True)
+                        pool[position] = _Worker(context, self.pdf_path, self.memory_mb)
+                    if mode_index + 1 < len(self.modes):
+                        pending.appendleft((index, mode_index + 1))
+                    else:
+                        results[index] = None
+                        self.failed_pages.append(index)
+        finally:
+            for worker in pool:
+                worker.stop()
+        return [results[index] for index in indices]
+
+
+def write_issue_report(issues: Sequence[PageIssue], output_path: Path) -> None:
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with output_path.open("w", newline="", encoding="utf-8") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(["seite", "modus", "grund", "sekunden"])
+        for issue in issues:
+            writer.writerow([issue.page + 1, issue.mode, issue.reason, issue.seconds])
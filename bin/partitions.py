@@ -0,0 +1,73 @@
+"""Partitioned dataset layout (Gemeinde / Jahr / Dokument) for many municipalities.
+
+Input documents live under ``<input-root>/<gemeinde>/<jahr>/<dokument>.pdf``
+(e.g. ``input/gemeinden/lensahn/2024/schlussbilanz.pdf``); the outputs of a
+partition are written to ``<output-root>/<gemeinde>/<jahr>/``. The existing
+single-municipality folder ``input/balance`` can be mapped into the same layout.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional
+
+DOCUMENT_SCHLUSSBILANZ = "schlussbilanz"
+DOCUMENT_HAUSHALT = "haushalt"
+
+LEGACY_FOLDERS = {
+    DOCUMENT_SCHLUSSBILANZ: ("balance", "Schlussbilanz"),
+    DOCUMENT_HAUSHALT: ("budget", "Haushalt"),
+}
+
+
+@dataclass(frozen=True, order=True)
+class Partition:
+    gemeinde: str
+    jahr: int
+    dokument: str
+    path: Path
+
+    def output_dir(self, output_root: Path) -> Path:
+        return output_root / self.gemeinde / str(self.jahr)
+
+    @property
+    def label(self) -> str:
+        return f"{self.gemeinde}/{self.jahr}/{self.dokument}"
+
+
+def discover_partitions(
+    input_root: Path,
+    dokument: str = DOCUMENT_SCHLUSSBILANZ,
+    gemeinden: Optional[Iterable[str]] = None,
+    years: Optional[Iterable[int]] = None,
+) -> List[Partition]:
+    """Return all partitions below ``input_root``, sorted by Gemeinde and Jahr."""
+
+    wanted_gemeinden = set(gemeinden) if gemeinden else None
+    wanted_years = set(years) if years else None
+    partitions: List[Partition] = []
+    for path in input_root.glob(f"*/*/{dokument}.pdf"):
+        gemeinde = path.parent.parent.name
+        year_part = path.parent.name
+        if not year_part.isdigit():
+            continue
+        if wanted_gemeinden is not None and gemeinde not in wanted_gemeinden:
+            continue
+        if wanted_years is not None and int(year_part) not in wanted_years:
+            continue
+        partitions.append(Partition(gemeinde, int(year_part), dokument, path))
+    return sorted(partitions)
+
+
+def legacy_partitions(
+    gemeinde: str, input_dir: Path = Path("input"), dokument: str = DOCUMENT_SCHLUSSBILANZ
+) -> Iterator[Partition]:
+    """Map ``input/balance/Schlussbilanz <Jahr>.pdf`` (or budget) to partitions of ``gemeinde``."""
+
+    folder, prefix = LEGACY_FOLDERS[dokument]
+    for path in sorted((input_dir / folder).glob(f"{prefix} *.pdf")):
+        match = re.search(r"(\d{4})", path.name)
+        if match:
+            yield Partition(gemeinde, int(match.group(1)), dokument, path)
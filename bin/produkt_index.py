@@ -0,0 +1,180 @@
+"""Locate the Teilergebnisrechnung pages of a Produkt by bisecting the page headers."""
+
+from __future__ import annotations
+
+import argparse
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pdfplumber
+
+from extract_account_teilergebnisse import (
+    PRODUKT_PATTERN,
+    TABLE_SETTINGS,
+    build_default_pdf_path,
+    clean_cell,
+    extract_data_rows,
+)
+
+HEADER_FRACTION = 0.25
+
+
+@dataclass(frozen=True)
+class PageHeader:
+    produkt: Optional[int]
+    produkt_name: str
+    teilergebnis: bool
+
+
+class ProduktPageIndex:
+    """Bisects the ascending Produkt pages of a Schlussbilanz.
+
+    Only the top ``HEADER_FRACTION`` of a probed page is read. Probed headers are
+    memoised, so several lookups against the same document share their probes.
+    Only pages whose header names both a Produkt and the Teilergebnisrechnung
+    count as keys: Produkt headers elsewhere in the document (Teilfinanzrechnung,
+    Produktbeschreibungen) are not in ascending order with them. Every page is
+    ordered by the next key page at or after it, however many pages lie in
+    between, and pages after the last key page come last; this keeps the order
+    monotonic. The next key page found for a page is memoised for all pages
+    stepped over, so each run of other pages is read only once.
+    """
+
+    def __init__(self, pdf: pdfplumber.PDF):
+        self.pdf = pdf
+        self.page_count = len(pdf.pages)
+        self._headers: Dict[int, PageHeader] = {}
+        self._next_keys: Dict[int, Optional[int]] = {}
+
+    @property
+    def probes(self) -> int:
+        return len(self._headers)
+
+    def header(self, index: int) -> PageHeader:
+        cached = self._headers.get(index)
+        if cached is not None:
+            return cached
+        page = self.pdf.pages[index]
+        top = page.crop((0, 0, page.width, page.height * HEADER_FRACTION))
+        text = top.extract_text() or ""
+        page.close()
+        match = PRODUKT_PATTERN.search(text)
+        if match:
+            header = PageHeader(
+                produkt=int(match.group("num")),
+                produkt_name=match.group("name").strip(),
+                teilergebnis="Teilergebnisrechnung" in text,
+            )
+        else:
+            header = PageHeader(produkt=None, produkt_name="", teilergebnis="Teilergebnisrechnung" in text)
+        self._headers[index] = header
+        return header
+
+    def is_key(self, index: int) -> bool:
+        header = self.header(index)
+        return header.produkt is not None and header.teilergebnis
+
+    def _next_key(self, index: int) -> Optional[int]:
+        """The first key page at or after ``index``, or ``None`` if no key page follows."""
+
+        stepped: List[int] = []
+        found: Optional[int] = None
+        candidate = index
+        while candidate < self.page_count:
+            if candidate in self._next_keys:
+                found = self._next_keys[candidate]
+                break
+            stepped.append(candidate)
+            if self.is_key(candidate):
+                found = candidate
+                break
+            candidate += 1
+        for page in stepped:
+            self._next_keys[page] = found
+        return found
+
+    def _key(self, index: int) -> tuple[int, float]:
+        """Return ``(page, produkt)`` of the next key page for bisection; ``+inf`` after the last one."""
+
+        found = self._next_key(index)
+        if found is None:
+            return index, float("inf")
+        return found, float(self.header(found).produkt)
+
+    def find_pages(self, produkt: str | int) -> List[int]:
+        """Return the 0-based indices of the Teilergebnisrechnung pages of ``produkt``."""
+
+        target = int(produkt)
+        lo, hi = 0, self.page_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            _, key = self._key(mid)
+            if key < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo >= self.page_count:
+            return []
+        start, key = self._key(lo)
+        if key != target:
+            return []
+        # The Produkt's pages run on while the header names the Teilergebnisrechnung and no other Produkt.
+        pages: List[int] = []
+        for index in range(start, self.page_count):
+            header = self.header(index)
+            if not header.teilergebnis or header.produkt not in (None, target):
+                break
+            pages.append(index)
+        return pages
+
+    def teilergebnis_rows(self, produkt: str | int) -> List[List[str]]:
+        """Return the data rows of the Produkt's Teilergebnisrechnung table(s)."""
+
+        rows: List[List[str]] = []
+        for index in self.find_pages(produkt):
+            for table in self.pdf.pages[index].extract_tables(TABLE_SETTINGS):
+                if not table or not table[0]:
+                    continue
+                if "Teilergebnisrechnung" not in clean_cell(table[0][0]):
+                    continue
+                rows.extend(extract_data_rows(table))
+        return rows
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Findet die Seiten der Teilergebnisrechnung eines Produkts per Binärsuche."
+    )
+    parser.add_argument("year", help="Haushaltsjahr (z.B. 2024)")
+    parser.add_argument("produkte", nargs="+", metavar="produkt", help="Produktnummer (z.B. 111000)")
+    parser.add_argument("--pdf", dest="pdf_path", type=Path, help="Pfad zur Schlussbilanz-PDF")
+    parser.add_argument("--rows", action="store_true", help="Zeilen der Teilergebnisrechnung ausgeben")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    pdf_path = args.pdf_path or build_default_pdf_path(args.year)
+    if not pdf_path.exists():
+        raise SystemExit(f"PDF nicht gefunden: {pdf_path}")
+    with pdfplumber.open(pdf_path) as pdf:
+        index = ProduktPageIndex(pdf)
+        for produkt in args.produkte:
+            pages = index.find_pages(produkt)
+            if not pages:
+                print(f"Produkt {produkt}: keine Teilergebnisrechnung gefunden")
+                continue
+            header = index.header(pages[0])
+            print(
+                f"Produkt {produkt} - {header.produkt_name}: Seiten "
+                f"{', '.join(str(page + 1) for page in pages)}"
+            )
+            if args.rows:
+                for row in index.teilergebnis_rows(produkt):
+                    print("  " + " | ".join(row))
+        print(f"Geprüfte Kopfzeilen: {index.probes} von {index.page_count} Seiten")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""Side index recording the page and bounding box of every extracted value.
+
+Each output CSV ``foo.csv`` can have a ``foo.provenance.jsonl`` next to it with
+one record per value: the data row (1-based, header excluded), the column, the
+source PDF, the page (1-based), the bounding box and the raw text found there.
+``verify`` re-reads only the recorded regions and checks them against the CSV.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+from dataclasses import dataclass
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import pdfplumber
+from pdfplumber import utils
+
+BBox = Tuple[float, float, float, float]
+
+
+@dataclass(frozen=True)
+class Source:
+    """Where a value was read: page index (0-based), ``(x0, top, x1, bottom)`` and raw text."""
+
+    page: int
+    bbox: BBox
+    raw: str
+
+    def to_list(self) -> List[Any]:
+        return [self.page, *self.bbox, self.raw]
+
+    @classmethod
+    def from_list(cls, values: Sequence[Any]) -> "Source":
+        page, x0, top, x1, bottom, raw = values
+        return cls(int(page), (float(x0), float(top), float(x1), float(bottom)), raw)
+
+
+@dataclass(frozen=True)
+class ProvenanceRecord:
+    zeile: int
+    spalte: str
+    pdf: str
+    source: Source
+
+
+def clean_text(text: Optional[str]) -> str:
+    return " ".join((text or "").split())
+
+
+def extract_tables_with_cells(
+    page: Any, table_settings: Dict[str, Any]
+) -> List[Tuple[List[List[Optional[str]]], List[List[Optional[BBox]]]]]:
+    """Return every table of a page together with the bounding boxes of its cells.
+
+    Works on pdfplumber pages and on precomputed pages from the watchdog, which
+    carry the cell boxes in ``table_cells``.
+    """
+
+    if hasattr(page, "table_cells"):
+        return list(zip(page.extract_tables(table_settings), page.table_cells))
+    found = page.find_tables(table_settings)
+    return [(table.extract(), [list(row.cells) for row in table.rows]) for table in found]
+
+
+def read_region(page: pdfplumber.page.Page, bbox: BBox) -> str:
+    """Return the text of the characters whose midpoint lies inside ``bbox``."""
+
+    x0, top, x1, bottom = bbox
+    chars = [
+        char
+        for char in page.crop(bbox, strict=False).chars
+        if x0 <= (char["x0"] + char["x1"]) / 2 <= x1 and top <= (char["top"] + char["bottom"]) / 2 <= bottom
+    ]
+    return clean_text(utils.extract_text(chars)) if chars else ""
+
+
+def provenance_path(output_path: Path) -> Path:
+    return output_path.with_suffix(".provenance.jsonl")
+
+
+def write_provenance(output_path: Path, pdf_path: Path, values: Iterable[Tuple[int, str, Optional[Source]]]) -> Path:
+    """Write the side index of ``output_path``; values without a source are skipped."""
+
+    index_path = provenance_path(output_path)
+    with index_path.open("w", encoding="utf-8") as handle:
+        for zeile, spalte, source in values:
+            if source is None:
+                continue
+            record = {
+                "zeile": zeile,
+                "spalte": spalte,
+                "pdf": str(pdf_path),
+                "seite": source.page + 1,
+                "bbox": [round(value, 2) for value in source.bbox],
+                "rohwert": source.raw,
+            }
+            handle.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return index_path
+
+
+def read_provenance(output_path: Path) -> Iterator[ProvenanceRecord]:
+    index_path = provenance_path(output_path)
+    if not index_path.exists():
+        raise SystemExit(f"Kein Herkunftsindex gefunden: {index_path}")
+    with index_path.open(encoding="utf-8") as handle:
+        for line in handle:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            source = Source(record["seite"] - 1, tuple(record["bbox"]), record["rohwert"])
+            yield ProvenanceRecord(record["zeile"], record["spalte"], record["pdf"], source)
+
+
+def as_number(text: str) -> Optional[Decimal]:
+    """Parse German (``1.234,56-``) and plain (``-1234.56``) numbers; None for other text."""
+
+    value = clean_text(text).replace(" ", "")
+    negative = value.endswith("-") or value.startswith("-")
+    value = value.strip("-")
+    if "," in value:
+        value = value.replace(".", "").replace(",", ".")
+    try:
+        number = Decimal(value)
+    except InvalidOperation:
+        return None
+    return -number if negative else number
+
+
+def values_match(output_value: str, raw: str) -> bool:
+    number = as_number(output_value)
+    if number is not None:
+        return number == as_number(raw)
+    return clean_text(output_value) == clean_text(raw)
+
+
+@dataclass(frozen=True)
+class Finding:
+    record: ProvenanceRecord
+    output_value: str
+    pdf_value: str
+
+    @property
+    def ok(self) -> bool:
+        return self.pdf_value == clean_text(self.record.source.raw) and values_match(
+            self.output_value, self.pdf_value
+        )
+
+
+def verify_output(
+    output_path: Path, zeile: Optional[int] = None, spalte: Optional[str] = None
+) -> List[Finding]:
+    """Re-read the recorded regions of ``output_path`` (or one row/column of it)."""
+
+    with output_path.open(newline="", encoding="utf-8") as handle:
+        rows = list(csv.DictReader(handle))
+    records = [
+        record
+        for record in read_provenance(output_path)
+        if (zeile is None or record.zeile == zeile) and (spalte is None or record.spalte == spalte)
+    ]
+    findings: List[Finding] = []
+    documents: Dict[str, pdfplumber.PDF] = {}
+    try:
+        for record in sorted(records, key=lambda r: (r.pdf, r.source.page)):
+            if record.pdf not in documents:
+                documents[record.pdf] = pdfplumber.open(record.pdf)
+            page = documents[record.pdf].pages[record.source.page]
+            pdf_value = read_region(page, record.source.bbox)
+            page.close()
+            output_value = rows[record.zeile - 1].get(record.spalte, "") if record.zeile <= len(rows) else ""
+            findings.append(Finding(record, output_value, pdf_value))
+    finally:
+        for document in documents.values():
+            document.close()
+    return sorted(findings, key=lambda finding: (finding.record.zeile, finding.record.spalte))
+
+
+def describe(finding: Finding) -> str:
+    record = finding.record
+    bbox = ", ".join(f"{value:.1f}" for value in record.source.bbox)
+    status = "OK" if finding.ok else "ABWEICHUNG"
+    return (
+        f"Zeile {record.zeile}, {record.spalte}: CSV '{finding.output_value}', "
+        f"PDF '{finding.pdf_value}' (Seite {record.source.page + 1}, [{bbox}]) {status}"
+    )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Herkunft extrahierter Werte anzeigen und gegen das PDF prüfen.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    verify = subparsers.add_parser("verify", help="Werte einer Ausgabedatei am PDF nachprüfen")
+    verify.add_argument("output", type=Path, help="Ausgabedatei (CSV) mit zugehörigem .provenance.jsonl")
+    verify.add_argument("--zeile", type=int, help="Nur diese Datenzeile prüfen (1 = erste Zeile nach dem Kopf)")
+    verify.add_argument("--spalte", help="Nur diese Spalte prüfen")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    findings = verify_output(args.output, args.zeile, args.spalte)
+    if not findings:
+        raise SystemExit("Keine passenden Einträge im Herkunftsindex.")
+    single = args.zeile is not None
+    for finding in findings:
+        if single or not finding.ok:
+            print(describe(finding))
+    failures = sum(1 for finding in findings if not finding.ok)
+    print(f"{len(findings) - failures} von {len(findings)} Werten bestätigt.")
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
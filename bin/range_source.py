@@ -0,0 +1,393 @@
+"""Read PDFs from an HTTP document server or object store with byte-range requests.
+
+Targeted extractions, such as the Gewerbesteuer counts or the 6.4 Ertragslage
+at the end of a Schlussbilanz, touch a handful of pages of a multi-megabyte
+file. ``RangeFile`` is a seekable, read-only file object over a URL that
+fetches only the blocks a reader actually touches, with ``Range`` requests,
+and keeps them in a block cache on disk. ``open_pdf`` opens local paths as
+before and URLs through a ``RangeFile``, so pdfplumber parses the trailer,
+cross-reference table and the requested pages without downloading the rest::
+
+    with open_pdf("https://dokumente.example/balance/Schlussbilanz%202024.pdf") as pdf:
+        text = pdf.pages[-1].extract_text()
+
+pdfminer reads the content streams of all pages when it builds the page
+list; ``RangePDF`` defers that until a page is actually interpreted, so
+opening a remote document only transfers its page tree. It hooks into
+``PDFPage._parse_contents`` (pdfminer.six 20250327 and later); with a
+pdfminer that lacks it, remote documents are opened with the plain
+``pdfplumber.PDF`` instead.
+
+Any server that answers ``HEAD`` and single ``Range`` requests will do, which
+includes object stores behind presigned URLs. The cache is keyed by the URL
+and the document's ``ETag`` (or ``Last-Modified``) and size, so a republished
+document is fetched again. A document whose server sends neither header
+cannot be told apart from a republished one of the same size, so its blocks
+are kept in memory for the one reader only and never written to the cache.
+A response with a different ``ETag`` or ``Last-Modified`` in the middle of
+reading aborts instead of mixing two versions. Servers that ignore ``Range``
+still work, at the cost of one full download.
+
+``serve`` starts a local stand-in server for such a source::
+
+    python bin/range_source.py serve input --port 8765
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import http.server
+import io
+import os
+import re
+import tempfile
+import urllib.request
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path, PurePosixPath
+from typing import Dict, Iterator, List, Mapping, Optional, Tuple, Union
+from urllib.parse import unquote, urlparse
+
+import pdfplumber
+from pdfminer.pdfpage import PDFPage
+from pdfplumber.page import Page
+from pdfplumber.utils.exceptions import PdfminerException
+
+BLOCK_SIZE = 64 * 1024
+CACHE_ENV = "GRN_RANGE_CACHE"
+REQUEST_TIMEOUT = 30.0
+
+CONTENT_RANGE_PATTERN = re.compile(r"bytes (\d+)-(\d+)/(\d+|\*)")
+RANGE_PATTERN = re.compile(r"bytes=(\d*)-(\d*)")
+
+Source = Union[str, Path]
+
+
+def is_remote(source: Source) -> bool:
+    return isinstance(source, str) and urlparse(source).scheme in ("http", "https")
+
+
+def source_name(source: Source) -> str:
+    """File name of a path or URL, e.g. ``Schlussbilanz 2024.pdf``."""
+
+    if is_remote(source):
+        return PurePosixPath(unquote(urlparse(str(source)).path)).name
+    return Path(source).name
+
+
+def default_cache_dir() -> Path:
+    configured = os.environ.get(CACHE_ENV)
+    if configured:
+        return Path(configured)
+    return Path(tempfile.gettempdir()) / f"grn-lensahn-ranges-{os.getuid()}"
+
+
+@dataclass
+class TransferStats:
+    requests: int = 0
+    bytes: int = 0
+    cached_blocks: int = 0
+
+
+class BlockCache:
+    """Blocks of one document version, one file per block under ``<root>/<key>/``."""
+
+    def __init__(self, root: Path, key: str):
+        self.directory = root / key
+
+    def get(self, index: int) -> Optional[bytes]:
+        try:
+            return (self.directory / str(index)).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def put(self, index: int, data: bytes) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Written under a temporary name first, so that a concurrent reader never sees half a block.
+        partial_path = self.directory / f"{index}.{os.getpid()}.tmp"
+        partial_path.write_bytes(data)
+        partial_path.replace(self.directory / str(index))
+
+
+class RangeFile(io.RawIOBase):
+    """Seekable read-only view of a URL, fetched block by block with ``Range`` requests."""
+
+    def __init__(
+        self,
+        url: str,
+        block_size: int = BLOCK_SIZE,
+        cache_dir: Optional[Path] = None,
+        headers: Optional[Mapping[str, str]] = None,
+    ):
+        super().__init__()
+        self.url = url
+        self.block_size = block_size
+        self.headers = dict(headers or {})
+        self.stats = TransferStats()
+        self._blocks: Dict[int, bytes] = {}
+        self._position = 0
+        self.size, self.etag, self.last_modified = self._probe()
+        self.cache: Optional[BlockCache] = None
+        validator = self.etag or self.last_modified
+        if validator:
+            version = f"{url}\0{validator}\0{self.size}\0{block_size}"
+            key = hashlib.sha256(version.encode("utf-8")).hexdigest()[:32]
+            self.cache = BlockCache(cache_dir or default_cache_dir(), key)
+
+    def _request(self, method: str, extra: Optional[Mapping[str, str]] = None):
+        request = urllib.request.Request(self.url, method=method, headers={**self.headers, **(extra or {})})
+        self.stats.requests += 1
+        return urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT)
+
+    def _probe(self) -> Tuple[int, str, str]:
+        """Size, ``ETag`` and ``Last-Modified`` of the document, from a ``HEAD`` request."""
+
+        with self._request("HEAD") as response:
+            length = response.headers.get("Content-Length")
+            if length is None:
+                raise OSError(f"{self.url}: Server nennt keine Dateigröße (Content-Length)")
+            return int(length), response.headers.get("ETag", ""), response.headers.get("Last-Modified", "")
+
+    # io.RawIOBase interface
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f"Ungültiges whence: {whence}")
+        if position < 0:
+            raise ValueError(f"Negative Position: {position}")
+        self._position = position
+        return position
+
+    def readinto(self, buffer) -> int:
+        end = min(self._position + len(buffer), self.size)
+        if end <= self._position:
+            return 0
+        data = self.read_range(self._position, end)
+        buffer[: len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+    # Blocks
+
+    def read_range(self, start: int, end: int) -> bytes:
+        """Bytes ``start`` up to (excluding) ``end``, fetching the blocks not cached yet."""
+
+        first, last = start // self.block_size, (end - 1) // self.block_size
+        self._ensure(first, last)
+        data = b"".join(self._blocks[index] for index in range(first, last + 1))
+        offset = first * self.block_size
+        return data[start - offset : end - offset]
+
+    def _ensure(self, first: int, last: int) -> None:
+        missing: List[int] = []
+        for index in range(first, last + 1):
+            if index in self._blocks:
+                continue
+            cached = self.cache.get(index) if self.cache is not None else None
+            if cached is not None:
+                self._blocks[index] = cached
+                self.stats.cached_blocks += 1
+            else:
+                missing.append(index)
+        for run_first, run_last in consecutive_runs(missing):
+            self._fetch(run_first, run_last)
+
+    def _fetch(self, first: int, last: int) -> None:
+        start = first * self.block_size
+        end = min((last + 1) * self.block_size, self.size) - 1
+        with self._request("GET", {"Range": f"bytes={start}-{end}"}) as response:
+            data = response.read()
+            status = response.status
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+            content_range = response.headers.get("Content-Range", "")
+        self.stats.bytes += len(data)
+        if (etag and self.etag and etag != self.etag) or (
+            not self.etag and last_modified and self.last_modified and last_modified != self.last_modified
+        ):
+            raise OSError(f"{self.url} hat sich während des Lesens geändert")
+        if status == 200:
+            # The server ignored the range and sent the whole document.
+            start = 0
+            first, last = 0, (len(data) - 1) // self.block_size
+        else:
+            match = CONTENT_RANGE_PATTERN.fullmatch(content_range)
+            if match is None or int(match.group(1)) != start:
+                raise OSError(f"{self.url}: unerwarteter Content-Range {content_range!r} für Bytes {start}-{end}")
+        for index in range(first, last + 1):
+            offset = index * self.block_size - start
+            block = data[offset : offset + self.block_size]
+            self._blocks[index] = block
+            if self.cache is not None:
+                self.cache.put(index, block)
+
+
+def consecutive_runs(indices: List[int]) -> Iterator[Tuple[int, int]]:
+    """Group sorted block indices into ``(first, last)`` runs that one request can fetch."""
+
+    run_first = None
+    previous = None
+    for index in indices:
+        if run_first is None:
+            run_first = index
+        elif index != previous + 1:
+            yield run_first, previous
+            run_first = index
+        previous = index
+    if run_first is not None:
+        yield run_first, previous
+
+
+# The hook LazyContentsPage overrides; pdfminer.six before 20250327 resolves the contents inline.
+LAZY_CONTENTS = hasattr(PDFPage, "_parse_contents")
+
+
+class LazyContentsPage(PDFPage):
+    """A ``PDFPage`` that resolves its content streams on first use instead of when the page tree is read."""
+
+    def _parse_contents(self, value: object) -> object:
+        return value
+
+    @property
+    def contents(self) -> list:
+        if self._resolved_contents is None:
+            self._resolved_contents = PDFPage._parse_contents(self, self._contents_reference)
+        return self._resolved_contents
+
+    @contents.setter
+    def contents(self, value: object) -> None:
+        self._contents_reference = value
+        self._resolved_contents = None
+
+
+class RangePDF(pdfplumber.PDF):
+    """``pdfplumber.PDF`` whose pages read their content streams only when they are interpreted."""
+
+    @property
+    def pages(self) -> List[Page]:
+        if hasattr(self, "_pages"):
+            return self._pages
+        # Same as pdfplumber.PDF.pages, except for the page class.
+        doctop = 0
+        self._pages = []
+        try:
+            for index, page_obj in enumerate(LazyContentsPage.create_pages(self.doc)):
+                page_number = index + 1
+                if self.pages_to_parse is not None and page_number not in self.pages_to_parse:
+                    continue
+                page = Page(self, page_obj, page_number=page_number, initial_doctop=doctop)
+                self._pages.append(page)
+                doctop += page.height
+        except Exception as error:
+            raise PdfminerException(error)
+        return self._pages
+
+
+def open_pdf(source: Source, **options) -> pdfplumber.PDF:
+    """``pdfplumber.open`` for a local path or, reading only the needed byte ranges, an HTTP(S) URL."""
+
+    if is_remote(source):
+        pdf_class = RangePDF if LAZY_CONTENTS else pdfplumber.PDF
+        return pdf_class.open(RangeFile(str(source)), **options)
+    return pdfplumber.open(source, **options)
+
+
+def transfer_summary(pdf: pdfplumber.PDF) -> Optional[str]:
+    """How much of a remote document was transferred; ``None`` for local files."""
+
+    stream = pdf.stream
+    if not isinstance(stream, RangeFile):
+        return None
+    stats = stream.stats
+    share = f"{stats.bytes / stream.size:.1%}".replace(".", ",") if stream.size else "-"
+    return (
+        f"{source_name(stream.url)}: {stats.bytes:,} von {stream.size:,} Bytes übertragen".replace(",", ".")
+        + f" ({share}, {stats.requests} Anfragen, {stats.cached_blocks} Blöcke aus dem Cache)"
+    )
+
+
+class RangeRequestHandler(http.server.SimpleHTTPRequestHandler):
+    """Static files with ``ETag`` and single ``Range`` requests, like a document server or object store."""
+
+    def send_head(self):
+        path = self.translate_path(self.path)
+        if not os.path.isfile(path):
+            return super().send_head()
+        stat = os.stat(path)
+        size = stat.st_size
+        match = RANGE_PATTERN.fullmatch(self.headers.get("Range", "").strip())
+        if match is None or not any(match.groups()):
+            start, end, status = 0, size - 1, 200
+        elif match.group(1):
+            start = int(match.group(1))
+            end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+            status = 206
+        else:
+            start, end, status = max(0, size - int(match.group(2))), size - 1, 206
+        if start >= size > 0 and status == 206:
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{size}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return None
+        with open(path, "rb") as handle:
+            handle.seek(start)
+            body = handle.read(end - start + 1) if self.command == "GET" else b""
+        self.send_response(status)
+        self.send_header("Content-Type", self.guess_type(path))
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", f'"{stat.st_mtime_ns:x}-{size:x}"')
+        self.send_header("Last-Modified", self.date_time_string(int(stat.st_mtime)))
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.end_headers()
+        return io.BytesIO(body)
+
+
+def serve(directory: Path, host: str, port: int) -> None:
+    handler = partial(RangeRequestHandler, directory=str(directory))
+    with http.server.ThreadingHTTPServer((host, port), handler) as server:
+        print(f"Dokumentserver für {directory} unter http://{host}:{server.server_address[1]}/", flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Lokaler Dokumentserver mit Range-Anfragen als Ersatz für eine HTTP-Quelle."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    serve_parser = subparsers.add_parser("serve", help="Verzeichnis per HTTP mit Range-Unterstützung bereitstellen")
+    serve_parser.add_argument("directory", type=Path)
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8765)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    if args.command == "serve":
+        serve(args.directory, args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""Hierarchical rollups with bottom-up subtotal verification.
+
+A ``RollupTree`` holds rows of integer values (cents or counts) in a tree,
+for example category → subcategory → product. The children of a node are
+grouped by their *breakdown* (how they divide the parent up), and a rule per
+breakdown says whether they must add up to the parent:
+
+* ``COMPLETE``: the children add up to the parent,
+* ``PARTIAL``: the children cover part of the parent, so their sum may not
+  exceed it,
+* no rule: the children are details that are not summed (e.g. counts).
+
+``rollup`` works level by level from the leaves up. On each level the
+children of all nodes are summed with a single ``np.add.at`` over a
+node-by-column matrix.
+Missing parent values of a complete breakdown are filled in with the
+subtotal, so they feed the next level up. Values that do not reconcile are
+returned as ``RollupIssue``. Columns in which none of the children has a
+value are not checked. Nodes are kept in insertion order, so ``walk``
+yields the hierarchy as it was built, without sorting.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+COMPLETE = "complete"
+PARTIAL = "partial"
+
+
+@dataclass(eq=False)
+class RollupNode:
+    key: str
+    breakdown: str = ""
+    payload: Any = None
+    parent: Optional["RollupNode"] = None
+    children: Dict[str, "RollupNode"] = field(default_factory=dict)
+    values: Optional[Sequence[Optional[int]]] = None
+
+    @property
+    def path(self) -> Tuple[str, ...]:
+        node: Optional[RollupNode] = self
+        keys: List[str] = []
+        while node is not None and node.parent is not None:
+            keys.append(node.key)
+            node = node.parent
+        return tuple(reversed(keys))
+
+    def child(self, key: str) -> RollupNode:
+        return self.children[key]
+
+
+@dataclass(frozen=True)
+class RollupIssue:
+    path: Tuple[str, ...]
+    breakdown: str
+    column: int
+    parent_value: int
+    children_sum: int
+
+
+class RollupTree:
+    def __init__(self, width: int, rules: Mapping[str, str], tolerance: int = 1):
+        self.width = width
+        self.rules = dict(rules)
+        self.tolerance = tolerance
+        self.root = RollupNode("")
+
+    def add(
+        self,
+        parent: RollupNode,
+        key: str,
+        values: Optional[Sequence[Optional[int]]] = None,
+        payload: Any = None,
+        breakdown: str = "",
+    ) -> RollupNode:
+        """Add a child to ``parent``, or fill in a placeholder added earlier under the same key."""
+
+        node = parent.children.get(key)
+        if node is None:
+            node = parent.children[key] = RollupNode(key, breakdown, payload, parent)
+        elif node.payload is not None and payload is not None:
+            raise ValueError(f"Doppelter Eintrag in der Hierarchie: {' / '.join((*parent.path, key))}")
+        else:
+            node.breakdown = breakdown or node.breakdown
+            node.payload = payload if payload is not None else node.payload
+        if values is not None:
+            if len(values) != self.width:
+                raise ValueError(f"{key}: {len(values)} Werte statt {self.width}")
+            node.values = values
+        return node
+
+    def node(self, path: Sequence[str]) -> RollupNode:
+        node = self.root
+        for key in path:
+            node = node.child(key)
+        return node
+
+    def walk(self) -> Iterator[RollupNode]:
+        """All nodes below the root, parents before their children, in insertion order."""
+
+        stack = list(reversed(self.root.children.values()))
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children.values()))
+
+    def _matrix(self, nodes: Sequence[RollupNode]) -> Tuple[np.ndarray, np.ndarray]:
+        values = np.zeros((len(nodes), self.width), dtype=np.int64)
+        present = np.zeros((len(nodes), self.width), dtype=bool)
+        for position, node in enumerate(nodes):
+            for column, value in enumerate(node.values or ()):
+                if value is not None:
+                    values[position, column] = value
+                    present[position, column] = True
+        return values, present
+
+    def rollup(self) -> List[RollupIssue]:
+        """Compute subtotals bottom-up and return every parent whose children do not reconcile."""
+
+        nodes = list(self.walk())
+        if not nodes:
+            return []
+        values, present = self._matrix(nodes)
+        filled = np.zeros(len(nodes), dtype=bool)
+        position_of = {id(node): position for position, node in enumerate(nodes)}
+        depths = np.array([len(node.path) for node in nodes])
+
+        # One group per (parent, breakdown) with a rule; children without a rule are not summed.
+        group_of: Dict[Tuple[int, str], int] = {}
+        groups = np.full(len(nodes), -1)
+        for position, node in enumerate(nodes):
+            if node.parent is not self.root and node.breakdown in self.rules:
+                key = (position_of[id(node.parent)], node.breakdown)
+                groups[position] = group_of.setdefault(key, len(group_of))
+        group_parent = [parent for parent, _breakdown in group_of]
+        group_breakdown = [breakdown for _parent, breakdown in group_of]
+
+        issues: List[RollupIssue] = []
+        for depth in range(int(depths.max()), 1, -1):
+            members = np.flatnonzero((depths == depth) & (groups >= 0))
+            if members.size == 0:
+                continue
+            sums = np.zeros((len(group_of), self.width), dtype=np.int64)
+            counted = np.zeros((len(group_of), self.width), dtype=bool)
+            np.add.at(sums, groups[members], values[members])
+            np.logical_or.at(counted, groups[members], present[members])
+            for group in np.unique(groups[members]):
+                parent = group_parent[group]
+                if self.rules[group_breakdown[group]] == COMPLETE:
+                    missing = counted[group] & ~present[parent]
+                    if missing.any():
+                        values[parent, missing] = sums[group, missing]
+                        present[parent, missing] = True
+                        filled[parent] = True
+                    bad = counted[group] & (np.abs(values[parent] - sums[group]) > self.tolerance)
+                else:
+                    bad = counted[group] & present[parent] & (sums[group] - values[parent] > self.tolerance)
+                issues.extend(
+                    RollupIssue(
+                        nodes[parent].path,
+                        group_breakdown[group],
+                        int(column),
+                        int(values[parent, column]),
+                        int(sums[group, column]),
+                    )
+                    for column in np.flatnonzero(bad)
+                )
+
+        for position in np.flatnonzero(filled):
+            nodes[position].values = [
+                int(value) if flag else None for value, flag in zip(values[position], present[position])
+            ]
+        return issues
@@ -0,0 +1,219 @@
+"""Extract and aggregate many Gemeinde/Jahr partitions in parallel.
+
+``extract`` runs the single-pass section engine for every partition in a
+process pool and writes one CSV per section plus a ``manifest.json`` into the
+partition's output folder. Partitions whose manifest is newer than the PDF are
+skipped, and so are partitions for which ``differential.py`` has not proven the
+engine's sections (see ``sections.missing_proofs``). ``aggregate`` concatenates a section across all partitions into one
+long table with ``Gemeinde`` and ``Jahr`` columns, streaming partition by
+partition so that memory does not grow with the number of partitions.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Set
+
+import pandas as pd
+import pdfplumber
+
+from fast_path_proofs import proof_command
+from partitions import Partition, discover_partitions, legacy_partitions
+from sections import missing_proofs, resolve_sections, run_sections
+
+MANIFEST_NAME = "manifest.json"
+
+
+def is_up_to_date(partition: Partition, output_root: Path, sections: Sequence[str]) -> bool:
+    manifest_path = partition.output_dir(output_root) / MANIFEST_NAME
+    if not manifest_path.exists():
+        return False
+    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    if manifest.get("source_mtime_ns") != partition.path.stat().st_mtime_ns:
+        return False
+    return set(sections) <= set(manifest.get("sections", {}))
+
+
+def unproven_partitions(partitions: Sequence[Partition], section_names: Sequence[str]) -> List[Partition]:
+    """Report and return the partitions lacking a proof for one of the sections."""
+
+    specs = resolve_sections(section_names)
+    unproven: List[Partition] = []
+    for partition in partitions:
+        missing = missing_proofs(specs, partition.path)
+        if missing:
+            unproven.append(partition)
+            command = proof_command(" ".join(missing), str(partition.jahr), partition.path)
+            print(f"{partition.label}: nicht nachgewiesen ({', '.join(missing)}), Nachweis mit: {command}")
+    return unproven
+
+
+def extract_partition(partition: Partition, output_root: Path, section_names: Sequence[str]) -> Dict[str, int]:
+    """Run all sections on one partition and write their tables; return row counts."""
+
+    specs = resolve_sections(section_names)
+    started = time.monotonic()
+    with pdfplumber.open(partition.path) as pdf:
+        page_count = len(pdf.pages)
+        results = run_sections(pdf, specs)
+    frames = {spec.name: spec.frame(results[spec.name]) for spec in specs if spec.frame is not None}
+    return write_partition(partition, output_root, frames, page_count, time.monotonic() - started)
+
+
+def write_partition(
+    partition: Partition,
+    output_root: Path,
+    frames: Mapping[str, pd.DataFrame],
+    page_count: int,
+    seconds: float,
+) -> Dict[str, int]:
+    """Write one CSV per section and the manifest of a partition; return row counts."""
+
+    output_dir = partition.output_dir(output_root)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    counts: Dict[str, int] = {}
+    for name, frame in frames.items():
+        frame.to_csv(output_dir / f"{name}.csv", index=False)
+        counts[name] = len(frame)
+    manifest = {
+        "gemeinde": partition.gemeinde,
+        "jahr": partition.jahr,
+        "dokument": partition.dokument,
+        "source": str(partition.path),
+        "source_mtime_ns": partition.path.stat().st_mtime_ns,
+        "pages": page_count,
+        "seconds": round(seconds, 3),
+        "sections": counts,
+    }
+    (output_dir / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2, ensure_ascii=False), encoding="utf-8")
+    return counts
+
+
+def run_partitions(
+    partitions: Sequence[Partition],
+    output_root: Path,
+    section_names: Sequence[str],
+    workers: int,
+    force: bool = False,
+) -> List[Partition]:
+    """Extract all partitions with at most ``2 * workers`` tasks in flight; return failures."""
+
+    todo = [p for p in partitions if force or not is_up_to_date(p, output_root, section_names)]
+    failures = unproven_partitions(todo, section_names)
+    todo = [p for p in todo if p not in failures]
+    print(f"{len(todo)} von {len(partitions)} Partitionen zu verarbeiten")
+    queue = iter(todo)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight: Dict[Future, Partition] = {}
+
+        def submit_next() -> None:
+            partition = next(queue, None)
+            if partition is not None:
+                in_flight[executor.submit(extract_partition, partition, output_root, section_names)] = partition
+
+        for _ in range(2 * workers):
+            submit_next()
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                partition = in_flight.pop(future)
+                try:
+                    counts = future.result()
+                    summary = ", ".join(f"{name}: {count}" for name, count in counts.items())
+                    print(f"{partition.label}: {summary}")
+                except Exception as exc:  # noqa: BLE001 - reported per partition
+                    failures.append(partition)
+                    print(f"{partition.label}: FEHLER {exc!r}")
+                submit_next()
+    return failures
+
+
+def iter_partition_outputs(output_root: Path, section: str) -> Iterable[tuple[str, str, Path]]:
+    for path in sorted(output_root.glob(f"*/*/{section}.csv")):
+        yield path.parent.parent.name, path.parent.name, path
+
+
+def aggregate_section(output_root: Path, section: str, output_path: Path) -> int:
+    """Concatenate one section of all partitions into a long CSV; return the row count."""
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    rows = 0
+    header: Optional[List[str]] = None
+    with output_path.open("w", newline="", encoding="utf-8") as handle:
+        writer = csv.writer(handle)
+        for gemeinde, jahr, path in iter_partition_outputs(output_root, section):
+            with path.open(newline="", encoding="utf-8") as source:
+                reader = csv.reader(source)
+                columns = next(reader, None)
+                if columns is None:
+                    continue
+                if header is None:
+                    header = columns
+                    writer.writerow(["Gemeinde", "Jahr", *header])
+                elif columns != header:
+                    raise ValueError(f"Abweichende Spalten in {path}: {columns}")
+                for row in reader:
+                    writer.writerow([gemeinde, jahr, *row])
+                    rows += 1
+    return rows
+
+
+def collect_partitions(args: argparse.Namespace) -> List[Partition]:
+    partitions: Set[Partition] = set(
+        discover_partitions(args.input_root, gemeinden=args.gemeinden, years=args.years)
+    )
+    if args.legacy_gemeinde:
+        partitions.update(
+            partition
+            for partition in legacy_partitions(args.legacy_gemeinde)
+            if not args.years or partition.jahr in args.years
+        )
+    return sorted(partitions)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    extract = subparsers.add_parser("extract", help="Partitionen parallel extrahieren")
+    extract.add_argument("--input-root", type=Path, default=Path("input/gemeinden"))
+    extract.add_argument("--output-root", type=Path, default=Path("output/gemeinden"))
+    extract.add_argument("--gemeinden", nargs="*", help="Einschränkung auf bestimmte Gemeinden")
+    extract.add_argument("--years", nargs="*", type=int, help="Einschränkung auf bestimmte Jahre")
+    extract.add_argument("--sections", nargs="*", help="Einschränkung auf bestimmte Abschnitte")
+    extract.add_argument("--workers", type=int, default=4)
+    extract.add_argument("--force", action="store_true", help="Auch aktuelle Partitionen neu extrahieren")
+    extract.add_argument(
+        "--legacy-gemeinde",
+        help="input/balance als Partitionen dieser Gemeinde einbeziehen (z.B. lensahn)",
+    )
+
+    aggregate = subparsers.add_parser("aggregate", help="Abschnitte über alle Partitionen zusammenführen")
+    aggregate.add_argument("--output-root", type=Path, default=Path("output/gemeinden"))
+    aggregate.add_argument("--sections", nargs="*", help="Einschränkung auf bestimmte Abschnitte")
+    aggregate.add_argument("--target", type=Path, default=Path("output/aggregiert"))
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    section_names = [spec.name for spec in resolve_sections(args.sections or None)]
+    if args.command == "extract":
+        partitions = collect_partitions(args)
+        failures = run_partitions(partitions, args.output_root, section_names, args.workers, args.force)
+        if failures:
+            raise SystemExit(f"{len(failures)} Partitionen fehlgeschlagen")
+    else:
+        for section in section_names:
+            output_path = args.target / f"{section}.csv"
+            rows = aggregate_section(args.output_root, section, output_path)
+            print(f"{output_path} erstellt (Zeilen: {rows})")
+
+
+if __name__ == "__main__":
+    main()
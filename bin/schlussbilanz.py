@@ -0,0 +1,217 @@
+"""Library access to one Schlussbilanz PDF, extracting each part on first use.
+
+The CLIs extract whole documents into CSV files under ``analysis/``. Notebooks
+and services that need a figure or two can use ``Schlussbilanz`` instead::
+
+    from schlussbilanz import Schlussbilanz
+
+    with Schlussbilanz("input/balance/Schlussbilanz 2024.pdf") as bilanz:
+        bilanz.ergebnisrechnung                    # like ergebnisrechnung_2024.csv
+        bilanz.teilergebnisse["sonstige Erträge"]  # like teilergebnis_2024_sonstige_erträge.csv
+        bilanz.teilergebnisrechnung(111000)        # the Teilergebnisrechnung of one Produkt
+        bilanz.ertragslage                         # like ertragslage_2024.csv
+        bilanz.gewerbesteuer_counts                # {Kategorie: Anzahl Betriebe}
+
+The path may also be an HTTP(S) URL of a document server; the PDF is then
+read by byte ranges (see ``range_source``), so only the parts the accessed
+properties need are transferred.
+
+Nothing is read when the object is created. Each property is extracted on
+first access and kept, and reads only the pages it needs:
+
+* the Ergebnisrechnung: pages from the start up to the end of its section,
+* the Teilergebnisse of an account: the text of every page, but tables only
+  on the pages naming the account; its Gesamtsumme comes from the
+  Ergebnisrechnung,
+* the Teilergebnisrechnung of a Produkt: the page headers a bisection over
+  the ascending Produkt numbers probes (see ``produkt_index``), and tables
+  only on the Produkt's own pages,
+* the Ertragslage and the Gewerbesteuer counts: the Lagebericht pages at the
+  end of the document.
+
+Page texts and parsed Teilergebnis tables are kept as well, so that a further
+account only parses the pages no earlier account needed. The default
+extraction settings are used throughout, so the values match the CLIs' output.
+"""
+
+from __future__ import annotations
+
+import re
+import sys
+from functools import cached_property
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Union
+
+import pandas as pd
+import pdfplumber
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+for _subdir in ("ertragslage", "lagebericht"):
+    _path = str(REPO_ROOT / "analysis" / _subdir)
+    if _path not in sys.path:
+        sys.path.append(_path)
+
+from extract_account_teilergebnisse import (  # noqa: E402
+    OUTPUT_FIELDNAMES,
+    AccountSummary,
+    ExtractionError,
+    TeilergebnisEntry,
+    check_consistency,
+    normalise_account_name,
+    output_record,
+    page_teilergebnis_tables,
+    parse_german_number,
+    table_entries,
+)
+from extract_ergebnisrechnung import COLUMN_NAMES, TABLE_SETTINGS, extract_table_rows, normalise_row  # noqa: E402
+from extract_ertragslage import build_ertragslage_frame, extract_section_words, parse_ertragslage_words  # noqa: E402
+from extract_gewerbesteuerstatistik import find_counts  # noqa: E402
+from page_matcher import (  # noqa: E402
+    MARKER_ERTRAGSARTEN,
+    MARKER_PRODUKT,
+    SECTION_ERGEBNISRECHNUNG,
+    SECTION_TEILERGEBNISRECHNUNG,
+    account_key,
+    build_page_matcher,
+)
+from produkt_index import ProduktPageIndex  # noqa: E402
+from range_source import is_remote, open_pdf, source_name  # noqa: E402
+
+
+class AccountTables(dict):
+    """Frames by account name; an account is extracted the first time it is looked up."""
+
+    def __init__(self, extract: Callable[[str], pd.DataFrame]):
+        super().__init__()
+        self._extract = extract
+
+    def __missing__(self, account: str) -> pd.DataFrame:
+        frame = self[account] = self._extract(account)
+        return frame
+
+
+class Schlussbilanz:
+    def __init__(self, path: Union[str, Path], year: Optional[str] = None):
+        self.source: Union[str, Path] = path if is_remote(path) else Path(path)
+        self.name = source_name(path)
+        match = re.search(r"(\d{4})", self.name)
+        self.year = year or (match.group(1) if match else "")
+        self._pdf: Optional[pdfplumber.PDF] = None
+        self._texts: Dict[int, str] = {}
+        self._teilergebnis_tables: Dict[int, list] = {}
+        self._produkt_index: Optional[ProduktPageIndex] = None
+        self._teilergebnisrechnungen: Dict[int, pd.DataFrame] = {}
+
+    def __enter__(self) -> "Schlussbilanz":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def __repr__(self) -> str:
+        return f"Schlussbilanz({str(self.source)!r})"
+
+    @property
+    def pdf(self) -> pdfplumber.PDF:
+        if self._pdf is None:
+            if isinstance(self.source, Path) and not self.source.exists():
+                raise FileNotFoundError(self.source)
+            self._pdf = open_pdf(self.source)
+        return self._pdf
+
+    def close(self) -> None:
+        """Close the PDF; extracted values stay available, further ones reopen it."""
+
+        if self._pdf is not None:
+            self._pdf.close()
+            self._pdf = None
+            self._produkt_index = None
+
+    def page_text(self, index: int) -> str:
+        if index not in self._texts:
+            self._texts[index] = self.pdf.pages[index].extract_text() or ""
+        return self._texts[index]
+
+    @cached_property
+    def ergebnisrechnung(self) -> pd.DataFrame:
+        matcher = build_page_matcher()
+        rows: List[List[str]] = []
+        in_section = False
+        for index in range(len(self.pdf.pages)):
+            hits = matcher.scan(self.page_text(index))
+            if SECTION_ERGEBNISRECHNUNG not in hits or MARKER_ERTRAGSARTEN not in hits:
+                if in_section:
+                    break
+                continue
+            in_section = True
+            for table in self.pdf.pages[index].extract_tables(TABLE_SETTINGS):
+                first_cell = table[0][0] if table and table[0] else ""
+                if "Ergebnisrechnung" in (first_cell or ""):
+                    rows.extend(extract_table_rows(table))
+        if not rows:
+            raise ExtractionError(f"Keine Ergebnisrechnung in {self.name} gefunden.")
+        return pd.DataFrame(rows, columns=COLUMN_NAMES)
+
+    def summary(self, account: str) -> AccountSummary:
+        """The Gesamtsumme of an Ertrags- or Aufwandsart, read from the Ergebnisrechnung."""
+
+        name = normalise_account_name(account)
+        for row in self.ergebnisrechnung.itertuples(index=False):
+            if normalise_account_name(row[2]) == name:
+                return AccountSummary(row[0], row[1], name, parse_german_number(row[5]))
+        raise ExtractionError(f"Konnte die Ertrags- oder Aufwandsart '{account}' nicht in der Ergebnisrechnung finden.")
+
+    def teilergebnis_entries(self, account: str) -> List[TeilergebnisEntry]:
+        targets = {normalise_account_name(account): account}
+        key = account_key(account)
+        matcher = build_page_matcher([account])
+        entries: List[TeilergebnisEntry] = []
+        for index in range(len(self.pdf.pages)):
+            hits = matcher.scan(self.page_text(index))
+            if SECTION_TEILERGEBNISRECHNUNG not in hits or MARKER_PRODUKT not in hits or key not in hits:
+                continue
+            if index not in self._teilergebnis_tables:
+                # The tables of a page do not depend on the account, so every account can reuse them.
+                self._teilergebnis_tables[index] = page_teilergebnis_tables(self.pdf.pages[index], hits, index)
+            entries.extend(entry for _account, entry in table_entries(self._teilergebnis_tables[index], hits, targets))
+        if not entries:
+            raise ExtractionError(f"Keine Teilergebnisse mit Betrag ungleich 0 für '{account}' gefunden.")
+        return entries
+
+    def teilergebnis_frame(self, account: str) -> pd.DataFrame:
+        summary = self.summary(account)
+        entries = self.teilergebnis_entries(account)
+        check_consistency(summary, entries)
+        records = [output_record(self.year, summary), *(output_record(self.year, summary, entry) for entry in entries)]
+        return pd.DataFrame(records, columns=OUTPUT_FIELDNAMES)
+
+    @cached_property
+    def teilergebnisse(self) -> AccountTables:
+        return AccountTables(self.teilergebnis_frame)
+
+    def teilergebnisrechnung(self, produkt: Union[str, int]) -> pd.DataFrame:
+        """The rows of one Produkt's Teilergebnisrechnung, found by bisecting the Produkt page headers."""
+
+        number = int(produkt)
+        if number not in self._teilergebnisrechnungen:
+            if self._produkt_index is None:
+                self._produkt_index = ProduktPageIndex(self.pdf)
+            rows = self._produkt_index.teilergebnis_rows(number)
+            if not rows:
+                raise ExtractionError(f"Keine Teilergebnisrechnung für Produkt {produkt} in {self.name} gefunden.")
+            self._teilergebnisrechnungen[number] = pd.DataFrame(
+                [normalise_row(row, len(COLUMN_NAMES)) for row in rows], columns=COLUMN_NAMES
+            )
+        return self._teilergebnisrechnungen[number]
+
+    @cached_property
+    def ertragslage(self) -> pd.DataFrame:
+        columns, rows = parse_ertragslage_words(extract_section_words(self.pdf))
+        return build_ertragslage_frame(columns, rows)
+
+    @cached_property
+    def gewerbesteuer_counts(self) -> Dict[str, int]:
+        counts = find_counts(self.pdf)
+        if counts is None:
+            raise ExtractionError(f"Gewerbesteuer-Tabelle in {self.name} nicht gefunden.")
+        return counts
@@ -0,0 +1,481 @@
+"""Declarative section extractors that share a single pass over a Schlussbilanz PDF.
+
+A section is declared by the markers that must occur in a page's text, a
+strategy describing how its content is read (ruled tables, a word stream or
+the text lines)
+and the parser that turns that content into rows. ``run_sections`` visits every
+page once, extracts text, tables and words at most once per page and hands the
+page to each interested section. Sections that have a reference extractor are
+only extracted from documents for which ``differential.py`` proved the engine
+identical to it.
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+
+import pandas as pd
+import pdfplumber
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+for _subdir in ("ertragslage", "lagebericht"):
+    _path = str(REPO_ROOT / "analysis" / _subdir)
+    if _path not in sys.path:
+        sys.path.append(_path)
+
+from extract_account_teilergebnisse import (  # noqa: E402
+    PRODUKT_PATTERN,
+    TABLE_SETTINGS,
+    clean_cell,
+    extract_data_rows,
+)
+from extract_ergebnisrechnung import COLUMN_NAMES, extract_table_rows, normalise_row  # noqa: E402
+from extract_ertragslage import build_ertragslage_frame, parse_ertragslage_words  # noqa: E402
+from extract_lagebericht_statistiken import (  # noqa: E402
+    StatistikRow,
+    iter_statistik_rows,
+    without_page_furniture,
+)
+from extract_lagebericht_statistiken import write_csv as write_statistik_csv  # noqa: E402
+from fast_path_proofs import has_proof, require_proof  # noqa: E402
+from page_matcher import PageMatcher  # noqa: E402
+from word_store import WordStore  # noqa: E402
+
+Table = List[List[Optional[str]]]
+
+
+class PageVisit:
+    """A page as seen by the engine; text, tables and words are computed once."""
+
+    def __init__(self, index: int, page: pdfplumber.page.Page):
+        self.index = index
+        self.page = page
+        self._text: Optional[str] = None
+        self._tables: Dict[Tuple[Tuple[str, Any], ...], List[Table]] = {}
+        self._words: Dict[Tuple[Tuple[str, Any], ...], List[dict]] = {}
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = self.page.extract_text() or ""
+        return self._text
+
+    def tables(self, settings: Mapping[str, Any]) -> List[Table]:
+        key = tuple(sorted(settings.items()))
+        if key not in self._tables:
+            self._tables[key] = self.page.extract_tables(dict(settings))
+        return self._tables[key]
+
+    def words(self, **options: Any) -> List[dict]:
+        key = tuple(sorted(options.items()))
+        if key not in self._words:
+            self._words[key] = self.page.extract_words(**options) or []
+        return self._words[key]
+
+
+@dataclass
+class TableState:
+    rows: List[Any] = field(default_factory=list)
+    done: bool = False
+
+
+@dataclass(frozen=True)
+class TableStrategy:
+    """Ruled tables whose first cell contains ``header_marker``."""
+
+    header_marker: str
+    parse_table: Callable[[Table], Iterable[Any]]
+    settings: Mapping[str, Any] = field(default_factory=lambda: dict(TABLE_SETTINGS))
+
+    def start(self) -> TableState:
+        return TableState()
+
+    def feed(self, state: TableState, visit: PageVisit, matched: bool) -> bool:
+        if not matched:
+            return False
+        for table in visit.tables(self.settings):
+            if not table or not table[0]:
+                continue
+            if self.header_marker not in clean_cell(table[0][0]):
+                continue
+            state.rows.extend(self.parse_table(table))
+        return True
+
+    def finish(self, state: TableState) -> List[Any]:
+        return state.rows
+
+
+@dataclass
+class WordStreamState:
+    started: bool = False
+    done: bool = False
+    stores: List[WordStore] = field(default_factory=list)
+
+
+@dataclass(frozen=True)
+class WordStreamStrategy:
+    """Words from the page where the section starts up to the next section label.
+
+    The section starts on the first matching page that has a token beginning
+    with ``start_prefix`` and a token equal to ``start_token`` (either may be
+    omitted). It ends before the first token beginning with ``stop_prefix``.
+    """
+
+    parse_words: Callable[[WordStore], Any]
+    start_prefix: Optional[str] = None
+    start_token: Optional[str] = None
+    stop_prefix: Optional[str] = None
+    word_options: Mapping[str, Any] = field(default_factory=dict)
+
+    def start(self) -> WordStreamState:
+        return WordStreamState()
+
+    def feed(self, state: WordStreamState, visit: PageVisit, matched: bool) -> bool:
+        if not state.started:
+            if not matched:
+                return False
+            words = visit.words(**self.word_options)
+            tokens = {word["text"].strip() for word in words}
+            if self.start_prefix and not any(token.startswith(self.start_prefix) for token in tokens):
+                return False
+            if self.start_token and self.start_token not in tokens:
+                return False
+            state.started = True
+        words = visit.words(**self.word_options)
+        cutoff = None
+        if self.stop_prefix:
+            for word in words:
+                if word["text"].strip().startswith(self.stop_prefix):
+                    cutoff = word["top"]
+                    break
+        state.stores.append(WordStore.from_words(words, visit.index, max_top=cutoff))
+        if cutoff is not None:
+            state.done = True
+        return True
+
+    def finish(self, state: WordStreamState) -> Any:
+        if not state.started:
+            return None
+        return self.parse_words(WordStore.concat(state.stores))
+
+
+@dataclass
+class TextLineState:
+    lines: List[str] = field(default_factory=list)
+    done: bool = False
+
+
+@dataclass(frozen=True)
+class TextLineStrategy:
+    """The ``extract_text()`` lines of every matching page, in page order."""
+
+    parse_lines: Callable[[List[str]], Any]
+
+    def start(self) -> TextLineState:
+        return TextLineState()
+
+    def feed(self, state: TextLineState, visit: PageVisit, matched: bool) -> bool:
+        if not matched:
+            return False
+        state.lines.extend(visit.text.split("\n"))
+        return True
+
+    def finish(self, state: TextLineState) -> Any:
+        return self.parse_lines(state.lines)
+
+
+Strategy = Union[TableStrategy, WordStreamStrategy, TextLineStrategy]
+Writer = Callable[[Mapping[str, Any], Path], None]
+
+
+@dataclass(frozen=True)
+class SectionSpec:
+    """Declaration of one section of the document.
+
+    ``markers`` must all occur in a page's text for the section to be
+    interested in it. ``tail_pages`` restricts the section to the last pages of
+    the document and ``contiguous`` stops it at the first page without markers
+    after it has started. ``write`` stores the results of several years and
+    ``frame`` turns the result of one document into a table.
+
+    ``fast_path`` names the proof from ``differential.py`` that the engine
+    reproduces the section's reference extractor for a document; the engine
+    only extracts the section from proven documents. Sections without a
+    reference extractor have none.
+    """
+
+    name: str
+    markers: Tuple[str, ...]
+    strategy: Strategy
+    tail_pages: Optional[int] = None
+    contiguous: bool = False
+    write: Optional[Writer] = None
+    frame: Optional[Callable[[Any], pd.DataFrame]] = None
+    fast_path: Optional[str] = None
+
+
+SECTIONS: Dict[str, SectionSpec] = {}
+
+
+def register_section(spec: SectionSpec) -> SectionSpec:
+    if spec.name in SECTIONS:
+        raise ValueError(f"Abschnitt '{spec.name}' ist bereits registriert")
+    SECTIONS[spec.name] = spec
+    return spec
+
+
+class SectionRun:
+    """State of one section while the engine walks the document."""
+
+    def __init__(self, spec: SectionSpec):
+        self.spec = spec
+        self.state = spec.strategy.start()
+        self.active = False
+        self.done = False
+
+    def wants(self, index: int, total_pages: int) -> bool:
+        if self.done:
+            return False
+        if self.spec.tail_pages is not None and index < total_pages - self.spec.tail_pages:
+            return False
+        return True
+
+    def visit(self, visit: PageVisit, hits: frozenset) -> None:
+        matched = all(marker in hits for marker in self.spec.markers)
+        contributed = self.spec.strategy.feed(self.state, visit, matched)
+        if self.spec.contiguous and self.active and not contributed:
+            self.done = True
+        self.active = self.active or contributed
+        if self.state.done:
+            self.done = True
+
+    def result(self) -> Any:
+        return self.spec.strategy.finish(self.state)
+
+
+def is_page_local(spec: SectionSpec) -> bool:
+    """Whether the section can be extracted from disjoint page ranges and concatenated in page order."""
+
+    return isinstance(spec.strategy, TableStrategy) and not spec.contiguous
+
+
+def missing_proofs(specs: Iterable[SectionSpec], pdf_path: Path) -> List[str]:
+    """The fast paths of ``specs`` that are not proven for ``pdf_path``."""
+
+    return [spec.fast_path for spec in specs if spec.fast_path is not None and not has_proof(spec.fast_path, pdf_path)]
+
+
+def resolve_sections(names: Optional[Iterable[str]] = None) -> List[SectionSpec]:
+    if names is None:
+        return list(SECTIONS.values())
+    unknown = [name for name in names if name not in SECTIONS]
+    if unknown:
+        raise ValueError(f"Unbekannte Abschnitte: {', '.join(unknown)}")
+    return [SECTIONS[name] for name in names]
+
+
+def run_sections(
+    pdf: pdfplumber.PDF, specs: Optional[Sequence[SectionSpec]] = None, pages: Optional[range] = None
+) -> Dict[str, Any]:
+    """Extract all given sections (default: all registered) in one page pass.
+
+    ``pages`` limits the pass to a range of page indices; ``tail_pages`` still
+    refers to the whole document.
+    """
+
+    specs = list(specs) if specs is not None else resolve_sections()
+    matcher = PageMatcher((marker, marker) for spec in specs for marker in spec.markers)
+    runs = [SectionRun(spec) for spec in specs]
+    total_pages = len(pdf.pages)
+    for index in pages if pages is not None else range(total_pages):
+        page = pdf.pages[index]
+        interested = [run for run in runs if run.wants(index, total_pages)]
+        if not interested:
+            if all(run.done for run in runs):
+                break
+            continue
+        visit = PageVisit(index, page)
+        hits = matcher.scan(visit.text)
+        for run in interested:
+            run.visit(visit, hits)
+        page.close()
+    return {run.spec.name: run.result() for run in runs}
+
+
+def parse_teilergebnis_table(table: Table) -> Iterable[Tuple[str, str, List[str]]]:
+    match = PRODUKT_PATTERN.search(clean_cell(table[0][0]))
+    if not match:
+        return []
+    produkt = match.group("num").strip()
+    produkt_name = match.group("name").strip()
+    return [(produkt, produkt_name, row) for row in extract_data_rows(table)]
+
+
+def parse_ertragslage_store(words: WordStore) -> pd.DataFrame:
+    return build_ertragslage_frame(*parse_ertragslage_words(words))
+
+
+def parse_statistik_lines(lines: List[str]) -> List[StatistikRow]:
+    return iter_statistik_rows(without_page_furniture(lines))
+
+
+def ergebnisrechnung_frame(rows: List[List[str]]) -> pd.DataFrame:
+    return pd.DataFrame(rows, columns=COLUMN_NAMES)
+
+
+def teilergebnisrechnung_frame(rows: List[Tuple[str, str, List[str]]]) -> pd.DataFrame:
+    return pd.DataFrame(
+        [[produkt, produkt_name, *normalise_row(row, len(COLUMN_NAMES))] for produkt, produkt_name, row in rows],
+        columns=["Produkt", "Produktname", *COLUMN_NAMES],
+    )
+
+
+def ertragslage_frame(df: Optional[pd.DataFrame]) -> pd.DataFrame:
+    # The year columns differ per document, so partitions store the table in long form.
+    if df is None:
+        return pd.DataFrame(columns=["Kategorie", "Spalte", "Wert"])
+    return df.melt(id_vars="Kategorie", var_name="Spalte", value_name="Wert")
+
+
+def statistiken_frame(rows: Optional[List[StatistikRow]]) -> pd.DataFrame:
+    return pd.DataFrame(
+        [[row.tabelle, row.kategorie, row.wert] for row in rows or []],
+        columns=["Tabelle", "Kategorie", "Wert"],
+    )
+
+
+def write_ergebnisrechnung(results: Mapping[str, Any], output_root: Path) -> None:
+    output_dir = output_root / "analysis" / "ergebnisrechnung"
+    output_dir.mkdir(parents=True, exist_ok=True)
+    for year, rows in results.items():
+        if not rows:
+            print(f"Keine Ergebnisrechnung für {year} gefunden.")
+            continue
+        output_path = output_dir / f"ergebnisrechnung_{year}.csv"
+        pd.DataFrame(rows, columns=COLUMN_NAMES).to_csv(output_path, index=False)
+        print(f"{output_path} erstellt (Zeilen: {len(rows)})")
+
+
+def write_teilergebnisrechnung(results: Mapping[str, Any], output_root: Path) -> None:
+    output_dir = output_root / "analysis" / "ergebnisrechnung"
+    output_dir.mkdir(parents=True, exist_ok=True)
+    for year, rows in results.items():
+        if not rows:
+            print(f"Keine Teilergebnisrechnung für {year} gefunden.")
+            continue
+        output_path = output_dir / f"teilergebnisrechnung_{year}.csv"
+        teilergebnisrechnung_frame(rows).to_csv(output_path, index=False)
+        print(f"{output_path} erstellt (Zeilen: {len(rows)})")
+
+
+def write_ertragslage(results: Mapping[str, Any], output_root: Path) -> None:
+    output_dir = output_root / "analysis" / "ertragslage"
+    output_dir.mkdir(parents=True, exist_ok=True)
+    for year, df in results.items():
+        if df is None:
+            print(f"Keine Ertragslage für {year} gefunden.")
+            continue
+        output_path = output_dir / f"ertragslage_{year}.csv"
+        df.to_csv(output_path, index=False)
+        print(f"Wrote {output_path}")
+
+
+def write_statistiken(results: Mapping[str, Any], output_root: Path) -> None:
+    output_path = output_root / "analysis" / "lagebericht" / "lagebericht_statistiken.csv"
+    write_statistik_csv({int(year): rows or [] for year, rows in results.items()}, output_path)
+    print(f"Wrote {output_path}")
+
+
+register_section(
+    SectionSpec(
+        name="ergebnisrechnung",
+        markers=("Ergebnisrechnung", "Ertrags-"),
+        strategy=TableStrategy(header_marker="Ergebnisrechnung", parse_table=extract_table_rows),
+        contiguous=True,
+        write=write_ergebnisrechnung,
+        frame=ergebnisrechnung_frame,
+        fast_path="abschnitte",
+    )
+)
+register_section(
+    SectionSpec(
+        name="teilergebnisrechnung",
+        markers=("Teilergebnisrechnung", "Produkt"),
+        strategy=TableStrategy(header_marker="Teilergebnisrechnung", parse_table=parse_teilergebnis_table),
+        write=write_teilergebnisrechnung,
+        frame=teilergebnisrechnung_frame,
+    )
+)
+register_section(
+    SectionSpec(
+        name="ertragslage",
+        markers=("Ertragslage",),
+        strategy=WordStreamStrategy(
+            parse_words=parse_ertragslage_store,
+            start_prefix="6.4",
+            start_token="Ertragslage",
+            stop_prefix="6.5",
+            word_options={"use_text_flow": True},
+        ),
+        tail_pages=60,
+        write=write_ertragslage,
+        frame=ertragslage_frame,
+        fast_path="abschnitte-ertragslage",
+    )
+)
+register_section(
+    SectionSpec(
+        name="lagebericht_statistiken",
+        markers=(),
+        strategy=TextLineStrategy(parse_lines=parse_statistik_lines),
+        tail_pages=60,
+        write=write_statistiken,
+        frame=statistiken_frame,
+        fast_path="abschnitte-statistiken",
+    )
+)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Extrahiert alle registrierten Abschnitte der Schlussbilanzen in einem Durchlauf je PDF."
+    )
+    parser.add_argument("--years", nargs="*", help="Einschränkung auf bestimmte Jahre")
+    parser.add_argument(
+        "--sections",
+        nargs="*",
+        choices=sorted(SECTIONS),
+        help="Einschränkung auf bestimmte Abschnitte",
+    )
+    parser.add_argument("--input-dir", type=Path, default=Path("input/balance"))
+    parser.add_argument("--output-root", type=Path, default=Path("."))
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    specs = resolve_sections(args.sections)
+    results: Dict[str, Dict[str, Any]] = {spec.name: {} for spec in specs}
+    for pdf_path in sorted(args.input_dir.glob("Schlussbilanz *.pdf")):
+        match = re.search(r"(\d{4})", pdf_path.name)
+        if not match or (args.years and match.group(1) not in args.years):
+            continue
+        for spec in specs:
+            if spec.fast_path is not None:
+                require_proof(spec.fast_path, match.group(1), pdf_path)
+        with pdfplumber.open(pdf_path) as pdf:
+            extracted = run_sections(pdf, specs)
+        for name, value in extracted.items():
+            results[name][match.group(1)] = value
+    for spec in specs:
+        if spec.write is not None:
+            spec.write(results[spec.name], args.output_root)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""Pick the cheapest extraction settings that still reconcile, once per document.
+
+The extractors hard-code settings that work for every year's layout
+(line-based table detection, ``use_text_flow`` word extraction). Individual
+PDFs often extract correctly with cheaper ones. A document family (the
+Ergebnis-/Teilergebnisrechnung tables, the Lagebericht Ertragslage, ...)
+defines a list of candidates, the first one being the hard-coded default,
+and an evaluation that runs a candidate on a sample of pages and returns:
+
+* the structure it found (which tables, rows and labels), and
+* the reconciliation invariants it violated.
+
+A candidate passes if it finds the same structure as the default and
+violates no invariant that the default satisfies. Invariants the default
+itself violates (say, a table split across pages) are not held against
+the candidates. The fastest passing candidate (the default unless another
+one is clearly faster) is stored per document, keyed by a content hash, in
+``analysis/extraction_settings.json``, so that later runs pick it up
+automatically and a republished PDF falls back to the default until it is
+tuned again. The sample is no proof for the whole document: the extractors
+only use a stored choice once ``differential.py`` has shown that it yields
+the same output as the default (see ``fast_path_proofs``).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, List, Mapping, Optional, Sequence, Tuple
+
+DEFAULT_STORE = Path("analysis/extraction_settings.json")
+
+# A candidate has to beat the default by this fraction to replace it, so that timing noise never does.
+MIN_GAIN = 0.05
+
+
+@dataclass(frozen=True)
+class Candidate:
+    name: str
+    settings: Mapping[str, Any]
+
+
+@dataclass
+class Evaluation:
+    structure: Hashable
+    violations: List[str] = field(default_factory=list)
+
+
+@dataclass
+class TuningResult:
+    candidate: Candidate
+    seconds: float
+    passed: bool
+    reason: str = ""
+
+
+Evaluate = Callable[[Candidate], Evaluation]
+
+
+def document_id(pdf_path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(pdf_path, "rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:32]
+
+
+class SettingsStore:
+    """Persisted choices as ``{family: {document_id: {"pdf", "kandidat", "sekunden"}}}``."""
+
+    def __init__(self, path: Path = DEFAULT_STORE):
+        self.path = path
+        self.data: Dict[str, Dict[str, Dict[str, Any]]] = (
+            json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+        )
+
+    def choice(self, family: str, pdf_path: Path) -> Optional[str]:
+        if not self.data.get(family):
+            return None
+        entry = self.data[family].get(document_id(pdf_path))
+        return entry["kandidat"] if entry else None
+
+    def record(self, family: str, pdf_path: Path, chosen: Candidate, results: Sequence[TuningResult]) -> None:
+        self.data.setdefault(family, {})[document_id(pdf_path)] = {
+            "pdf": pdf_path.name,
+            "kandidat": chosen.name,
+            "sekunden": {result.candidate.name: round(result.seconds, 4) for result in results if result.passed},
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        text = json.dumps(self.data, ensure_ascii=False, indent=2, sort_keys=True) + "\n"
+        self.path.write_text(text, encoding="utf-8")
+
+
+def choose_settings(
+    family: str, pdf_path: Path, candidates: Sequence[Candidate], store: Optional[SettingsStore] = None
+) -> Candidate:
+    """The stored choice for ``pdf_path``, or the default (first) candidate."""
+
+    store = store or SettingsStore()
+    name = store.choice(family, pdf_path)
+    return next((candidate for candidate in candidates if candidate.name == name), candidates[0])
+
+
+def timed(evaluate: Evaluate, candidate: Candidate, repeat: int) -> Tuple[Evaluation, float]:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        evaluation = evaluate(candidate)
+        best = min(best, time.perf_counter() - started)
+    return evaluation, best
+
+
+def tune(
+    candidates: Sequence[Candidate], evaluate: Evaluate, repeat: int = 3
+) -> Tuple[Candidate, List[TuningResult]]:
+    """Time every candidate on the sample and return the fastest one that passes.
+
+    ``evaluate`` should work on pages whose layout has already been parsed, so
+    that only the cost that differs between candidates is measured. The best
+    of ``repeat`` runs counts.
+    """
+
+    default = candidates[0]
+    reference, default_seconds = timed(evaluate, default, repeat)
+    results = [TuningResult(default, default_seconds, True)]
+    for candidate in candidates[1:]:
+        try:
+            evaluation, seconds = timed(evaluate, candidate, repeat)
+        except Exception as error:  # a candidate the extractor cannot handle simply fails
+            results.append(TuningResult(candidate, float("inf"), False, f"{type(error).__name__}: {error}"))
+            continue
+        new_violations = sorted(set(evaluation.violations) - set(reference.violations))
+        if evaluation.structure != reference.structure:
+            results.append(TuningResult(candidate, seconds, False, "andere Tabellen/Zeilen als der Standard"))
+        elif new_violations:
+            results.append(TuningResult(candidate, seconds, False, new_violations[0]))
+        else:
+            results.append(TuningResult(candidate, seconds, True))
+    fastest = min((result for result in results if result.passed), key=lambda result: result.seconds)
+    if fastest.seconds > default_seconds * (1 - MIN_GAIN):
+        return default, results
+    return fastest.candidate, results
+
+
+def sample_evenly(items: Sequence[Any], size: int) -> List[Any]:
+    """Up to ``size`` items spread over the whole sequence, first and last included."""
+
+    if len(items) <= size:
+        return list(items)
+    if size <= 1:
+        return [items[0]]
+    step = (len(items) - 1) / (size - 1)
+    return [items[round(position * step)] for position in range(size)]
+
+
+def report(results: Sequence[TuningResult], chosen: Candidate, file: Any = None) -> None:
+    for result in results:
+        status = "ok" if result.passed else f"verworfen ({result.reason})"
+        seconds = f"{result.seconds:7.3f}s" if result.seconds != float("inf") else "      - "
+        marker = "*" if result.candidate == chosen else " "
+        print(f"{marker} {result.candidate.name:<24} {seconds}  {status}", file=file)
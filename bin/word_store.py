@@ -0,0 +1,134 @@
+"""Compact, array-backed storage for pdfplumber words."""
+
+from __future__ import annotations
+
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+WORD_DTYPE = np.dtype(
+    [
+        ("page", np.int32),
+        ("start", np.int32),
+        ("end", np.int32),
+        ("x0", np.float64),
+        ("x1", np.float64),
+        ("top", np.float64),
+        ("bottom", np.float64),
+    ]
+)
+
+
+class WordStore:
+    """Words of one or more pages held in a NumPy structured array.
+
+    The word texts are concatenated into a single string and each record only
+    keeps the ``start``/``end`` offsets into it, so a word costs a few dozen
+    bytes instead of a full pdfplumber dict.
+    """
+
+    __slots__ = ("text", "records")
+
+    def __init__(self, text: str, records: np.ndarray):
+        self.text = text
+        self.records = records
+
+    @classmethod
+    def empty(cls) -> "WordStore":
+        return cls("", np.zeros(0, dtype=WORD_DTYPE))
+
+    @classmethod
+    def from_words(
+        cls, words: Sequence[dict], page_index: int = 0, max_top: Optional[float] = None
+    ) -> "WordStore":
+        """Build a store from pdfplumber words, dropping words at or below ``max_top``."""
+
+        if max_top is not None:
+            words = [word for word in words if word["top"] < max_top]
+        texts = [word["text"].strip() for word in words]
+        records = np.zeros(len(words), dtype=WORD_DTYPE)
+        if words:
+            lengths = np.fromiter((len(text) for text in texts), dtype=np.int32, count=len(texts))
+            ends = np.cumsum(lengths, dtype=np.int32)
+            records["page"] = page_index
+            records["start"] = ends - lengths
+            records["end"] = ends
+            for field in ("x0", "x1", "top", "bottom"):
+                records[field] = [word[field] for word in words]
+        return cls("".join(texts), records)
+
+    @classmethod
+    def concat(cls, stores: Iterable["WordStore"]) -> "WordStore":
+        stores = [store for store in stores if len(store)]
+        if not stores:
+            return cls.empty()
+        parts: List[np.ndarray] = []
+        offset = 0
+        for store in stores:
+            records = store.records.copy()
+            records["start"] += offset
+            records["end"] += offset
+            offset += len(store.text)
+            parts.append(records)
+        return cls("".join(store.text for store in stores), np.concatenate(parts))
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def word(self, index: int) -> str:
+        record = self.records[index]
+        return self.text[record["start"] : record["end"]]
+
+    def words(self, indices: Optional[Iterable[int]] = None) -> List[str]:
+        if indices is None:
+            indices = range(len(self.records))
+        starts = self.records["start"]
+        ends = self.records["end"]
+        return [self.text[starts[i] : ends[i]] for i in indices]
+
+    def bounds(self, index: int) -> Tuple[int, Tuple[float, float, float, float]]:
+        """Return the page and ``(x0, top, x1, bottom)`` of a word."""
+
+        record = self.records[index]
+        return int(record["page"]), (
+            float(record["x0"]),
+            float(record["top"]),
+            float(record["x1"]),
+            float(record["bottom"]),
+        )
+
+    def group_lines(self, y_tolerance: float = 1.5) -> List[np.ndarray]:
+        """Group words into lines and return the word indices of each line.
+
+        Words are ordered by page, ``top`` and ``x0``; a word joins the current
+        line if it is on the same page and within ``y_tolerance`` of the line's
+        first word. The indices of each line are ordered by ``x0``.
+        """
+
+        if not len(self.records):
+            return []
+        records = self.records
+        order = np.lexsort((records["x0"], records["top"], records["page"]))
+        pages = records["page"][order].tolist()
+        tops = records["top"][order].tolist()
+        boundaries: List[int] = [0]
+        line_page = pages[0]
+        line_top = tops[0]
+        for position in range(1, len(order)):
+            if pages[position] == line_page and abs(tops[position] - line_top) <= y_tolerance:
+                continue
+            boundaries.append(position)
+            line_page = pages[position]
+            line_top = tops[position]
+        boundaries.append(len(order))
+        x0 = records["x0"]
+        lines: List[np.ndarray] = []
+        for begin, end in zip(boundaries, boundaries[1:]):
+            indices = order[begin:end]
+            lines.append(indices[np.argsort(x0[indices], kind="stable")])
+        return lines
+
+    def line_tokens(self, y_tolerance: float = 1.5) -> List[List[str]]:
+        """Return the word texts of every line, ordered left to right."""
+
+        return [self.words(indices) for indices in self.group_lines(y_tolerance)]
@@ -0,0 +1,423 @@
+"""Distribute partition extraction across machines through a shared-filesystem queue.
+
+A coordinator splits every partition into tasks of one section and a page
+range and writes them to ``<queue>/pending``. Workers on any machine that
+mounts the queue directory (and sees the PDFs under the same paths) claim a
+task by renaming it into ``claimed``, run the section engine on its pages and
+write the table to ``done``. While a task runs, its worker renews the claim
+every ``HEARTBEAT_SECONDS``, so only claims of crashed or stalled workers
+expire. ``collect`` waits for all tasks, requeues expired claims and merges
+the results in (partition, section, page) order, with sections in the order
+they were requested and the partition's source path as given, so the output
+is identical to a single-machine ``scheduler.py extract`` run and does not
+depend on which worker finished first. A task that one worker finished counts
+as done even if a duplicate run of it failed.
+
+Sections that read across page boundaries (word streams, contiguous tables)
+are not split and become one task over the whole document. Page-local sections
+are only split for documents for which ``differential.py`` proved the split
+(``seitenbereiche``), and partitions lacking a proof for one of the engine's
+sections are not submitted at all.
+
+    python bin/work_queue.py submit --queue /mnt/queue --input-root input/gemeinden
+    python bin/work_queue.py worker --queue /mnt/queue          # on every node
+    python bin/work_queue.py collect --queue /mnt/queue --output-root output/gemeinden
+
+``local`` runs all three steps with worker processes on this host.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import pandas as pd
+import pdfplumber
+
+from fast_path_proofs import has_proof, proof_command
+from partitions import Partition
+from scheduler import collect_partitions, is_up_to_date, unproven_partitions, write_partition
+from sections import is_page_local, resolve_sections, run_sections
+
+PENDING = "pending"
+CLAIMED = "claimed"
+DONE = "done"
+FAILED = "failed"
+TASKS_NAME = "tasks.json"
+SPLIT_FAST_PATH = "seitenbereiche"
+
+DEFAULT_PAGES_PER_TASK = 25
+DEFAULT_LEASE_SECONDS = 600
+HEARTBEAT_SECONDS = 30.0
+POLL_SECONDS = 0.5
+
+
+@dataclass(frozen=True)
+class Task:
+    """One section of one partition over the pages ``first_page`` to ``last_page`` (exclusive).
+
+    ``path`` is the resolved path the workers open, ``source`` the path as the
+    partition was discovered, and ``section_order`` the section's position in
+    the requested sections.
+    """
+
+    gemeinde: str
+    jahr: int
+    dokument: str
+    path: str
+    source: str
+    section: str
+    section_order: int
+    first_page: int
+    last_page: int
+
+    @property
+    def task_id(self) -> str:
+        return f"{self.gemeinde}-{self.jahr}-{self.dokument}-{self.section}-{self.first_page:05d}"
+
+    @property
+    def partition(self) -> Partition:
+        return Partition(self.gemeinde, self.jahr, self.dokument, Path(self.source))
+
+    @property
+    def order(self) -> tuple:
+        return (self.partition, self.section_order, self.first_page)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Task":
+        return cls(**data)
+
+
+class WorkQueue:
+    """Task files in ``pending``/``claimed``/``done``/``failed`` below one shared directory.
+
+    Every state change is a rename or an atomic replace of a whole file, so
+    several workers on different hosts can share the directory without locks.
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+
+    def folder(self, state: str) -> Path:
+        return self.root / state
+
+    def file(self, state: str, task_id: str) -> Path:
+        return self.folder(state) / f"{task_id}.json"
+
+    def write_json(self, path: Path, payload: Any) -> None:
+        temporary = path.with_name(f".{path.name}.{socket.gethostname()}-{os.getpid()}.tmp")
+        temporary.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+        os.replace(temporary, path)
+
+    def submit(self, tasks: Sequence[Task]) -> None:
+        """Start a new run with ``tasks``; results of an earlier run are discarded."""
+
+        for state in (PENDING, CLAIMED, DONE, FAILED):
+            self.folder(state).mkdir(parents=True, exist_ok=True)
+            for path in self.folder(state).glob("*.json"):
+                path.unlink()
+        self.write_json(self.root / TASKS_NAME, [asdict(task) for task in tasks])
+        for task in tasks:
+            self.write_json(self.file(PENDING, task.task_id), asdict(task))
+
+    def tasks(self) -> List[Task]:
+        path = self.root / TASKS_NAME
+        if not path.exists():
+            return []
+        return [Task.from_dict(data) for data in json.loads(path.read_text(encoding="utf-8"))]
+
+    def task_ids(self, state: str) -> List[str]:
+        return sorted(path.stem for path in self.folder(state).glob("*.json"))
+
+    def claim(self) -> Optional[Task]:
+        """Move the first pending task to ``claimed``; ``None`` if another worker was faster for all."""
+
+        for task_id in self.task_ids(PENDING):
+            claimed = self.file(CLAIMED, task_id)
+            try:
+                os.rename(self.file(PENDING, task_id), claimed)
+            except FileNotFoundError:
+                continue
+            os.utime(claimed)  # the lease starts now
+            return Task.from_dict(json.loads(claimed.read_text(encoding="utf-8")))
+        return None
+
+    def renew(self, task: Task) -> None:
+        """Restart the lease of a claimed task."""
+
+        try:
+            os.utime(self.file(CLAIMED, task.task_id))
+        except FileNotFoundError:
+            pass  # already completed or requeued
+
+    def complete(self, task: Task, state: str, payload: Dict[str, Any]) -> None:
+        self.write_json(self.file(state, task.task_id), {"task": asdict(task), **payload})
+        try:
+            self.file(CLAIMED, task.task_id).unlink()
+        except FileNotFoundError:
+            pass  # the lease expired and the task was requeued; the first result wins
+
+    def requeue_expired(self, lease_seconds: float) -> List[str]:
+        """Return claims older than the lease to ``pending`` (e.g. after a worker crashed)."""
+
+        requeued = []
+        now = time.time()
+        for task_id in self.task_ids(CLAIMED):
+            claimed = self.file(CLAIMED, task_id)
+            try:
+                if now - claimed.stat().st_mtime < lease_seconds or self.file(DONE, task_id).exists():
+                    continue
+                os.rename(claimed, self.file(PENDING, task_id))
+            except FileNotFoundError:
+                continue
+            requeued.append(task_id)
+        return requeued
+
+    def finished(self) -> bool:
+        return not self.task_ids(PENDING) and not self.task_ids(CLAIMED)
+
+    def result(self, state: str, task_id: str) -> Dict[str, Any]:
+        return json.loads(self.file(state, task_id).read_text(encoding="utf-8"))
+
+
+def page_ranges(page_count: int, pages_per_task: int) -> Iterator[range]:
+    for first in range(0, page_count, pages_per_task):
+        yield range(first, min(first + pages_per_task, page_count))
+
+
+def plan_tasks(partitions: Sequence[Partition], section_names: Sequence[str], pages_per_task: int) -> List[Task]:
+    """Split every partition into page-range tasks for page-local sections and whole-document tasks otherwise."""
+
+    specs = resolve_sections(section_names)
+    tasks: List[Task] = []
+    for partition in partitions:
+        with pdfplumber.open(partition.path) as pdf:
+            page_count = len(pdf.pages)
+        split = page_count > pages_per_task and any(is_page_local(spec) for spec in specs)
+        if split and not has_proof(SPLIT_FAST_PATH, partition.path):
+            split = False
+            command = proof_command(SPLIT_FAST_PATH, str(partition.jahr), partition.path)
+            print(f"{partition.label}: Seitenaufteilung nicht nachgewiesen, Nachweis mit: {command}")
+        for section_order, spec in enumerate(specs):
+            if spec.frame is None:
+                continue
+            ranges = page_ranges(page_count, pages_per_task) if split and is_page_local(spec) else [range(page_count)]
+            for pages in ranges:
+                tasks.append(
+                    Task(
+                        partition.gemeinde,
+                        partition.jahr,
+                        partition.dokument,
+                        str(partition.path.resolve()),
+                        str(partition.path),
+                        spec.name,
+                        section_order,
+                        pages.start,
+                        pages.stop,
+                    )
+                )
+    return sorted(tasks, key=lambda task: task.order)
+
+
+def run_task(task: Task) -> Dict[str, Any]:
+    """Extract the task's section from its pages and return the table as JSON-compatible data."""
+
+    (spec,) = resolve_sections([task.section])
+    started = time.monotonic()
+    with pdfplumber.open(task.path) as pdf:
+        page_count = len(pdf.pages)
+        result = run_sections(pdf, [spec], pages=range(task.first_page, task.last_page))[spec.name]
+    frame = spec.frame(result)
+    return {
+        "columns": [str(column) for column in frame.columns],
+        "rows": frame.astype(object).where(frame.notna(), None).values.tolist(),
+        "pages": page_count,
+        "seconds": round(time.monotonic() - started, 3),
+        "worker": f"{socket.gethostname()}-{os.getpid()}",
+    }
+
+
+@contextmanager
+def holding_claim(queue: WorkQueue, task: Task, interval: float = HEARTBEAT_SECONDS) -> Iterator[None]:
+    """Renew the claim of ``task`` every ``interval`` seconds while the block runs."""
+
+    stop = threading.Event()
+
+    def heartbeat() -> None:
+        while not stop.wait(interval):
+            queue.renew(task)
+
+    thread = threading.Thread(target=heartbeat, name=f"lease-{task.task_id}", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def work(queue: WorkQueue, poll_seconds: float = POLL_SECONDS) -> int:
+    """Process tasks until the queue is drained; return the number of tasks processed."""
+
+    processed = 0
+    while True:
+        task = queue.claim()
+        if task is None:
+            if queue.finished():
+                return processed
+            time.sleep(poll_seconds)  # other workers hold claims that may still be requeued
+            continue
+        try:
+            with holding_claim(queue, task):
+                result = run_task(task)
+            queue.complete(task, DONE, result)
+            print(f"{task.task_id}: fertig")
+        except Exception as exc:  # noqa: BLE001 - reported to the coordinator
+            queue.complete(task, FAILED, {"error": repr(exc)})
+            print(f"{task.task_id}: FEHLER {exc!r}")
+        processed += 1
+
+
+def wait_for_results(queue: WorkQueue, lease_seconds: float, poll_seconds: float = POLL_SECONDS) -> None:
+    while not queue.finished():
+        for task_id in queue.requeue_expired(lease_seconds):
+            print(f"{task_id}: Lease abgelaufen, erneut eingereiht")
+        time.sleep(poll_seconds)
+
+
+def merge_results(queue: WorkQueue, output_root: Path) -> List[str]:
+    """Write every partition whose tasks all succeeded; return the labels of failed partitions."""
+
+    by_partition: Dict[Partition, List[Task]] = {}
+    for task in sorted(queue.tasks(), key=lambda task: task.order):
+        by_partition.setdefault(task.partition, []).append(task)
+    # A requeued task may have run twice; one successful run is enough.
+    failed_ids = set(queue.task_ids(FAILED)) - set(queue.task_ids(DONE))
+    failures: List[str] = []
+    for partition, tasks in by_partition.items():
+        failed = [task for task in tasks if task.task_id in failed_ids]
+        if failed:
+            for task in failed:
+                print(f"{task.task_id}: FEHLER {queue.result(FAILED, task.task_id)['error']}")
+            failures.append(partition.label)
+            continue
+        parts: Dict[str, List[pd.DataFrame]] = {}
+        page_count = 0
+        seconds = 0.0
+        for task in tasks:
+            result = queue.result(DONE, task.task_id)
+            parts.setdefault(task.section, []).append(pd.DataFrame(result["rows"], columns=result["columns"]))
+            page_count = result["pages"]
+            seconds += result["seconds"]
+        frames = {section: pd.concat(frames, ignore_index=True) for section, frames in parts.items()}
+        counts = write_partition(partition, output_root, frames, page_count, seconds)
+        print(f"{partition.label}: " + ", ".join(f"{name}: {count}" for name, count in counts.items()))
+    return failures
+
+
+def submit_from_args(args: argparse.Namespace) -> WorkQueue:
+    section_names = [spec.name for spec in resolve_sections(args.sections or None)]
+    partitions = [
+        partition
+        for partition in collect_partitions(args)
+        if args.force or not is_up_to_date(partition, args.output_root, section_names)
+    ]
+    unproven = unproven_partitions(partitions, section_names)
+    partitions = [partition for partition in partitions if partition not in unproven]
+    tasks = plan_tasks(partitions, section_names, args.pages_per_task)
+    queue = WorkQueue(args.queue)
+    queue.submit(tasks)
+    skipped = f", {len(unproven)} ohne Nachweis übersprungen" if unproven else ""
+    print(f"{len(tasks)} Aufgaben für {len(partitions)} Partitionen in {args.queue} eingereiht{skipped}")
+    return queue
+
+
+def collect(queue: WorkQueue, output_root: Path, lease_seconds: float) -> None:
+    if lease_seconds <= 2 * HEARTBEAT_SECONDS:
+        raise SystemExit(f"--lease muss länger als {2 * HEARTBEAT_SECONDS:.0f} Sekunden sein (Heartbeat der Worker).")
+    wait_for_results(queue, lease_seconds)
+    failures = merge_results(queue, output_root)
+    if failures:
+        raise SystemExit(f"{len(failures)} Partitionen fehlgeschlagen: {', '.join(failures)}")
+
+
+def add_partition_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--input-root", type=Path, default=Path("input/gemeinden"))
+    parser.add_argument("--gemeinden", nargs="*", help="Einschränkung auf bestimmte Gemeinden")
+    parser.add_argument("--years", nargs="*", type=int, help="Einschränkung auf bestimmte Jahre")
+    parser.add_argument("--sections", nargs="*", help="Einschränkung auf bestimmte Abschnitte")
+    parser.add_argument("--pages-per-task", type=int, default=DEFAULT_PAGES_PER_TASK)
+    parser.add_argument("--force", action="store_true", help="Auch aktuelle Partitionen neu extrahieren")
+    parser.add_argument(
+        "--legacy-gemeinde",
+        help="input/balance als Partitionen dieser Gemeinde einbeziehen (z.B. lensahn)",
+    )
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    submit = subparsers.add_parser("submit", help="Aufgaben in die Warteschlange stellen")
+    submit.add_argument("--queue", type=Path, required=True)
+    submit.add_argument("--output-root", type=Path, default=Path("output/gemeinden"))
+    add_partition_arguments(submit)
+
+    worker = subparsers.add_parser("worker", help="Aufgaben abarbeiten, bis die Warteschlange leer ist")
+    worker.add_argument("--queue", type=Path, required=True)
+
+    collect_parser = subparsers.add_parser("collect", help="Auf alle Ergebnisse warten und zusammenführen")
+    collect_parser.add_argument("--queue", type=Path, required=True)
+    collect_parser.add_argument("--output-root", type=Path, default=Path("output/gemeinden"))
+    collect_parser.add_argument(
+        "--lease",
+        type=float,
+        default=DEFAULT_LEASE_SECONDS,
+        help="Sekunden ohne Lebenszeichen eines Workers, nach denen seine Aufgabe neu vergeben wird",
+    )
+
+    local = subparsers.add_parser("local", help="submit, Worker-Prozesse auf diesem Rechner und collect")
+    local.add_argument("--queue", type=Path, default=Path("output/queue"))
+    local.add_argument("--output-root", type=Path, default=Path("output/gemeinden"))
+    local.add_argument("--workers", type=int, default=4)
+    local.add_argument(
+        "--lease",
+        type=float,
+        default=DEFAULT_LEASE_SECONDS,
+        help="Sekunden ohne Lebenszeichen eines Workers, nach denen seine Aufgabe neu vergeben wird",
+    )
+    add_partition_arguments(local)
+    return parser.parse_args(argv)
+
+
+def main() -> None:
+    args = parse_args()
+    if args.command == "submit":
+        submit_from_args(args)
+    elif args.command == "worker":
+        print(f"{work(WorkQueue(args.queue))} Aufgaben bearbeitet")
+    elif args.command == "collect":
+        collect(WorkQueue(args.queue), args.output_root, args.lease)
+    else:
+        queue = submit_from_args(args)
+        command = [sys.executable, str(Path(__file__).resolve()), "worker", "--queue", str(args.queue)]
+        workers = [subprocess.Popen(command) for _ in range(args.workers)]
+        try:
+            collect(queue, args.output_root, args.lease)
+        finally:
+            for process in workers:
+                process.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Bisection of the Teilergebnisrechnung pages across long runs of other pages."""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "bin"))
+
+from produkt_index import ProduktPageIndex  # noqa: E402
+
+
+class FakePage:
+    width = 842
+    height = 595
+
+    def __init__(self, text: str):
+        self.text = text
+
+    def crop(self, bbox):
+        return self
+
+    def extract_text(self) -> str:
+        return self.text
+
+    def close(self) -> None:
+        pass
+
+
+class FakePDF:
+    def __init__(self, texts: List[str]):
+        self.pages = [FakePage(text) for text in texts]
+
+
+def build_document(products: int, other_pages: int, headed: bool) -> tuple[FakePDF, Dict[int, List[int]]]:
+    """Vorbericht, then per Produkt a Teilergebnisrechnung page, a continuation page and ``other_pages`` other pages
+    (Teilfinanzrechnung with Produkt header, or pages without one), then an Anhang whose Produkt numbers start again."""
+
+    texts = [f"Vorbericht Seite {number}" for number in range(5)]
+    texts.append("Ergebnisrechnung Ertrags- und Aufwandsarten")
+    expected: Dict[int, List[int]] = {}
+    for number in range(1, products + 1):
+        produkt = 100000 + number * 1000
+        expected[produkt] = [len(texts), len(texts) + 1]
+        texts.append(f"Teilergebnisrechnung 2024 Produkt - {produkt} - Produkt {number}")
+        texts.append("Teilergebnisrechnung Ertrags- und Aufwandsarten")
+        for _ in range(other_pages):
+            texts.append(f"Teilfinanzrechnung 2024 Produkt - {produkt} - Produkt {number}" if headed else "")
+    texts.extend(f"Anhang Seite {number}" for number in range(20))
+    texts.extend(
+        f"Produktbeschreibung Produkt - {100000 + number * 1000} - Produkt {number}" for number in range(1, 11)
+    )
+    return FakePDF(texts), expected
+
+
+@pytest.mark.parametrize("other_pages", [0, 1, 3, 4, 6, 12])
+@pytest.mark.parametrize("headed", [True, False])
+def test_finds_every_produkt(other_pages: int, headed: bool) -> None:
+    pdf, expected = build_document(50, other_pages, headed)
+    index = ProduktPageIndex(pdf)
+    for produkt, pages in expected.items():
+        assert index.find_pages(produkt) == pages
+
+
+def test_missing_produkt() -> None:
+    pdf, _expected = build_document(50, 6, True)
+    index = ProduktPageIndex(pdf)
+    assert index.find_pages(100500) == []
+    assert index.find_pages(999000) == []
+    assert index.find_pages(1000) == []
+
+
+def test_single_lookup_reads_few_headers() -> None:
+    pdf, _expected = build_document(50, 6, True)
+    index = ProduktPageIndex(pdf)
+    assert index.find_pages(125000)
+    assert index.probes < len(pdf.pages) // 2